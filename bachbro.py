@@ -30,18 +30,23 @@ music theory publications. Together with the sources, this data is provided
 in JSON files in BachBro's "docs" subfolder.
  The main class is BachBro, written in this module. All GUI tabs
 are written in separate submodules. All GUI-independent methods (such as
-the JSON data loading; only tkinter error messages are included) are written
-in the submodule bachbro_data.
+the JSON data loading) are written in the submodule bachbro_data, which
+doesn't import tkinter. Its errors are raised as exceptions, which are shown
+as error messages by the GUI classes.
 """
 
 import os
 import sys
 import tkinter
+import tkinter.messagebox
 import tkinter.ttk
 
 import submodules.find_scales
 import submodules.fractions
 import submodules.menu
+import submodules.midi_writer
+import submodules.musicxml_writer
+import submodules.profiling
 import submodules.record_instrument
 import submodules.view_scales
 import submodules.bachbro_data
@@ -65,6 +70,14 @@ class BachBro(tkinter.Tk):
                      os.getcwd().replace("\\", "/")+"/data/")
         self.current_file_number = 0
         
+        # Optional profiling of the data methods. If the environment variable
+        # BACHBRO_PROFILE is set, the collected timings are written to the
+        # JSON file given by it (and a trace event file next to it) when
+        # BachBro is closed.
+        self.profile_path = os.environ.get("BACHBRO_PROFILE", "")
+        if self.profile_path:
+            self.data.profiler = submodules.profiling.Profiler()
+        
         # Add menu submodule.
         menu = submodules.menu.Menu(self)
         self["menu"] = menu
@@ -116,6 +129,19 @@ class BachBro(tkinter.Tk):
         values = [i+" ("+self.data.get_sharp_or_flat_number_text(i)+")" for i in values]
         self.var_mode.set(values[0])
         mode["values"] = values
+
+        frame_musicxml_format = tkinter.Frame(frame_general_options2)
+        label_musicxml_format = tkinter.Label(frame_musicxml_format,
+                                              text="   Format:")
+        self.var_musicxml_format = tkinter.StringVar()
+        musicxml_format = tkinter.ttk.Combobox(frame_musicxml_format, width=28,
+                                               textvariable=\
+                                                self.var_musicxml_format,
+                                               state="readonly")
+        musicxml_format["values"] = (
+                    list(submodules.musicxml_writer.MUSICXML_FORMATS) +
+                    list(submodules.midi_writer.MIDI_FORMATS))
+        self.var_musicxml_format.set(musicxml_format["values"][0])
         
         # Notebook instance for every frame.
         self.notebook = tkinter.ttk.Notebook(self)
@@ -148,10 +174,51 @@ class BachBro(tkinter.Tk):
         frame_mode.pack(side="left")
         label_mode.pack(side="left")
         mode.pack(side="left")
+        frame_musicxml_format.pack(side="left")
+        label_musicxml_format.pack(side="left")
+        musicxml_format.pack(side="left")
 
         # Run window.
         self.title("BachBro 0.1 BETA")
-        self.mainloop()
+        try:
+            self.mainloop()
+        finally:
+            try:
+                self.data.sheet_editor_launcher.close()
+            except (OSError, ValueError) as error:
+                # The window is closed, so that the error of the last
+                # coalesced sheet editor launch can only be printed.
+                sys.stderr.write("Scorewriter could not be started: %s\n" %
+                                 error)
+            if self.profile_path:
+                self.data.profiler.export_json(self.profile_path)
+                self.data.profiler.export_trace(self.profile_path+".trace.json")
+
+    def get_musicxml_extension(self):
+        """Returns the file extension of the selected MusicXML (or MIDI) export format."""
+        format_ = self.var_musicxml_format.get()
+        if format_ in submodules.midi_writer.MIDI_FORMATS:
+            return submodules.midi_writer.MIDI_FORMATS[format_]
+        return submodules.musicxml_writer.MUSICXML_FORMATS[format_]
+
+    def open_with_sheet_editor(self, filepath):
+        """Opens the given file with the sheet editor.
+        
+        If the sheet editor can't be started, an error message is shown.
+        
+        Arguments:
+        >filepath: The score's file path.
+        """
+        try:
+            self.data.open_with_sheet_editor(filepath)
+        except submodules.bachbro_data.SheetEditorCommandError:
+            tkinter.messagebox.showerror("BachBro - Error",
+                                         "Scorewriter command not found!\n"\
+                                         "Possible solutions:\n"\
+                                         ">Set the correct scorewriter command via 'Edit->Set scorewriter command...'\n"\
+                                         ">Install and set up a scorewriter on your system, see INSTALL.txt\n"\
+                                         ">Put the scorewriter's binary to your system's PATH\n"\
+                                         ">Permit the scorewriter to be executed on your system")
 
     def _show_selected_instrument(self, *e):
         """Startup of instrument canvas and instrument notes checkboxes.
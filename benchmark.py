@@ -0,0 +1,1264 @@
+#!/usr/bin/env python
+#
+# benchmark.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""benchmark.py - Benchmark suite of BachBro's performance critical code paths.
+
+The benchmarks are run without BachBro's GUI, and only the fretboard
+benchmark needs tkinter (for the tab classes' methods). Each benchmark repeats its
+measured code several times and reports the best (i.e. least disturbed)
+time in milliseconds, or a throughput. All inputs (including the synthetic
+scale catalogues, transcriptions and aubio outputs) are generated with
+fixed random seeds, so that the results are reproducible.
+Run it from BachBro's main folder with:
+python benchmark.py [--json RESULTS_FILE] [--compare OLD_RESULTS_FILE]
+                    [--threshold PERCENT] [BENCHMARK_NAME ...]
+The JSON results file is machine-readable. With --compare, every result
+is compared with the results of an older run, and a result which got
+worse by more than the threshold is reported as a regression (and the
+exit code is 1).
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import urllib.parse
+import urllib.request
+import wave
+
+import submodules.bachbro_data
+import submodules.editor_launcher
+import submodules.profiling
+import submodules.query_server
+import submodules.scale_book
+
+
+DATAPATH = os.getcwd().replace("\\", "/")+"/data/"
+
+
+def _get_best_time(function, repetitions):
+    """Returns the best time (in milliseconds) of the repeated function call.
+
+    Arguments:
+    >function: The called function. It gets no arguments.
+    >repetitions: The number of function calls.
+    """
+    best_time = float("inf")
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        best_time = min(best_time, time.perf_counter() - start)
+    return best_time * 1000
+
+
+def _load_data(tables=None, use_snapshots=True):
+    """Creates a BachBroData instance and loads the given tables.
+
+    Arguments:
+    >tables=None: The names of the loaded tables. If None, all tables are
+                  loaded.
+    >use_snapshots=True: Is given to the BachBroData constructor.
+    """
+    data = submodules.bachbro_data.BachBroData(DATAPATH,
+                                               use_snapshots=use_snapshots)
+    if tables is None:
+        data.load_all_tables()
+    else:
+        for table in tables:
+            getattr(data, table)
+    return data
+
+
+def benchmark_startup(repetitions=20):
+    """Returns the cold JSON parse, warm snapshot and lazy loading times.
+
+    The lazy loading time is the time for loading only the tables which
+    are needed by get_fitting_scales().
+
+    Arguments:
+    >repetitions=20: The number of measured BachBroData constructions.
+    """
+    cold_time = _get_best_time(lambda: _load_data(use_snapshots=False),
+                               repetitions)
+    # Make sure that all snapshots exist before they are measured.
+    _load_data()
+    warm_time = _get_best_time(_load_data, repetitions)
+    lazy_time = _get_best_time(lambda: _load_data(["notes", "scales"]),
+                               repetitions)
+    return collections.OrderedDict([
+            ("cold_json_parse", (cold_time, "ms")),
+            ("warm_snapshot_load", (warm_time, "ms")),
+            ("lazy_notes_and_scales", (lazy_time, "ms"))])
+
+
+def _get_instrument_notes_linear(data, instrument):
+    """Returns the instrument's relative cents and note names by scanning all notes.
+
+    This is the former, index-free way of the cents and note name lookups
+    and is only kept as the benchmark's reference.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >instrument: The instrument's JSON data.
+    """
+    string_range = int(instrument["stringRangeInCents"])
+    fret_distance = int(instrument["fretDistanceInCents"])
+    num_frets = string_range // fret_distance
+
+    relcents = []
+    note_names = []
+    for string in instrument["stringStartNotes"]:
+        start_cent = int(string[1])*1200 + data.notes[string[0]]["centsToC"]
+        string_relcents = []
+        string_note_names = []
+        for fret_num in range(num_frets):
+            cents = start_cent + fret_num * fret_distance
+            string_relcents.append(cents)
+            for note_key in list(data.notes.keys()):
+                if (cents % 1200) == data.notes[note_key]["centsToC"]:
+                    string_note_names.append(note_key)
+                    break
+        relcents.append(string_relcents)
+        note_names.append(string_note_names)
+    return relcents, note_names
+
+
+def benchmark_fretboard(repetitions=200):
+    """Returns the times of all instruments' fretboard computations.
+
+    A 'fretboard' consists of the relative cents (as calculated in the
+    'View Scales/Chords' tab) and the note names (as calculated in the
+    'Find Scales/Chords' tab) of every string and fret of an instrument.
+    It is computed with the former linear note scan and with the cents
+    index. Additionally, the cell colors of the 'View Scales/Chords' tab's
+    instrument canvas are computed for a scale with two clicked cells and
+    all intervals of the first genre.
+
+    Arguments:
+    >repetitions=200: The number of measured computations of all
+                      instruments' fretboards.
+    """
+    # The tab modules import tkinter, so that they are only imported here.
+    import submodules.find_scales
+    import submodules.view_scales
+    data = _load_data()
+    # The tabs' note computation methods only use their parent's data
+    # and the clicked cells.
+    tab = types.SimpleNamespace(parent=types.SimpleNamespace(data=data),
+                                clicked_relcents=[4800, 5500])
+    instruments = list(data.instruments.values())
+    scale_in_cents = data.scales["Major"]["notesInCentsToKeynote"]
+    genre = next(iter(data.genres.values()))
+    chosen_intervals = [data.intervals[name]["cents"]
+                        for key, names in genre.items()
+                        if key.endswith("Intervals") for name in names]
+
+    def render_linear():
+        for instrument in instruments:
+            _get_instrument_notes_linear(data, instrument)
+
+    def render_indexed():
+        for instrument in instruments:
+            submodules.view_scales.ViewScales.\
+             _get_relcents_of_instrument(tab, instrument)
+            submodules.find_scales.FindScales.\
+             _get_note_names_of_instrument(tab, instrument)
+
+    def render_colors():
+        for instrument in instruments:
+            instrument_relcents = submodules.view_scales.ViewScales.\
+                                   _get_relcents_of_instrument(tab, instrument)
+            submodules.view_scales.ViewScales.\
+             _get_instrument_colors(tab, instrument_relcents, scale_in_cents,
+                                    0, list(chosen_intervals), True)
+
+    linear_time = _get_best_time(render_linear, repetitions)
+    indexed_time = _get_best_time(render_indexed, repetitions)
+    colors_time = _get_best_time(render_colors, repetitions // 10)
+    return collections.OrderedDict([
+            ("linear_scan", (linear_time, "ms")),
+            ("cents_index", (indexed_time, "ms")),
+            ("cell_colors", (colors_time, "ms"))])
+
+
+def _get_synthetic_scales(num_scales, seed=0):
+    """Returns an ordered dict of random scales in the scales JSON data format.
+
+    Arguments:
+    >num_scales: The number of generated scales.
+    >seed=0: The random generator's seed, so that the scales are
+             reproducible.
+    """
+    generator = random.Random(seed)
+    quarter_tones = list(range(50, 1200, 50))
+    scales = collections.OrderedDict()
+    for i in range(num_scales):
+        scale_cents = sorted(generator.sample(quarter_tones,
+                                              generator.randint(4, 9)))
+        scales["Synthetic scale "+str(i)] = {
+            "notesInCentsToKeynote": [0] + scale_cents,
+            "info": [],
+            "sources": []}
+    return scales
+
+
+def _get_fitting_scales_linear(data, notes_list):
+    """Returns the fitting scales by comparing every transposed scale.
+
+    This is the former, index-free get_fitting_scales() and is only kept as
+    the benchmark's reference.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >notes_list: The given notes.
+    """
+    notes_cents = [data.notes[i]["centsToC"] for i in notes_list]
+    scale_names = []
+    for scale_key in list(data.scales.keys()):
+        scale_cents = data.scales[scale_key]["notesInCentsToKeynote"]
+        for keynote_name in list(data.notes.keys()):
+            keynote_cents = data.notes[keynote_name]["centsToC"]
+            scale_cents_plus_keynote = [(i+keynote_cents)%1200
+                                        for i in scale_cents]
+            fitting = True
+            for note_cents in notes_cents:
+                if note_cents not in scale_cents_plus_keynote:
+                    fitting = False
+                    break
+            if fitting and ("chromatic" not in scale_key):
+                scale_names.append(keynote_name+" - "+scale_key)
+    return scale_names
+
+
+def benchmark_fitting_scales(num_synthetic_scales=20000, repetitions=5):
+    """Returns the get_fitting_scales() times for the real and a synthetic catalogue.
+
+    The results contain the times of the former linear search and of the
+    bitmask search with the real scales, as well as the time of the
+    synthetic catalogue's creation and its bitmask search.
+
+    Arguments:
+    >num_synthetic_scales=20000: The number of scales in the synthetic
+                                 catalogue.
+    >repetitions=5: The number of measured searches.
+    """
+    notes_list = ["C", "E", "G"]
+    data = _load_data(["notes", "scales"])
+    data.scale_catalogue # Exclude the catalogue's creation from the timing.
+    linear_time = _get_best_time(
+                   lambda: _get_fitting_scales_linear(data, notes_list),
+                   repetitions)
+    bitmask_time = _get_best_time(lambda: data.get_fitting_scales(notes_list),
+                                  repetitions)
+
+    synthetic_data = _load_data(["notes"])
+    synthetic_data.scales = _get_synthetic_scales(num_synthetic_scales)
+    start = time.perf_counter()
+    synthetic_data.scale_catalogue
+    catalogue_time = (time.perf_counter() - start) * 1000
+    synthetic_time = _get_best_time(
+                      lambda: synthetic_data.get_fitting_scales(notes_list),
+                      repetitions)
+    return collections.OrderedDict([
+            ("linear", (linear_time, "ms")),
+            ("bitmask", (bitmask_time, "ms")),
+            ("synthetic_catalogue_creation", (catalogue_time, "ms")),
+            ("synthetic_bitmask", (synthetic_time, "ms"))])
+
+
+def benchmark_batch_queries(num_queries=5000, repetitions=3):
+    """Returns the throughputs (in queries per second) of single and batch scale queries.
+
+    The queries are random note sets of three to six notes. The results
+    contain the throughputs of get_fitting_scales() calls and of one
+    get_fitting_scales_batch() call, both for the real scales. Raises an
+    ImportError if NumPy is not installed.
+
+    Arguments:
+    >num_queries=5000: The number of note sets.
+    >repetitions=3: The number of measured runs of all queries.
+    """
+    data = _load_data(["notes", "scales"])
+    generator = random.Random(0)
+    note_names = list(data.notes.keys())
+    notes_lists = [generator.sample(note_names, generator.randint(3, 6))
+                   for _ in range(num_queries)]
+    # Exclude the catalogue's creation from the timing.
+    data.get_fitting_scales_batch(notes_lists[:1])
+
+    single_time = _get_best_time(
+                   lambda: [data.get_fitting_scales(i) for i in notes_lists],
+                   repetitions)
+    batch_time = _get_best_time(
+                  lambda: data.get_fitting_scales_batch(notes_lists),
+                  repetitions)
+    return collections.OrderedDict([
+            ("single", (num_queries/single_time*1000, "queries/s")),
+            ("numpy_batch", (num_queries/batch_time*1000, "queries/s"))])
+
+
+def benchmark_import(repetitions=10):
+    """Returns the import times of the headless data module with and without tkinter.
+
+    Each import is measured in a new Python interpreter, including the
+    interpreter's startup time. The import with tkinter imports
+    tkinter.messagebox (as the data module did before it became
+    GUI-independent) in addition to the data module.
+
+    Arguments:
+    >repetitions=10: The number of measured interpreter runs.
+    """
+    def run_import(statement):
+        subprocess.check_call([sys.executable, "-c", statement])
+
+    headless_time = _get_best_time(
+                     lambda: run_import("import submodules.bachbro_data"),
+                     repetitions)
+    tkinter_time = _get_best_time(
+                    lambda: run_import("import tkinter.messagebox, "
+                                       "submodules.bachbro_data"),
+                    repetitions)
+    return collections.OrderedDict([
+            ("headless_data", (headless_time, "ms")),
+            ("data_with_tkinter", (tkinter_time, "ms"))])
+
+
+def benchmark_query_server(num_requests=2000, num_clients=8):
+    """Returns the latency and throughput numbers of the local query server.
+
+    The server is started on a free localhost port. The clients send a mix
+    of fitting scales, scale sample and MusicXML queries, in which queries
+    are repeated, so that the server's response cache is used. The results
+    contain the mean and the 95th percentile client latency, the
+    throughput and the server's cache hit ratio.
+
+    Arguments:
+    >num_requests=2000: The number of sent requests.
+    >num_clients=8: The number of concurrently requesting clients.
+    """
+    data = _load_data()
+    service = submodules.query_server.QueryService(data)
+    server = submodules.query_server.QueryServer(service, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+
+    generator = random.Random(0)
+    note_names = list(data.notes.keys())
+    scale_names = list(data.scales.keys())
+    urls = []
+    for _ in range(num_requests):
+        kind = generator.randint(0, 2)
+        if kind == 0:
+            notes = ",".join(generator.sample(note_names[::2], 3))
+            arguments = {"notes": notes}
+            path = "/fitting_scales"
+        else:
+            arguments = {"keynote": generator.choice(note_names[::4]),
+                         "scale": generator.choice(scale_names[:20])}
+            path = "/scale_sample" if kind == 1 else "/musicxml"
+        urls.append(url+path+"?"+urllib.parse.urlencode(arguments))
+
+    def request(request_url):
+        start = time.perf_counter()
+        with urllib.request.urlopen(request_url) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(num_clients) as executor:
+            latencies = sorted(executor.map(request, urls))
+        total_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    mean_latency = sum(latencies)/len(latencies)*1000
+    p95_latency = latencies[int(len(latencies)*.95)]*1000
+    stats = service._get_stats()
+    return collections.OrderedDict([
+            ("mean_latency", (mean_latency, "ms")),
+            ("p95_latency", (p95_latency, "ms")),
+            ("throughput", (num_requests/total_time, "requests/s")),
+            ("cache_hit_ratio",
+             (stats["cache"]["hits"]/stats["requests"]*100, "%"))])
+
+
+def benchmark_scale_samples(repetitions=5):
+    """Returns the times of get_scale_sample() for all keynotes and scales.
+
+    Every keynote and scale is sampled as a plain scale, as a chord and as
+    a randomized sample.
+
+    Arguments:
+    >repetitions=5: The number of measured runs of all samples.
+    """
+    data = _load_data()
+    keys = [(keynote, scale) for keynote in data.notes for scale in data.scales
+            if data.scales[scale]["notesInCentsToKeynote"]]
+
+    def sample(**arguments):
+        random.seed(0)
+        for keynote, scale in keys:
+            data.get_scale_sample(keynote, scale, 4, **arguments)
+
+    return collections.OrderedDict([
+            ("plain", (_get_best_time(sample, repetitions), "ms")),
+            ("chord", (_get_best_time(lambda: sample(chord=True),
+                                      repetitions), "ms")),
+            ("randomized", (_get_best_time(lambda: sample(randomized=True),
+                                           repetitions), "ms"))])
+
+
+def _get_synthetic_transcription(data, num_notes, seed=0):
+    """Returns a list of random Note instances, like a long transcription.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >num_notes: The number of generated notes.
+    >seed=0: The random generator's seed.
+    """
+    generator = random.Random(seed)
+    note_names = list(data.notes.keys())
+    note_lengths = list(data.note_lengths.keys())
+    notes = []
+    for _ in range(num_notes):
+        name = generator.choice(note_names)
+        duration = generator.choice(note_lengths)
+        notes.append(submodules.bachbro_data.Note(
+                      name=name, octave=generator.randint(2, 6),
+                      alter=data.notes[name]["musicXMLAlter"],
+                      accidental=data.notes[name]["musicXMLAccidental"],
+                      type_=data.note_lengths[duration]["musicXMLType"],
+                      duration=duration))
+    return notes
+
+
+def benchmark_musicxml(num_transcription_notes=20000, repetitions=5):
+    """Returns the create_musicxml() times of a scale sample and a long transcription.
+
+    The transcription is also written as compressed MusicXML (.mxl), whose
+    size reduction is reported as compression ratio. Additionally, the
+    repeated in-memory export of the same scale sample is measured with a
+    newly created and with a cached ScaleSample.
+
+    Arguments:
+    >num_transcription_notes=20000: The number of notes of the synthetic
+                                    transcription.
+    >repetitions=5: The number of measured MusicXML creations.
+    """
+    data = _load_data()
+    sample_notes = data.get_scale_sample("C", "Major", 4)
+    transcription_notes = _get_synthetic_transcription(
+                           data, num_transcription_notes)
+    arguments = (next(iter(data.clefs)), next(iter(data.modes)),
+                 next(iter(data.midi_instruments)))
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepath = os.path.join(temp_path, "benchmark.xml")
+        sample_time = _get_best_time(
+                       lambda: data.create_musicxml(filepath, "Sample",
+                                                    *arguments, sample_notes),
+                       repetitions*10)
+        transcription_time = _get_best_time(
+                              lambda: data.create_musicxml(
+                                       filepath, "Transcription", *arguments,
+                                       transcription_notes),
+                              repetitions)
+        compressed_filepath = os.path.join(temp_path, "benchmark.mxl")
+        compressed_time = _get_best_time(
+                           lambda: data.create_musicxml(
+                                    compressed_filepath, "Transcription",
+                                    *arguments, transcription_notes),
+                           repetitions)
+        compression_ratio = (os.path.getsize(filepath) /
+                             os.path.getsize(compressed_filepath))
+
+    def export_sample(get_sample):
+        for _ in range(100):
+            data.write_musicxml(io.StringIO(), "Sample", *arguments,
+                                get_sample("C", "Major", 4))
+
+    uncached_time = _get_best_time(lambda: export_sample(data.get_scale_sample),
+                                   repetitions)
+    cached_time = _get_best_time(
+                   lambda: export_sample(data.get_cached_scale_sample),
+                   repetitions)
+    return collections.OrderedDict([
+            ("scale_sample", (sample_time, "ms")),
+            ("transcription", (transcription_time, "ms")),
+            ("transcription_compressed", (compressed_time, "ms")),
+            ("compression_ratio", (compression_ratio, "x")),
+            ("100_repeated_samples_uncached", (uncached_time, "ms")),
+            ("100_repeated_samples_cached", (cached_time, "ms"))])
+
+
+def benchmark_exercise(num_measures=(1000, 10000), repetitions=2):
+    """Returns the times and memory peaks of streamed exercise exports.
+
+    The memory peak (measured with tracemalloc) of a streamed export
+    should not grow with the exercise's length.
+
+    Arguments:
+    >num_measures=(1000, 10000): The measured numbers of measures.
+    >repetitions=2: The number of measured exports per number of measures.
+    """
+    data = _load_data()
+    arguments = (next(iter(data.clefs)), next(iter(data.modes)),
+                 next(iter(data.midi_instruments)))
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepath = os.path.join(temp_path, "exercise.xml")
+
+        def export(measures):
+            notes = data.get_exercise_notes("C", "Major", 4, measures,
+                                            (4, 4), seed=0)
+            data.create_musicxml(filepath, "Exercise", *arguments, notes,
+                                 (4, 4))
+
+        for measures in num_measures:
+            results["%d_measures" % measures] = (
+             _get_best_time(lambda: export(measures), repetitions), "ms")
+            tracemalloc.start()
+            export(measures)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results["%d_measures_memory_peak" % measures] = (peak/1024, "KiB")
+    return results
+
+
+def benchmark_midi(num_transcription_notes=20000, repetitions=5):
+    """Returns the create_midi() times of a quarter tone scale sample and a long transcription.
+
+    Arguments:
+    >num_transcription_notes=20000: The number of notes of the synthetic
+                                    transcription.
+    >repetitions=5: The number of measured MIDI file creations.
+    """
+    data = _load_data()
+    sample_notes = data.get_scale_sample("C", "Bayati", 4)
+    transcription_notes = _get_synthetic_transcription(
+                           data, num_transcription_notes)
+    instrument = next(iter(data.midi_instruments))
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepath = os.path.join(temp_path, "benchmark.mid")
+        sample_time = _get_best_time(
+                       lambda: data.create_midi(filepath, "Sample", instrument,
+                                                sample_notes),
+                       repetitions*10)
+        transcription_time = _get_best_time(
+                              lambda: data.create_midi(
+                                       filepath, "Transcription", instrument,
+                                       transcription_notes),
+                              repetitions)
+    return collections.OrderedDict([
+            ("quarter_tone_scale_sample", (sample_time, "ms")),
+            ("transcription", (transcription_time, "ms"))])
+
+
+def benchmark_editor_launcher(num_requests=20):
+    """Returns the launch latency and the number of started processes of a burst of open requests.
+
+    The sheet editor is simulated by the Python interpreter, and the
+    opened files are empty, so that every started process exits at once.
+
+    Arguments:
+    >num_requests=20: The number of open requests of the burst.
+    """
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepaths = [os.path.join(temp_path, "%d.xml" % i)
+                     for i in range(num_requests)]
+        for filepath in filepaths:
+            open(filepath, "w").close()
+        launcher = submodules.editor_launcher.SheetEditorLauncher()
+        for filepath in filepaths:
+            launcher.open(sys.executable, filepath)
+        launcher.close()
+        while launcher.get_stats()["running_processes"] > 0:
+            time.sleep(.01)
+    stats = launcher.get_stats()
+    return collections.OrderedDict([
+            ("mean_launch_latency", (stats["mean_launch_latency_ms"], "ms")),
+            ("started_processes", (stats["launches"], "processes"))])
+
+
+def benchmark_scale_book(keynotes=("C", "D"), repetitions=2):
+    """Returns the scale book export times with one and with all CPUs' worker processes.
+
+    The measured scale book contains all scales and clefs, but only the
+    given keynotes. The ideal speedup is the number of CPUs, which is
+    written to the JSON results file.
+
+    Arguments:
+    >keynotes=("C", "D"): The keynotes of the measured scale book.
+    >repetitions=2: The number of measured exports per worker number.
+    """
+    data = _load_data()
+    items = submodules.scale_book.get_scale_book_items(data,
+                                                       keynotes=list(keynotes))
+    arguments = (next(iter(data.modes)), next(iter(data.midi_instruments)))
+    num_cpus = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as temp_path:
+        single_time = _get_best_time(
+                       lambda: submodules.scale_book.export_scale_book(
+                                data, temp_path, items, *arguments,
+                                num_workers=1),
+                       repetitions)
+        parallel_time = _get_best_time(
+                         lambda: submodules.scale_book.export_scale_book(
+                                  data, temp_path, items, *arguments,
+                                  num_workers=num_cpus),
+                         repetitions)
+        combined_time = _get_best_time(
+                         lambda: submodules.scale_book.export_scale_book(
+                                  data, os.path.join(temp_path, "book.xml"),
+                                  items, *arguments, combined=True,
+                                  num_workers=num_cpus),
+                         repetitions)
+    return collections.OrderedDict([
+            ("one_worker", (single_time, "ms")),
+            ("all_workers", (parallel_time, "ms")),
+            ("all_workers_combined_file", (combined_time, "ms")),
+            ("speedup", (single_time / parallel_time, "x"))])
+
+
+def _get_synthetic_aubio_output(num_notes, seed=0):
+    """Returns a random aubionotes output with the given number of notes.
+
+    Arguments:
+    >num_notes: The number of notes.
+    >seed=0: The random generator's seed.
+    """
+    generator = random.Random(seed)
+    lines = []
+    time_ = 0.0
+    for _ in range(num_notes):
+        length = generator.choice([.125, .25, .375, .5, 1.0])
+        length *= generator.uniform(.9, 1.1)
+        lines.append("%.6f\t%.6f\t%.6f" % (generator.randint(48, 84),
+                                            time_, time_+length))
+        time_ += length
+    return "\n".join(lines)+"\n"
+
+
+def benchmark_aubio_parsing(num_notes=5000, repetitions=5):
+    """Returns the times of the aubionotes output parsing and note conversion.
+
+    Arguments:
+    >num_notes=5000: The number of notes in the synthetic aubio output.
+    >repetitions=5: The number of measured runs.
+    """
+    data = _load_data()
+    out = _get_synthetic_aubio_output(num_notes)
+    midi_notes = data._get_midi_notes_from_aubio_output(out)
+    parsing_time = _get_best_time(
+                    lambda: data._get_midi_notes_from_aubio_output(out),
+                    repetitions)
+    conversion_time = _get_best_time(
+                       lambda: data.get_notes_from_midi_notes(
+                                midi_notes, (), "F#", 2, "G", 6),
+                       repetitions)
+    return collections.OrderedDict([
+            ("parsing", (parsing_time, "ms")),
+            ("note_conversion", (conversion_time, "ms"))])
+
+
+def _get_synthetic_melody(num_notes, seed=0):
+    """Returns a random melody with quarter tones as list of (MIDI number, start, length) tuples.
+
+    Arguments:
+    >num_notes: The number of notes.
+    >seed=0: The random generator's seed.
+    """
+    generator = random.Random(seed)
+    melody = []
+    start = 0.1
+    for _ in range(num_notes):
+        midi_number = generator.randint(45, 84) + generator.choice([0, 0, .5])
+        length = generator.choice([.125, .25, .5])
+        melody.append((midi_number, start, length))
+        start += length + generator.choice([0, .05])
+    return melody
+
+
+def _write_synthetic_wav(filepath, melody, sample_rate=44100, seed=0):
+    """Writes a 16 bit mono .wav file of the melody, played by a harmonic tone with noise.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >melody: The list of (MIDI number, start, length) tuples of the notes.
+    >sample_rate=44100: The sample rate in Hz.
+    >seed=0: The noise generator's seed.
+    """
+    import numpy # Optional dependency, see INSTALL.txt.
+    end = max(start+length for _, start, length in melody) + .2
+    samples = numpy.zeros(int(end*sample_rate))
+    for midi_number, start, length in melody:
+        frequency = 440 * 2**((midi_number-69)/12)
+        times = numpy.arange(int(length*sample_rate)) / sample_rate
+        tone = sum(numpy.sin(2*numpy.pi*frequency*harmonic*times) / harmonic
+                   for harmonic in range(1, 6))
+        envelope = numpy.minimum(1, numpy.minimum(times/.01,
+                                                  (length-times)/.02))
+        first = int(start*sample_rate)
+        samples[first:first+len(times)] += .3 * tone * envelope
+    samples += numpy.random.default_rng(seed).normal(0, .002, len(samples))
+    pcm = (numpy.clip(samples, -1, 1) * 32767).astype("<i2")
+    with wave.open(filepath, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def _get_transcription_accuracy(melody, midi_notes):
+    """Returns the recall (in percent) and the mean pitch error (in cents) of detected notes.
+
+    A melody note counts as detected if a MidiNote starts within 60 ms of
+    it. The pitch error is measured over the detected notes.
+
+    Arguments:
+    >melody: The list of (MIDI number, start, length) tuples.
+    >midi_notes: The list of detected MidiNote instances.
+    """
+    errors = []
+    for midi_number, start, _ in melody:
+        matches = [midi_note for midi_note in midi_notes
+                   if abs(midi_note.start - start) <= .06]
+        if matches:
+            pitch = matches[0].midi_number + matches[0].cents/100
+            errors.append(abs(pitch - midi_number) * 100)
+    recall = len(errors) / len(melody) * 100
+    return recall, (sum(errors)/len(errors) if errors else 0.0)
+
+
+def benchmark_pitch_detection(num_files=3, num_notes=40):
+    """Returns the speed and accuracy of the built-in pitch detection (and of aubio, if installed).
+
+    The test .wav files are synthesized melodies with quarter tones. aubio
+    is only measured if an 'aubionotes' command is found, and can't detect
+    the quarter tones. The live transcription's latencies are the analysis
+    times of single recording chunks.
+
+    Arguments:
+    >num_files=3: The number of synthesized .wav files.
+    >num_notes=40: The number of notes per file.
+    """
+    import submodules.pitch_detection
+    data = _load_data([])
+    melodies = [_get_synthetic_melody(num_notes, seed) for seed in range(num_files)]
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepaths = []
+        for i, melody in enumerate(melodies):
+            filepaths.append(os.path.join(temp_path, "%d.wav" % i))
+            _write_synthetic_wav(filepaths[-1], melody, seed=i)
+        audio_length = sum(max(start+length for _, start, length in melody)
+                           for melody in melodies)
+
+        def detect_builtin(filepath):
+            samples, sample_rate = \
+             submodules.pitch_detection.read_wav_samples(filepath)
+            return submodules.pitch_detection.get_midi_notes(samples,
+                                                             sample_rate)
+
+        def detect_aubio(filepath):
+            out = subprocess.check_output([aubio_command, "-i", filepath],
+                                          universal_newlines=True)
+            return data._get_midi_notes_from_aubio_output(out)
+
+        engines = [("builtin", detect_builtin)]
+        aubio_command = shutil.which("aubionotes")
+        if aubio_command is not None:
+            engines.append(("aubio", detect_aubio))
+        for name, detect in engines:
+            start = time.perf_counter()
+            detections = [detect(filepath) for filepath in filepaths]
+            duration = time.perf_counter() - start
+            accuracies = [_get_transcription_accuracy(melody, midi_notes)
+                          for melody, midi_notes in zip(melodies, detections)]
+            results[name+"_time"] = (duration*1000, "ms")
+            results[name+"_realtime_factor"] = (audio_length/duration, "x")
+            results[name+"_recall"] = (
+             sum(recall for recall, _ in accuracies)/num_files, "%")
+            results[name+"_pitch_error"] = (
+             sum(error for _, error in accuracies)/num_files, "cents")
+
+        # Live transcription of PyAudio-like chunks of 1024 samples.
+        with wave.open(filepaths[0], "rb") as f:
+            pcm = f.readframes(f.getnframes())
+            sample_rate = f.getframerate()
+        detector = submodules.pitch_detection.StreamingNoteDetector(sample_rate)
+        for i in range(0, len(pcm), 2048):
+            detector.add_chunk(pcm[i:i+2048])
+        detector.finish()
+        stats = detector.get_stats()
+        results["streaming_chunk_latency"] = (stats["mean_latency_ms"], "ms")
+        results["streaming_max_chunk_latency"] = (stats["max_latency_ms"], "ms")
+    return results
+
+
+def benchmark_parallel_transcription(num_phrases=48, segment_length=15.0,
+                                     repetitions=1):
+    """Returns the times of the serial and the segment-parallel transcription of a long .wav file.
+
+    The file consists of synthesized phrases of 16 notes, separated by
+    rests. The parallel transcription is measured with 2, 4, 8... worker
+    processes and with one per CPU. Its agreement is the percentage of serially
+    detected notes which are also detected, identically, by it.
+
+    Arguments:
+    >num_phrases=48: The number of phrases of the file.
+    >segment_length=15.0: The targeted segment length in seconds.
+    >repetitions=1: The number of measured repetitions.
+    """
+    import submodules.pitch_detection
+    melody = []
+    phrase_start = 0.0
+    for seed in range(num_phrases):
+        phrase = _get_synthetic_melody(16, seed)
+        melody.extend((midi_number, phrase_start+start, length)
+                      for midi_number, start, length in phrase)
+        phrase_start = melody[-1][1] + melody[-1][2] + .5
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepath = os.path.join(temp_path, "long.wav")
+        _write_synthetic_wav(filepath, melody)
+        read = submodules.pitch_detection.read_midi_notes_from_wav
+        serial_midi_notes = read(filepath)
+        serial_time = _get_best_time(lambda: read(filepath), repetitions)
+        results["serial"] = (serial_time, "ms")
+        get_key = lambda midi_note: (midi_note.midi_number, midi_note.cents,
+                                     midi_note.start, midi_note.length)
+        serial_keys = [get_key(midi_note) for midi_note in serial_midi_notes]
+        num_cpus = os.cpu_count() or 1
+        worker_numbers = [2**i for i in range(1, num_cpus.bit_length())
+                          if 2**i < num_cpus] + [max(2, num_cpus)]
+        for num_workers in worker_numbers:
+            parallel_midi_notes = read(filepath, num_workers=num_workers,
+                                       segment_length=segment_length)
+            parallel_time = _get_best_time(
+                             lambda: read(filepath, num_workers=num_workers,
+                                          segment_length=segment_length),
+                             repetitions)
+            name = "parallel_%d_workers" % num_workers
+            results[name] = (parallel_time, "ms")
+            results[name+"_speedup"] = (serial_time/parallel_time, "x")
+            parallel_keys = set(get_key(midi_note)
+                                for midi_note in parallel_midi_notes)
+            results[name+"_agreement"] = (
+             sum(key in parallel_keys for key in serial_keys) /
+             len(serial_keys) * 100, "%")
+    return results
+
+
+def benchmark_batch_transcription(num_files=8, num_notes=40):
+    """Returns the times of a folder transcription without and with a filled transcription cache.
+
+    Arguments:
+    >num_files=8: The number of synthesized .wav files in the folder.
+    >num_notes=40: The number of notes per file.
+    """
+    import submodules.batch_transcription
+    data = _load_data([])
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as temp_path:
+        input_path = os.path.join(temp_path, "wav")
+        os.makedirs(input_path)
+        for seed in range(num_files):
+            _write_synthetic_wav(os.path.join(input_path, "%d.wav" % seed),
+                                 _get_synthetic_melody(num_notes, seed),
+                                 seed=seed)
+        cache_path = os.path.join(temp_path, "cache", "")
+
+        def transcribe(use_cache):
+            return submodules.batch_transcription.transcribe_folder(
+                    data, input_path, os.path.join(temp_path, "scores"), ".8",
+                    [], "C", 2, "C", 7, next(iter(data.clefs)),
+                    next(iter(data.modes)), next(iter(data.midi_instruments)),
+                    use_cache=use_cache, cache_path=cache_path)
+
+        for name, use_cache in (("uncached", False), ("cold_cache", True),
+                                ("warm_cache", True)):
+            start = time.perf_counter()
+            transcription_results = transcribe(use_cache)
+            results[name] = ((time.perf_counter() - start) * 1000, "ms")
+        results["warm_cache_hit_rate"] = (
+         sum(result.cached for result in transcription_results) /
+         num_files * 100, "%")
+    return results
+
+
+def _read_wav_samples_wave(filepath):
+    """Returns the (mono samples, sample rate) of a 16 or 24 bit .wav file, read at once with the wave module.
+
+    This is the previous .wav reading of the built-in pitch detection, as
+    reference for submodules.pitch_detection.read_wav_samples().
+
+    Arguments:
+    >filepath: The .wav file's path.
+    """
+    import numpy # Optional dependency, see INSTALL.txt.
+    with wave.open(filepath, "rb") as f:
+        num_channels = f.getnchannels()
+        sample_width = f.getsampwidth()
+        sample_rate = f.getframerate()
+        frames = f.readframes(f.getnframes())
+    if sample_width == 3:
+        raw = numpy.frombuffer(frames, dtype=numpy.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(numpy.int32) |
+                   (raw[:, 1].astype(numpy.int32) << 8) |
+                   (raw[:, 2].astype(numpy.int8).astype(numpy.int32) << 16))
+        samples = samples / float(1 << 23)
+    else:
+        samples = numpy.frombuffer(frames, dtype="<i2") / 32768
+    return samples.reshape(-1, num_channels).mean(axis=1), sample_rate
+
+
+def benchmark_wav_reading(seconds=120, repetitions=3):
+    """Returns the times and memory peaks of reading a long stereo 24 bit .wav file.
+
+    The memory mapped reader of submodules.pitch_detection is compared with
+    reading the whole file with the wave module.
+
+    Arguments:
+    >seconds=120: The .wav file's length in seconds.
+    >repetitions=3: The number of measured repetitions.
+    """
+    import numpy # Optional dependency, see INSTALL.txt.
+    import submodules.pitch_detection
+    sample_rate = 44100
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as temp_path:
+        filepath = os.path.join(temp_path, "long.wav")
+        samples = numpy.random.default_rng(0).integers(
+                   -2**23, 2**23, (seconds*sample_rate, 2), dtype="<i4")
+        with wave.open(filepath, "wb") as f:
+            f.setnchannels(2)
+            f.setsampwidth(3)
+            f.setframerate(sample_rate)
+            f.writeframes(samples.view(numpy.uint8).reshape(-1, 4)[:, :3]
+                          .tobytes())
+        del samples
+
+        for name, read in (("wave_module", _read_wav_samples_wave),
+                           ("mmap", submodules.pitch_detection
+                                     .read_wav_samples)):
+            results[name+"_time"] = (
+             _get_best_time(lambda: read(filepath), repetitions), "ms")
+            tracemalloc.start()
+            read(filepath)
+            results[name+"_peak_memory"] = (
+             tracemalloc.get_traced_memory()[1] / 1024, "KiB")
+            tracemalloc.stop()
+
+        # Block by block reading, as done by the pitch detection.
+        def read_blocks():
+            for _ in submodules.pitch_detection.iter_wav_blocks(filepath):
+                pass
+        results["mmap_blocks_time"] = (_get_best_time(read_blocks,
+                                                      repetitions), "ms")
+        tracemalloc.start()
+        read_blocks()
+        results["mmap_blocks_peak_memory"] = (
+         tracemalloc.get_traced_memory()[1] / 1024, "KiB")
+        tracemalloc.stop()
+    return results
+
+
+def _get_synthetic_midi_notes(data, num_notes, outlier_rate=0.0, seed=0):
+    """Returns random played MidiNote instances and the divisions of their written note lengths.
+
+    The notes are played legato with a random tempo and a random timing
+    deviation of up to 8 %. The shortest written note length is a 16th.
+    With outliers, very short notes (e.g. false detections at onsets) are
+    inserted, which have no written note length (None).
+
+    Arguments:
+    >data: The BachBroData instance.
+    >num_notes: The number of (not inserted) notes.
+    >outlier_rate=0.0: The probability of an inserted note after a note.
+    >seed=0: The random generator's seed.
+    """
+    generator = random.Random(seed)
+    division_length = generator.uniform(.4, .8) / \
+                      data.note_lengths["quarter"]["divisions"]
+    divisions = [generator.choice([4, 8, 8, 12, 16, 16, 24, 32])
+                 for _ in range(num_notes)]
+    divisions[0] = 4
+    midi_notes = []
+    written_divisions = []
+    start = 0.0
+    for note_divisions in divisions:
+        length = note_divisions * division_length *\
+                 generator.uniform(.92, 1.08)
+        midi_notes.append(submodules.bachbro_data.MidiNote(
+                           60, start, start+length))
+        written_divisions.append(note_divisions)
+        start += length
+        if generator.random() < outlier_rate:
+            midi_notes.append(submodules.bachbro_data.MidiNote(
+                               60, start, start+.015))
+            written_divisions.append(None)
+            start += .015
+    return midi_notes, written_divisions
+
+
+def _get_synthetic_equal_midi_notes(data, num_notes, seed=0):
+    """Returns played MidiNote instances of equal written 16ths and their divisions.
+
+    The notes are played staccato with a random tempo and a random timing
+    deviation of up to 2 % of their inter-onset intervals, so that the
+    intervals' tempo votes may be split into neighbouring histogram bins.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >num_notes: The number of notes.
+    >seed=0: The random generator's seed.
+    """
+    generator = random.Random(seed)
+    divisions = data.note_lengths["16th"]["divisions"]
+    interval = generator.uniform(.3, .9)
+    length = interval * generator.uniform(.7, .95)
+    midi_notes = []
+    start = 0.0
+    for _ in range(num_notes):
+        midi_notes.append(submodules.bachbro_data.MidiNote(
+                           60, start, start+length))
+        start += interval * generator.uniform(.98, 1.02)
+    return midi_notes, [divisions] * num_notes
+
+
+def benchmark_rhythm_quantization(num_notes=1000, repetitions=5):
+    """Returns the times and accuracies of the tempo estimating and of the normalizing note length quantization.
+
+    The accuracy is the percentage of (not inserted) notes which get their
+    written note length, with and without inserted outlier notes, and for
+    short phrases of equal notes with a jittered timing.
+
+    Arguments:
+    >num_notes=1000: The number of notes.
+    >repetitions=5: The number of measured repetitions.
+    """
+    data = _load_data(["note_lengths"])
+    allowed_lengths = collections.OrderedDict(data.note_lengths)
+    names = list(allowed_lengths)
+    results = collections.OrderedDict()
+    quantizations = (
+     ("normalizing",
+      lambda midi_notes: data._get_normalized_note_lengths(midi_notes,
+                                                           allowed_lengths)),
+     ("tempo_estimating",
+      lambda midi_notes: data.get_quantized_note_lengths(midi_notes, names)))
+    case_lists = (
+     ("", [_get_synthetic_midi_notes(data, num_notes, 0.0, seed)
+           for seed in range(5)]),
+     ("_with_outliers", [_get_synthetic_midi_notes(data, num_notes, .01, seed)
+                         for seed in range(5)]),
+     ("_equal_notes", [_get_synthetic_equal_midi_notes(data, 4, seed)
+                       for seed in range(200)]))
+    for case_name, cases in case_lists:
+        num_written_notes = sum(
+         sum(divisions is not None for divisions in written_divisions)
+         for _, written_divisions in cases)
+        for name, quantize in quantizations:
+            num_correct = 0
+            for midi_notes, written_divisions in cases:
+                durations = quantize(midi_notes)
+                num_correct += sum(
+                 data.note_lengths[duration]["divisions"] == divisions
+                 for duration, divisions in zip(durations, written_divisions))
+            if not case_name:
+                results[name] = (_get_best_time(
+                                  lambda: quantize(cases[0][0]),
+                                  repetitions), "ms")
+            results[name+"_accuracy"+case_name] = (
+             num_correct / num_written_notes * 100, "%")
+    return results
+
+
+def benchmark_profiling(num_calls=2000, repetitions=5):
+    """Returns the times of profiled method calls with disabled and enabled profiling.
+
+    The measured method is get_fitting_scales(), as it is one of the
+    fastest profiled methods, so that the profiling overhead is most
+    visible.
+
+    Arguments:
+    >num_calls=2000: The number of method calls per measurement.
+    >repetitions=5: The number of measured runs.
+    """
+    data = _load_data(["notes", "scales"])
+    notes_list = ["C", "E", "G"]
+    data.get_fitting_scales(notes_list)
+
+    def call():
+        for _ in range(num_calls):
+            data.get_fitting_scales(notes_list)
+
+    disabled_time = _get_best_time(call, repetitions)
+    data.profiler = submodules.profiling.Profiler()
+    enabled_time = _get_best_time(call, repetitions)
+    return collections.OrderedDict([
+            ("disabled", (disabled_time, "ms")),
+            ("enabled", (enabled_time, "ms"))])
+
+
+BENCHMARKS = collections.OrderedDict([
+    ("import", benchmark_import),
+    ("startup", benchmark_startup),
+    ("fretboard", benchmark_fretboard),
+    ("fitting_scales", benchmark_fitting_scales),
+    ("batch_queries", benchmark_batch_queries),
+    ("scale_samples", benchmark_scale_samples),
+    ("musicxml", benchmark_musicxml),
+    ("midi", benchmark_midi),
+    ("exercise", benchmark_exercise),
+    ("scale_book", benchmark_scale_book),
+    ("editor_launcher", benchmark_editor_launcher),
+    ("aubio_parsing", benchmark_aubio_parsing),
+    ("pitch_detection", benchmark_pitch_detection),
+    ("wav_reading", benchmark_wav_reading),
+    ("parallel_transcription", benchmark_parallel_transcription),
+    ("batch_transcription", benchmark_batch_transcription),
+    ("rhythm_quantization", benchmark_rhythm_quantization),
+    ("profiling", benchmark_profiling),
+    ("query_server", benchmark_query_server),
+])
+
+
+def _get_git_commit():
+    """Returns the current git commit hash, or None if it can't be determined."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except Exception:
+        return None
+
+
+def _is_regression(old_value, new_value, unit, threshold):
+    """Returns True if the new result is worse than the old one by more than the threshold.
+
+    Results in milliseconds, memory sizes, process numbers and pitch errors
+    are better if they are lower,
+    throughputs (units ending with '/s') and ratios are better if they are
+    higher.
+
+    Arguments:
+    >old_value: The old result's value.
+    >new_value: The new result's value.
+    >unit: The results' unit.
+    >threshold: The allowed relative worsening in percent.
+    """
+    if old_value == 0:
+        return False
+    change = (new_value - old_value) / old_value * 100
+    if unit in ("ms", "KiB", "processes", "cents"):
+        return change > threshold
+    return -change > threshold
+
+
+def run_benchmarks(names):
+    """Runs the given benchmarks and returns their results.
+
+    The results are a dictionary of '<benchmark>.<result>' names with
+    {"value": ..., "unit": ...} dictionaries. Benchmarks which need a
+    missing optional dependency (such as NumPy) are skipped.
+
+    Arguments:
+    >names: The names of the run benchmarks, see BENCHMARKS.
+    """
+    results = collections.OrderedDict()
+    for name in names:
+        try:
+            benchmark_results = BENCHMARKS[name]()
+        except ImportError as error:
+            print("%-45s skipped (%s)" % (name, error))
+            continue
+        for result_name, (value, unit) in benchmark_results.items():
+            full_name = name+"."+result_name
+            results[full_name] = {"value": value, "unit": unit}
+            print("%-45s %12.3f %s" % (full_name, value, unit))
+    return results
+
+
+def main(args):
+    """Runs the benchmarks, prints their results and optionally writes and compares them."""
+    parser = argparse.ArgumentParser(description="BachBro benchmark suite")
+    parser.add_argument("names", nargs="*",
+                        help="The run benchmarks (default: all): " +
+                             ", ".join(BENCHMARKS))
+    parser.add_argument("--json", help="Writes the results to this JSON file")
+    parser.add_argument("--compare",
+                        help="Compares the results with this older JSON "
+                             "results file")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Relative worsening (in percent) which counts "
+                             "as a regression (default: 10)")
+    arguments = parser.parse_args(args[1:])
+    for name in arguments.names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: "+name)
+
+    results = run_benchmarks(arguments.names or list(BENCHMARKS))
+    if arguments.json:
+        report = collections.OrderedDict([
+                  ("format_version", 1),
+                  ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%S")),
+                  ("git_commit", _get_git_commit()),
+                  ("python", platform.python_version()),
+                  ("platform", platform.platform()),
+                  ("cpus", os.cpu_count()),
+                  ("results", results)])
+        with open(arguments.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+    num_regressions = 0
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as f:
+            old_results = json.load(f)["results"]
+        print("\nComparison with "+arguments.compare+":")
+        for name, result in results.items():
+            if name not in old_results:
+                continue
+            old_value = old_results[name]["value"]
+            change = ((result["value"] - old_value) / old_value * 100
+                      if old_value else 0.0)
+            regression = _is_regression(old_value, result["value"],
+                                        result["unit"], arguments.threshold)
+            num_regressions += regression
+            print("%-45s %+8.1f %%%s" % (name, change,
+                                         "  REGRESSION" if regression else ""))
+    return 1 if num_regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
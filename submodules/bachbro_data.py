@@ -20,17 +20,52 @@
 
 This module contains all methods for the loading of the music theory data
 from the JSON files as well as for their analysis. It can be used
-independently from BachBro's GUI classes.
+independently from BachBro's GUI classes, and doesn't import tkinter:
+Errors are raised as exceptions, which are shown as error messages by
+the GUI classes.
 """
 
 import collections
+import functools
+import hashlib
 import json
 import os
+import pickle
 import random
 import subprocess
 import sys
-import tkinter.messagebox
-import xml.etree.ElementTree as et
+
+import submodules.editor_launcher
+import submodules.midi_writer
+import submodules.musicxml_writer
+import submodules.pitch_detection
+import submodules.profiling
+
+
+# The pitch detection engines of read_notes_from_wav().
+PITCH_DETECTION_ENGINES = ("built-in", "aubio")
+
+
+class CommandError(Exception):
+    """Raised if an external command (as set in the settings file) fails."""
+    def __init__(self, command, reason):
+        """Sets the exception's message.
+        
+        Arguments:
+        >command: The failed command.
+        >reason: The exception which was raised by the failed command.
+        """
+        super().__init__("Command "+repr(command)+" failed: "+str(reason))
+        self.command = command
+        self.reason = reason
+
+
+class AubioCommandError(CommandError):
+    """Raised if the aubionotes command can't be executed."""
+
+
+class SheetEditorCommandError(CommandError):
+    """Raised if the sheet editor command can't be executed."""
 
 
 class Note:
@@ -61,50 +96,285 @@ class Note:
         self.in_chord = in_chord
 
 
-class MidiNote:
-    """Class for a MIDI note as it is represented in an aubio output.
+class FrozenNote(Note):
+    """Unchangeable copy of a Note, as it is shared by cached scale samples."""
+    def __init__(self, note):
+        """Copies all member variables of the given Note instance.
+        
+        Arguments:
+        >note: The copied Note instance.
+        """
+        for name, value in vars(note).items():
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenNote instances can't be changed")
     
-    In this kind of outut, the note hat a MIDI number and a start and
-    end time.
+    def __delattr__(self, name):
+        raise AttributeError("FrozenNote instances can't be changed")
+
+
+# A cached scale or chord sample, see BachBroData.get_cached_scale_sample().
+# 'notes' is the tuple of the sample's FrozenNote instances, and
+# 'note_fragments' the tuple of their rendered MusicXML <note> elements.
+ScaleSample = collections.namedtuple("ScaleSample", ["notes", "note_fragments"])
+
+
+# The class of the MIDI notes of aubio and of the built-in pitch detection.
+# It is defined in submodules.pitch_detection, so that the pitch detection
+# doesn't need to import this module.
+MidiNote = submodules.pitch_detection.MidiNote
+
+
+class _JSONTable:
+    """Descriptor for a BachBroData table which is loaded on its first access.
+    
+    The loaded table is stored in the instance's dictionary under the same
+    name, so that all further accesses (and assignments) don't pass this
+    descriptor anymore.
+    """
+    def __init__(self, filename):
+        """Sets the table's JSON file name.
+        
+        Arguments:
+        >filename: The name of the table's JSON file in the BachBroData
+                   instance's data path. The table's attribute name is
+                   the file name without its '.json' ending.
+        """
+        self.filename = filename
+        self.name = filename[:-len(".json")]
+    
+    def __get__(self, instance, owner):
+        """Loads, stores and returns the instance's table."""
+        if instance is None:
+            return self
+        table = instance._get_json_file_data(instance.datapath+self.filename)
+        instance.__dict__[self.name] = table
+        return table
+
+
+class _Index:
+    """Decorator for a BachBroData index which is built on its first access.
+    
+    The decorated method builds the index. Like with _JSONTable, the built
+    index is stored in the instance's dictionary under the method's name.
     """
-    def __init__(self, midi_number, start, end):
-        """Sets all MidiNote member variables.
+    def __init__(self, build_function):
+        """Sets the index building method.
         
         Arguments:
-        >midi_number: The MIDI note's midi number.
-        >start: The MIDI note's start time.
-        >end: The MIDI note's end time. It will be stored as 'length' after
-              the variable 'start' is substracted of it.
+        >build_function: The BachBroData method which returns the index.
         """
-        self.midi_number = int(float(midi_number))
-        self.length = float(end) - float(start)
+        self.build_function = build_function
+        self.name = build_function.__name__
+        self.__doc__ = build_function.__doc__
+    
+    def __get__(self, instance, owner):
+        """Builds, stores and returns the instance's index."""
+        if instance is None:
+            return self
+        index = self.build_function(instance)
+        instance.__dict__[self.name] = index
+        return index
 
 
 class BachBroData:
-    """Main class for storage and processing of music theory data."""
-    def __init__(self, datapath):
-        """Constructor. Loads JSON data into Python variables.
+    """Main class for storage and processing of music theory data.
+    
+    The JSON data tables are loaded on their first access, so that callers
+    only pay for the tables which they actually use.
+    """
+    clefs = _JSONTable("clefs.json")
+    genres = _JSONTable("genres.json")
+    instruments = _JSONTable("instruments.json")
+    intervals = _JSONTable("intervals.json")
+    midi_instruments = _JSONTable("midi_instruments.json")
+    modes = _JSONTable("modes.json")
+    note_lengths = _JSONTable("note_lengths.json")
+    notes = _JSONTable("notes.json")
+    scales = _JSONTable("scales.json")
+    settings = _JSONTable("settings.json")
+    
+    def __init__(self, datapath, use_snapshots=True, sample_cache_size=256):
+        """Constructor. Sets the paths of the JSON data.
         
         Most defined member variables are ordered dictionaries containing
-        the JSON data.
+        the JSON data. They are loaded on their first access.
         
         Arguments:
         >datapath: The path of the music theory data's JSON files.
+        >use_snapshots=True: True, if the JSON data shall be read from
+                             (and written to) the binary snapshot files
+                             in the data path's 'snapshots' subfolder.
+                             False, if the JSON files shall always be
+                             parsed.
+        >sample_cache_size=256: The maximal number of scale samples kept
+                                by get_cached_scale_sample().
         """
-        self.clefs = self._get_json_file_data(datapath+"clefs.json")
-        self.genres = self._get_json_file_data(datapath+"genres.json")
-        self.instruments = self._get_json_file_data(datapath+"instruments.json")
-        self.intervals = self._get_json_file_data(datapath+"intervals.json")
-        self.midi_instruments = self._get_json_file_data(datapath+"midi_instruments.json")
-        self.modes = self._get_json_file_data(datapath+"modes.json")
-        self.note_lengths = self._get_json_file_data(datapath+"note_lengths.json")
-        self.notes = self._get_json_file_data(datapath+"notes.json")
-        self.scales = self._get_json_file_data(datapath+"scales.json")
+        self.datapath = datapath
+        self.use_snapshots = use_snapshots
+        self.snapshot_path = datapath+"snapshots/"
+        self.transcription_cache_path = datapath+"transcriptions/"
+        self.transcription_cache_stats = {"hits": 0, "misses": 0}
         self.settings_path = datapath+"settings.json" # Used by ChangeSubwindow.
-        self.settings = self._get_json_file_data(self.settings_path)
+        # Profiling is enabled by setting a submodules.profiling.Profiler
+        # instance, which then measures the export and transcription methods
+        # as well as the aubio and sheet editor subprocesses.
+        self.profiler = None
+        self._get_cached_scale_sample = functools.lru_cache(sample_cache_size)(
+                                         self._create_scale_sample)
+        # Tracks, reaps and coalesces the sheet editor processes, see
+        # open_with_sheet_editor().
+        self.sheet_editor_launcher = \
+         submodules.editor_launcher.SheetEditorLauncher()
+    
+    @_Index
+    def note_cents_by_name(self):
+        """Dictionary of all note names with their cents to the next lower C."""
+        return collections.OrderedDict(
+                (note_name, note["centsToC"])
+                for note_name, note in self.notes.items())
+    
+    @_Index
+    def note_names_by_cents(self):
+        """Dictionary of cents to the next lower C with their note names.
+        
+        If several notes have the same cents, the first one in the notes
+        JSON data is used.
+        """
+        note_names_by_cents = {}
+        for note_name, cents in self.note_cents_by_name.items():
+            note_names_by_cents.setdefault(cents, note_name)
+        return note_names_by_cents
+    
+    @_Index
+    def pitch_class_bits(self):
+        """Dictionary of cents to the next lower C with their pitch class bit.
+        
+        Every distinct cents value of the notes (i.e. every quarter tone
+        pitch class) gets its own bit of a pitch class bitmask.
+        """
+        return {cents: 1 << i
+                for i, cents in enumerate(self.note_names_by_cents)}
+    
+    @_Index
+    def scale_catalogue(self):
+        """List of all scale transpositions with their pitch class bitmasks.
+        
+        Each element is a (bitmask, keynote name, scale name) tuple. The
+        list contains every scale (in the scales JSON data order) in every
+        keynote (in the notes JSON data order). Chromatic scales are
+        excluded, as they fit to all notes.
+        """
+        scale_catalogue = []
+        for scale_name, scale in self.scales.items():
+            if "chromatic" in scale_name:
+                continue
+            scale_cents = scale["notesInCentsToKeynote"]
+            for keynote_name, keynote_cents in self.note_cents_by_name.items():
+                scale_mask = self.get_pitch_class_mask(
+                              i + keynote_cents for i in scale_cents)
+                scale_catalogue.append((scale_mask, keynote_name, scale_name))
+        return scale_catalogue
+    
+    @_Index
+    def scale_names_by_structure(self):
+        """Dictionary of normalized interval structures with the scales sharing them.
+        
+        A normalized interval structure is the sorted tuple of a scale's
+        distinct cents to its keynote (modulo an octave). As all scales are
+        given relative to their keynote, two scales in the same keynote have
+        the same notes if and only if they have the same normalized
+        interval structure.
+        """
+        scale_names_by_structure = collections.OrderedDict()
+        for scale_name in self.scales:
+            structure = self.get_interval_structure(scale_name)
+            scale_names_by_structure.setdefault(structure, []).append(scale_name)
+        return scale_names_by_structure
+    
+    @_Index
+    def scale_catalogue_masks(self):
+        """NumPy array of the scale catalogue's pitch class bitmasks.
+        
+        This is the (scales x transpositions x pitch classes) matrix of the
+        scale catalogue, with the pitch class axis packed into the bits of
+        unsigned 64 bit integers.
+        """
+        import numpy # Optional dependency, only needed for batch queries.
+        return numpy.array([scale_mask for scale_mask, _, _ in self.scale_catalogue],
+                           dtype=numpy.uint64)
+    
+    @_Index
+    def scale_catalogue_names(self):
+        """List of the scale catalogue entries' 'keynote - scale' names."""
+        return [keynote_name+" - "+scale_name
+                for _, keynote_name, scale_name in self.scale_catalogue]
+    
+    @_Index
+    def scale_catalogue_bitsets(self):
+        """Inverted scale catalogue index from pitch classes to catalogue entries.
+        
+        The dictionary contains every pitch class bit with the bitset of the
+        scale catalogue entries containing the pitch class. Bit i of a
+        bitset stands for the i-th scale catalogue entry.
+        """
+        # The bitsets are built as binary digit strings (with the first entry
+        # as the last digit), as shifting and or-ing of growing integers
+        # would be quadratic in the catalogue's size.
+        num_entries = len(self.scale_catalogue)
+        digits_by_bit = {pitch_class_bit: bytearray(b"0" * num_entries)
+                         for pitch_class_bit in self.pitch_class_bits.values()}
+        for i, (scale_mask, _, _) in enumerate(self.scale_catalogue):
+            for pitch_class_bit, digits in digits_by_bit.items():
+                if scale_mask & pitch_class_bit:
+                    digits[num_entries-1-i] = ord("1")
+        return {pitch_class_bit: int(digits or b"0", 2)
+                for pitch_class_bit, digits in digits_by_bit.items()}
+    
+    def load_all_tables(self):
+        """Loads all JSON data tables which were not loaded yet."""
+        for name, value in vars(BachBroData).items():
+            if isinstance(value, _JSONTable):
+                getattr(self, name)
+    
+    def _get_file_hash(self, filepath):
+        """Returns the SHA-1 hex digest of the given file's content.
+        
+        Arguments:
+        >filepath: The file's path.
+        """
+        file_hash = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            # Read in blocks, as also long recordings are hashed.
+            for block in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
     
     def _get_json_file_data(self, filepath):
-        """Returns an ordered dict containing the JSON fiel data.
+        """Returns an ordered dict containing the JSON file data.
+        
+        If snapshots are used, the data is read from the JSON file's
+        snapshot as long as the JSON file was not changed since the
+        snapshot was written. Otherwise, the JSON file is parsed and its
+        snapshot is (re)written.
+        
+        Arguments:
+        >filepath: The JSON file's path
+        """
+        if not self.use_snapshots:
+            return self._parse_json_file(filepath)
+        
+        snapshot_filepath = self.snapshot_path +\
+                            os.path.basename(filepath) + ".pickle"
+        json_data = self._read_snapshot(filepath, snapshot_filepath)
+        if json_data is None:
+            json_data = self._parse_json_file(filepath)
+            self._write_snapshot(filepath, snapshot_filepath, json_data)
+        return json_data
+    
+    def _parse_json_file(self, filepath):
+        """Returns an ordered dict containing the parsed JSON file data.
         
         Arguments:
         >filepath: The JSON file's path
@@ -114,132 +384,635 @@ class BachBroData:
                                    object_pairs_hook=collections.OrderedDict)
         return json_data
     
+    def _read_snapshot(self, filepath, snapshot_filepath):
+        """Returns the snapshot's data, or None if the snapshot is missing or outdated.
+        
+        A snapshot file consists of two pickles: The source stamp (the
+        JSON file's modification time, size and hash) and the data itself.
+        The data is only unpickled if the JSON file's modification time and
+        size are unchanged, or, if they changed, the file's hash is still
+        the same. In the latter case, the snapshot's stamp is refreshed.
+        
+        Arguments:
+        >filepath: The JSON file's path.
+        >snapshot_filepath: The path of the JSON file's snapshot.
+        """
+        try:
+            file_stat = os.stat(filepath)
+            with open(snapshot_filepath, "rb") as f:
+                stamp = pickle.load(f)
+                if (stamp["mtime"] == file_stat.st_mtime_ns) and\
+                   (stamp["size"] == file_stat.st_size):
+                    return pickle.load(f)
+                if stamp["hash"] != self._get_file_hash(filepath):
+                    return None
+                json_data = pickle.load(f)
+        except Exception:
+            return None
+        
+        self._write_snapshot(filepath, snapshot_filepath, json_data)
+        return json_data
+    
+    def _write_snapshot(self, filepath, snapshot_filepath, json_data):
+        """Writes the snapshot of the given JSON file data.
+        
+        The snapshot is written to a unique temporary file first, which
+        then replaces the old snapshot, so that concurrently started
+        processes and threads never read a half-written snapshot. If the snapshot can't be written
+        (e.g. in a read-only installation), nothing happens.
+        
+        Arguments:
+        >filepath: The JSON file's path.
+        >snapshot_filepath: The path of the JSON file's snapshot.
+        >json_data: The JSON file's parsed data.
+        """
+        import tempfile # Only needed for writing snapshots.
+        try:
+            file_stat = os.stat(filepath)
+            stamp = {"mtime": file_stat.st_mtime_ns,
+                     "size": file_stat.st_size,
+                     "hash": self._get_file_hash(filepath)}
+            os.makedirs(self.snapshot_path, exist_ok=True)
+            temp_file, temp_filepath = tempfile.mkstemp(
+                                        dir=self.snapshot_path,
+                                        prefix=os.path.basename(
+                                                snapshot_filepath)+".")
+        except OSError:
+            return
+        try:
+            with os.fdopen(temp_file, "wb") as f:
+                pickle.dump(stamp, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(json_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_filepath, snapshot_filepath)
+        except OSError:
+            try:
+                os.remove(temp_filepath)
+            except OSError:
+                pass
+    
+    def _create_scale_sample(self, keynote, name, start_octave, chord):
+        """Returns the ScaleSample of the given non-randomized scale sample.
+        
+        This is the uncached version of get_cached_scale_sample(), see
+        there for the arguments.
+        """
+        notes = tuple(FrozenNote(note)
+                      for note in self.get_scale_sample(keynote, name,
+                                                        start_octave, chord))
+        writer = submodules.musicxml_writer.MusicXMLWriter(None,
+                                                           self.note_lengths)
+        note_fragments = tuple(writer.get_note_fragment(note) for note in notes)
+        return ScaleSample(notes, note_fragments)
+    
+    @submodules.profiling.profiled
+    def create_midi(self, filepath, title, instrument, notes, tempo=120):
+        """Creates and writes a Standard MIDI File of the given notes.
+        
+        Quarter tones are written as pitch bends, see
+        submodules.midi_writer.
+        
+        Arguments:
+        >filepath: The absolute filepath of the generated MIDI file.
+        >title: The track's name.
+        >instrument: The MIDI instrument of the track.
+        >notes: The iterable of the track's Note instances, or a
+                ScaleSample.
+        >tempo=120: The tempo in quarter notes per minute.
+        """
+        if isinstance(notes, ScaleSample):
+            notes = notes.notes
+        writer = submodules.midi_writer.MidiWriter(self.note_lengths,
+                                                   tempo=tempo)
+        with open(filepath, "wb") as f:
+            writer.write(f, notes,
+                         self.midi_instruments[instrument]["midiNumber"],
+                         title)
+    
+    @submodules.profiling.profiled
     def create_musicxml(self, filepath, title, clef, mode, instrument,
-                        notes):
+                        notes, time_signature=None):
         """Creates and writes a MusicXML file containing the selected scale sample.
         
+        The MusicXML is streamed to the file while the notes are iterated,
+        so that the notes may also be given by a generator. If the file
+        path ends with '.mxl', a compressed MusicXML file is written.
+        
         Arguments:
         >filepath: The absolute filepath of the generated MusicXML file.
         >title: The sheet's title.
         >clef: The sheet's clef.
         >mode: The flats/sharps at the beginning of the sheet.
         >instrument: The MIDI instrument of the sheet.
+        >notes: The iterable of the sheet's Note instances, or a
+                ScaleSample whose pre-rendered notes are written.
+        >time_signature=None: The (beats, beat type) tuple of the sheet's
+                              time signature, e.g. (3, 4). If given, the
+                              measures are filled by the notes' lengths
+                              (see get_exercise_notes()). If None, no time
+                              signature is written, and a new measure is
+                              started after 25 notes.
         """
-        # "score" includes all MusicXML file elements.
-        score = et.Element("score-partwise", version="3.0")
-        
-        # General score information without notes.
-        work = et.SubElement(score, "work")
-        et.SubElement(work, "work-title").text = str(title)
-       
-        score_part = et.SubElement(score, "part-list")
-        part_list = et.SubElement(score_part,
-                                  "score-part",
-                                  id="P1")
-        et.SubElement(part_list, "part-name").text = str(instrument)
-        
-        score_instrument = et.SubElement(part_list,
-                                         "score-instrument",
-                                         id="P1-I3")
-        et.SubElement(score_instrument, "instrument-name").text = str(instrument)
-        
-        midi_instrument = et.SubElement(part_list,
-                                        "midi-instrument",
-                                        id="P1-I3")
-        et.SubElement(midi_instrument, "midi-channel").text = "1"
-        et.SubElement(midi_instrument, "midi-program").text =\
-         str(self.midi_instruments[instrument]["midiNumber"])
-        et.SubElement(midi_instrument, "volume").text = "100"
-        et.SubElement(midi_instrument, "pan").text = "0"
-        
-        # Score notes.
-        part = et.SubElement(score, "part", id="P1")
-        measure = et.SubElement(part, "measure", number="1")
-        attributes = et.SubElement(measure, "attributes")
-        et.SubElement(attributes, "divisions").text =\
-         str(self.note_lengths["quarter"]["divisions"])
-        key = et.SubElement(attributes, "key")
-        mode_data = self.modes[mode]
-        et.SubElement(key, "fifths").text = str(mode_data["numberSharps"])
-        clef_data = self.clefs[clef]
-        clef = et.SubElement(attributes, "clef")
-        et.SubElement(clef, "sign").text = str(clef_data["sign"])
-        et.SubElement(clef, "line").text = str(clef_data["line"])
-        et.SubElement(clef, "clef-octave-change").text = str(clef_data["octave_change"])
-        
-        max_notes_per_measure = 25 # More than possible for a scale sample
-        note_num = 0
-        measure_num = 1
-        for note_data in notes:
-            if (note_num%max_notes_per_measure == 0) and (note_num > 0):
-                measure = et.SubElement(part, "measure", number=str(measure_num))
-                measure_num += 1
-            note = et.SubElement(measure, "note")
-            
-            if note_data.in_chord:
-                et.SubElement(note, "chord")
-            pitch = et.SubElement(note, "pitch")
-            et.SubElement(pitch, "step").text = str(note_data.name[0])
-            if note_data.alter != "":
-                et.SubElement(pitch, "alter").text = str(note_data.alter)
-            et.SubElement(pitch, "octave").text = str(note_data.octave)
-            
-            et.SubElement(note, "duration").text = str(self.note_lengths[note_data.duration]["divisions"])
-            et.SubElement(note, "type").text = self.note_lengths[note_data.duration]["musicXMLType"]
-            if self.note_lengths[note_data.duration]["musicXMLAddition"] != "":
-                et.SubElement(note, self.note_lengths[note_data.duration]["musicXMLAddition"])
-            
-            if note_data.accidental != "":
-                et.SubElement(note, "accidental").text = str(note_data.accidental)
-            else:
-                note_num += 1
+        with submodules.musicxml_writer.open_musicxml_file(filepath) as f:
+            self.write_musicxml(f, title, clef, mode, instrument, notes,
+                                time_signature)
+    
+    def create_score(self, filepath, title, clef, mode, instrument, notes):
+        """Creates a MusicXML or, if the file path ends with '.mid', a MIDI file.
         
-        # Add XML document type information.
-        xml_tree =  '<?xml version="1.0" encoding="UTF-8"?>\n'
-        xml_tree += '<!DOCTYPE score-partwise PUBLIC '\
-                    '"-//Recordare//DTD MusicXML 3.0 Partwise//EN" '\
-                    '"http://www.musicxml.org/dtds/partwise.dtd">'
-        xml_tree += et.tostring(score, encoding="unicode") #et.ElementTree(score)       
-        xml_tree = xml_tree.replace("><", ">\n<")
+        See create_musicxml() for the arguments. The clef and the mode
+        are not used by MIDI files.
+        """
+        if filepath.lower().endswith(
+                submodules.midi_writer.MIDI_FILE_EXTENSIONS):
+            self.create_midi(filepath, title, instrument, notes)
+        else:
+            self.create_musicxml(filepath, title, clef, mode, instrument,
+                                 notes)
+    
+    def write_musicxml(self, f, title, clef, mode, instrument, notes,
+                       time_signature=None):
+        """Streams the MusicXML of the given notes to the given text file handle.
         
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(xml_tree)
+        See create_musicxml() for the arguments, with the exception of:
+        >f: The text file handle to which the MusicXML is written.
+        """
+        measure_divisions = None
+        if time_signature is not None:
+            measure_divisions = self.get_measure_divisions(time_signature)
+        writer = submodules.musicxml_writer.MusicXMLWriter(
+                  f, self.note_lengths, measure_divisions=measure_divisions)
+        writer.write_header(title, instrument,
+                            self.midi_instruments[instrument]["midiNumber"],
+                            self.note_lengths["quarter"]["divisions"],
+                            self.modes[mode]["numberSharps"],
+                            self.clefs[clef], time_signature)
+        if isinstance(notes, ScaleSample):
+            for note, fragment in zip(notes.notes, notes.note_fragments):
+                divisions = 0
+                if not note.in_chord:
+                    divisions = self.note_lengths[note.duration]["divisions"]
+                writer.write_note_fragment(fragment, note.accidental == "",
+                                           divisions)
+        else:
+            for note in notes:
+                writer.write_note(note)
+        writer.write_end()
     
+    def get_cached_scale_sample(self, keynote, name, start_octave, chord=False):
+        """Returns the ScaleSample of a scale or chord sample from an LRU cache.
+        
+        The cached samples are shared by all callers, so that their notes
+        are unchangeable FrozenNote instances. A ScaleSample can be given
+        to create_musicxml() instead of a list of notes, which then writes
+        the pre-rendered note elements. Randomized samples can't be cached,
+        see get_scale_sample() for them.
+        
+        Arguments:
+        >keynote: The keynote if the sample's scale or chord.
+        >name: The name of the sample's scale or chord.
+        >start_octave: The start octave of the sample.
+        >chord=False: True, if a chord sample shall be returned instead of
+                      a scale sample.
+        """
+        return self._get_cached_scale_sample(keynote, name, int(start_octave),
+                                             bool(chord))
+    
+    def get_catalogue_scale_names(self, bitset):
+        """Returns the scale names of the scale catalogue entries in the given bitset.
+        
+        Every returned scale name has the form 'keynote - scale', in the
+        scale catalogue's order.
+        
+        Arguments:
+        >bitset: The bitset of scale catalogue entries, see
+                 get_fitting_catalogue_bitset().
+        """
+        scale_names = []
+        # Reversed binary digits, so that the i-th digit is the i-th entry.
+        digits = format(bitset, "b")[::-1]
+        i = digits.find("1")
+        while i >= 0:
+            scale_names.append(self.scale_catalogue_names[i])
+            i = digits.find("1", i+1)
+        return scale_names
+    
+    def get_exercise_notes(self, keynote, name, start_octave, num_measures,
+                           time_signature=(4, 4), note_length_names=None,
+                           seed=None):
+        """Returns a generator of a randomized exercise's Note instances, measure by measure.
+        
+        Every note is a random note of the scale sample (see
+        get_scale_sample()) with a random note length. The note lengths
+        are chosen so that every measure is filled exactly according to the
+        time signature. As the notes are generated while they are iterated,
+        exercises of any length can be streamed to create_musicxml() (with
+        the same time signature) without holding them in memory.
+        Raises a ValueError if the note lengths can't fill a measure.
+        
+        Arguments:
+        >keynote: The keynote of the exercise's scale.
+        >name: The name of the exercise's scale.
+        >start_octave: The start octave of the scale sample.
+        >num_measures: The number of generated measures.
+        >time_signature=(4, 4): The (beats, beat type) tuple of the time
+                                signature.
+        >note_length_names=None: The list of the allowed note lengths (keys
+                                 of the note lengths JSON data). If None,
+                                 all note lengths are allowed.
+        >seed=None: The random generator's seed. If None, the exercise is
+                    different on every call.
+        """
+        measure_divisions = self.get_measure_divisions(time_signature)
+        if note_length_names is None:
+            note_length_names = list(self.note_lengths)
+        note_lengths = [(note_length_name,
+                         self.note_lengths[note_length_name]["divisions"])
+                        for note_length_name in note_length_names]
+        # fillable[i] is True if i divisions can be filled exactly.
+        fillable = [True] + [False]*measure_divisions
+        for i in range(1, measure_divisions+1):
+            fillable[i] = any(divisions <= i and fillable[i-divisions]
+                              for _, divisions in note_lengths)
+        if not fillable[measure_divisions]:
+            raise ValueError("The note lengths can't fill a measure of "
+                             "the time signature %d/%d" % time_signature)
+        
+        pitches = []
+        sample = self.get_cached_scale_sample(keynote, name, start_octave)
+        for note in sample.notes:
+            pitch = (note.name, note.octave, note.alter, note.accidental)
+            if pitch not in pitches:
+                pitches.append(pitch)
+        return self._generate_exercise_notes(pitches, note_lengths, fillable,
+                                             measure_divisions, num_measures,
+                                             random.Random(seed))
+    
+    def _generate_exercise_notes(self, pitches, note_lengths, fillable,
+                                 measure_divisions, num_measures, generator):
+        """Generator of the exercise notes, see get_exercise_notes().
+        
+        Arguments:
+        >pitches: The list of (name, octave, alter, accidental) tuples of
+                  the exercise's notes.
+        >note_lengths: The list of (note length name, divisions) tuples of
+                       the allowed note lengths.
+        >fillable: The list which tells for every number of divisions up
+                   to measure_divisions if it can be filled exactly.
+        >measure_divisions: The number of divisions of a measure.
+        >num_measures: The number of generated measures.
+        >generator: The random.Random instance.
+        """
+        for _ in range(num_measures):
+            remaining_divisions = measure_divisions
+            while remaining_divisions > 0:
+                note_length_name, divisions = generator.choice(
+                 [(note_length_name, divisions)
+                  for note_length_name, divisions in note_lengths
+                  if divisions <= remaining_divisions and
+                  fillable[remaining_divisions-divisions]])
+                remaining_divisions -= divisions
+                name_, octave, alter, accidental = generator.choice(pitches)
+                note_length = self.note_lengths[note_length_name]
+                yield Note(name=name_, octave=octave, alter=alter,
+                           accidental=accidental, duration=note_length_name,
+                           type_=note_length["musicXMLType"])
+    
+    def get_fitting_catalogue_bitset(self, notes_list, bitset=None):
+        """Returns the bitset of the scale catalogue entries containing the given notes.
+        
+        Bit i of the bitset is set if the i-th scale catalogue entry contains
+        all given notes. The bitset is the intersection of the notes' entries
+        in the inverted catalogue index, so that a given bitset of a note
+        subset can be narrowed by the remaining notes only.
+        
+        Arguments:
+        >notes_list: The given notes.
+        >bitset=None: The bitset which shall be narrowed. If None, all
+                      scale catalogue entries are narrowed.
+        """
+        if bitset is None:
+            bitset = (1 << len(self.scale_catalogue)) - 1
+        for note_name in notes_list:
+            pitch_class_bit = self.pitch_class_bits[
+                               self.note_cents_by_name[note_name] % 1200]
+            bitset &= self.scale_catalogue_bitsets[pitch_class_bit]
+        return bitset
+    
+    def get_duplicate_scales(self):
+        """Returns lists of scale names which share the same interval structure.
+        
+        Only non-empty interval structures are regarded, so that scale
+        list separators (such as '~~CHURCH MODES~~') are not reported.
+        """
+        return [scale_names
+                for structure, scale_names in self.scale_names_by_structure.items()
+                if structure and (len(scale_names) > 1)]
+    
+    @submodules.profiling.profiled
     def get_fitting_scales(self, notes_list):
-        """Returns scale names whiof scales containing the given notes.
+        """Returns scale names of scales containing the given notes.
+        
+        Every returned scale name has the form 'keynote - scale'. The
+        search is a bitmask test of the given notes against the scale
+        catalogue.
         
         Arguments:
         >notes_list: The given notes.
         """
-        notes_cents = [self.notes[i]["centsToC"] for i in notes_list]
-        scale_names = []
-        for scale_key in list(self.scales.keys()):
-            scale_cents = self.scales[scale_key]["notesInCentsToKeynote"]
+        notes_mask = self.get_pitch_class_mask(
+                      self.note_cents_by_name[i] for i in notes_list)
+        return [keynote_name+" - "+scale_name
+                for scale_mask, keynote_name, scale_name in self.scale_catalogue
+                if scale_mask & notes_mask == notes_mask]
+    
+    def get_fitting_scales_batch(self, notes_lists, max_matrix_size=2**23):
+        """Returns the fitting scales of many note lists at once.
+        
+        The result's i-th element is the list of scale names which
+        get_fitting_scales() returns for the i-th note list. All note lists
+        are tested against the whole scale catalogue with NumPy, in chunks
+        of note lists whose result matrix doesn't exceed the given size.
+        Identical note lists are only evaluated once.
+        NumPy has to be installed for this method.
+        
+        Arguments:
+        >notes_lists: The list of the given note lists.
+        >max_matrix_size=2**23: The maximal number of elements of a chunk's
+                                (note lists x scale catalogue) matrix.
+        """
+        import numpy # Optional dependency, only needed for batch queries.
+        if len(notes_lists) == 0:
+            return []
+        
+        query_masks = numpy.array([self.get_pitch_class_mask(
+                                    self.note_cents_by_name[i] for i in notes_list)
+                                   for notes_list in notes_lists],
+                                  dtype=numpy.uint64)
+        unique_masks, inverse = numpy.unique(query_masks, return_inverse=True)
+        
+        catalogue_masks = self.scale_catalogue_masks[numpy.newaxis, :]
+        catalogue_names = numpy.array(self.scale_catalogue_names, dtype=object)
+        chunk_size = max(1, max_matrix_size // max(1, len(self.scale_catalogue)))
+        unique_scale_names = []
+        for start in range(0, len(unique_masks), chunk_size):
+            masks = unique_masks[start:start+chunk_size, numpy.newaxis]
+            fitting = (catalogue_masks & masks) == masks
+            unique_scale_names += [catalogue_names[fitting_row].tolist()
+                                   for fitting_row in fitting]
+        return [list(unique_scale_names[i]) for i in inverse.ravel()]
+    
+    def get_measure_divisions(self, time_signature):
+        """Returns the number of divisions of a measure of the given time signature.
+        
+        Raises a ValueError if a measure has no whole number of divisions.
+        
+        Arguments:
+        >time_signature: The (beats, beat type) tuple of the time
+                         signature, e.g. (6, 8).
+        """
+        beats, beat_type = time_signature
+        whole_divisions = self.note_lengths["quarter"]["divisions"] * 4
+        if (beats <= 0) or (beat_type <= 0) or\
+           ((beats*whole_divisions) % beat_type != 0):
+            raise ValueError("Unsupported time signature %d/%d" %
+                             time_signature)
+        return beats*whole_divisions // beat_type
+    
+    def get_notes_from_midi_notes(self, midi_notes, disallowed_note_lengths,
+                                  min_note, min_octave, max_note, max_octave):
+        """Returns a list of Note instances of the given MidiNote instances.
+        
+        The MidiNote lengths are quantized to the allowed note lengths with
+        an estimated tempo, see get_quantized_note_lengths(). Without NumPy,
+        they are normalized by the shortest MidiNote length and rounded to
+        the nearest allowed note length instead. False is returned if no
+        MidiNote is given.
+        
+        Arguments:
+        >midi_notes: The list of MidiNote instances, e.g. from aubio.
+        >disallowed_note_lengths: See read_notes_from_wav().
+        >min_note: See read_notes_from_wav().
+        >min_octave: See read_notes_from_wav().
+        >max_note: See read_notes_from_wav().
+        >max_octave: See read_notes_from_wav().
+        """
+        # Create allowed note lengths dictionary.
+        allowed_lengths = collections.OrderedDict()
+        i = 0
+        for key in list(self.note_lengths.keys()):
+            if i not in disallowed_note_lengths:
+                allowed_lengths[key] = self.note_lengths[key]
+            i += 1
+        
+        if len(midi_notes) == 0:
+            return False
+        try:
+            durations = self.get_quantized_note_lengths(midi_notes,
+                                                        list(allowed_lengths))
+        except ImportError:
+            durations = self._get_normalized_note_lengths(midi_notes,
+                                                          allowed_lengths)
+        
+        # Create final Note instances.
+        notes = []
+        for midi_note, duration in zip(midi_notes, durations):
+            type_ = allowed_lengths[duration]
+            name, octave = self.get_note_name_and_octave(midi_note)
             
-            for keynote_name in list(self.notes.keys()):
-                keynote_cents = self.notes[keynote_name]["centsToC"]
-                scale_cents_plus_keynote = [(i+keynote_cents)%1200 for i in scale_cents]
-                fitting = True
-                for note_cents in notes_cents:
-                    if note_cents not in scale_cents_plus_keynote:
-                        fitting = False
-                        break
-                if fitting and ("chromatic" not in scale_key):
-                    scale_names.append(keynote_name+" - "+scale_key)
-        return scale_names
+            
+            # Maximum check
+            if (octave > max_octave) or\
+               (octave == max_octave and\
+                self.notes[name]["centsToC"] >\
+                self.notes[name]["centsToC"]):
+                octave = max_octave
+                name = max_note
+
+            # Minimum check
+            if not ((octave < min_octave) or\
+                    (octave == min_octave and\
+                     self.notes[name]["centsToC"] < \
+                     self.notes[name]["centsToC"])):
+                notes.append(Note(name=name, octave=octave,
+                                  alter=self.notes[name]["musicXMLAlter"],
+                                  accidental=self.notes[name]["musicXMLAccidental"],
+                                  type_=type_, duration=duration))
+        return notes
+    
+    def _get_normalized_note_lengths(self, midi_notes, allowed_lengths):
+        """Returns the nearest allowed note length names of the MidiNote lengths, normalized by the shortest one.
+        
+        This is the quantization without NumPy, see
+        get_notes_from_midi_notes().
+        
+        Arguments:
+        >midi_notes: The non-empty list of MidiNote instances.
+        >allowed_lengths: The ordered dictionary of the allowed note lengths.
+        """
+        # Get eligible note lengths.
+        eligible_keys = []
+        for key in list(allowed_lengths.keys()):
+            eligible_keys.append(self.note_lengths[key]["divisions"])
+        min_key = min(eligible_keys)
+        minimal_midi_length = min([i.length for i in midi_notes])
+        
+        durations = []
+        for midi_note in midi_notes:
+            # Get best note length
+            ratio = midi_note.length / minimal_midi_length
+            min_difference = min([abs(ratio-i/min_key) for i in eligible_keys])
+            durations.append([i for i in list(allowed_lengths.keys())
+                              if abs(ratio-(self.note_lengths[i]["divisions"])/min_key) == min_difference][0])
+        return durations
+    
+    def get_quantized_note_lengths(self, midi_notes, note_length_names,
+                                   bins_per_octave=24, peak_tolerance=.9,
+                                   peak_width=2):
+        """Returns the nearest note length names of the MidiNote lengths at an estimated tempo.
+        
+        The tempo, i.e. the duration of one division, is estimated from the
+        inter-onset intervals (the time between two consecutive notes'
+        starts): Every interval votes for the tempos at which it would be
+        one of the given note lengths. The votes are collected in a
+        histogram of the logarithmic division duration. Every bin is scored
+        with the votes of its surrounding bins, so that the votes of
+        slightly different intervals count for the same tempo even if they
+        are split into neighbouring bins. The highest scored peak is the
+        estimated tempo. If several peaks are nearly as high (e.g.
+        if all durations can be read in eighths as well as in 16ths), the
+        slowest of them is taken, so that the shortest notes get the
+        shortest note length, like in a normalization by the shortest note.
+        Then, all lengths are rounded (on a logarithmic scale) to the
+        nearest note length in one NumPy pass. Unlike a normalization by
+        the shortest note, single outliers don't change the tempo.
+        NumPy has to be installed for this method.
+        
+        Arguments:
+        >midi_notes: The non-empty list of MidiNote instances, ordered by
+                     their start times.
+        >note_length_names: The list of the allowed note length names.
+        >bins_per_octave=24: The histogram's resolution.
+        >peak_tolerance=.9: The minimal score of a peak, relative to the
+                            highest peak, to be a candidate tempo.
+        >peak_width=2: The number of bins on each side of a bin whose
+                       votes count for the bin's score.
+        """
+        import numpy # Optional dependency, see INSTALL.txt.
+        log_divisions = numpy.log2([self.note_lengths[name]["divisions"]
+                                    for name in note_length_names])
+        starts = numpy.array([midi_note.start for midi_note in midi_notes])
+        lengths = numpy.array([midi_note.length for midi_note in midi_notes])
+        log_lengths = numpy.log2(numpy.maximum(lengths, 1e-6))
+        intervals = numpy.diff(starts)
+        intervals = intervals[intervals > 0]
+        log_intervals = numpy.log2(intervals) if len(intervals) > 0 else\
+                        log_lengths
+        
+        # Histogram of the votes for log2(duration of a division).
+        votes = (log_intervals[:, numpy.newaxis] - log_divisions).ravel()
+        lowest_vote = votes.min()
+        bin_indices = ((votes - lowest_vote) * bins_per_octave).astype(int) +\
+                      peak_width
+        counts = numpy.bincount(bin_indices,
+                                minlength=bin_indices.max()+peak_width+1)
+        # The score of a bin is the number of votes within peak_width bins.
+        scores = numpy.convolve(counts, numpy.ones(2*peak_width+1, dtype=int),
+                                mode="same")
+        is_peak = numpy.zeros(len(scores), dtype=bool)
+        is_peak[1:-1] = (scores[1:-1] >= scores[:-2]) &\
+                        (scores[1:-1] >= scores[2:]) &\
+                        (scores[1:-1] >= peak_tolerance*scores.max())
+        peak = numpy.flatnonzero(is_peak)[-1]
+        # Refine the tempo with the votes which count for the peak's score.
+        in_peak = numpy.abs(bin_indices - peak) <= peak_width
+        log_division_length = votes[in_peak].mean()
+        
+        nearest = numpy.abs(log_lengths[:, numpy.newaxis] -
+                            log_division_length - log_divisions).argmin(axis=1)
+        return [note_length_names[i] for i in nearest.tolist()]
+    
+    def get_note_name_and_octave(self, midi_note):
+        """Returns the (note name, octave) tuple of the nearest quarter tone of a MidiNote.
+        
+        Arguments:
+        >midi_note: The MidiNote instance.
+        """
+        # The pitch in quarter tones, as the notes are quarter tones.
+        quarter_tones = midi_note.midi_number*2 +\
+                        int(round(midi_note.cents/50))
+        name = self._get_note_name_from_midi_number(quarter_tones/2)
+        octave = quarter_tones//24 - 1
+        return name, octave
+    
+    def get_pitch_class_mask(self, cents_list):
+        """Returns the pitch class bitmask of the given cents values.
+        
+        Cents values which don't belong to any note are ignored, as no
+        note can match them.
+        
+        Arguments:
+        >cents_list: The cents (to the next lower C) values. Octaves
+                     are ignored.
+        """
+        mask = 0
+        for cents in cents_list:
+            mask |= self.pitch_class_bits.get(cents % 1200, 0)
+        return mask
+    
+    def get_identical_scales(self, scale_name):
+        """Returns the names of all other scales with the same interval structure.
+        
+        Arguments:
+        >scale_name: The name of the scale.
+        """
+        structure = self.get_interval_structure(scale_name)
+        return [i for i in self.scale_names_by_structure[structure]
+                if i != scale_name]
+    
+    def get_interval_structure(self, scale_name):
+        """Returns the normalized interval structure of the scale.
+        
+        See scale_names_by_structure.
+        
+        Arguments:
+        >scale_name: The name of the scale.
+        """
+        scale_cents = self.scales[scale_name]["notesInCentsToKeynote"]
+        return tuple(sorted({i % 1200 for i in scale_cents}))
+    
+    def _get_midi_notes_from_aubio_output(self, out):
+        """Returns a list of MidiNote instances of aubionotes' output.
+        
+        Every aubionotes output line of a note consists of the note's MIDI
+        number, start time and end time, separated by tabs.
+        
+        Arguments:
+        >out: The aubionotes output as a string.
+        """
+        midi_notes = []
+        out = out.split("\n")
+        for line in out:
+            line = line.split("\t")
+            if len(line) == 3:
+                midi_note = MidiNote(midi_number=line[0],
+                                     start=line[1], end=line[2])
+                midi_notes.append(midi_note)
+        return midi_notes
     
     def _get_note_name_from_midi_number(self, midi_number):
-        """Returns the note name of the given integer MIDI number.
+        """Returns the note name of the given MIDI number.
         
-        Quarter tones are not regarded currently.
+        Quarter tones are given as MIDI numbers ending with .5.
         
         Arguments:
-        >midi_numer: The MIDI number as integer.
+        >midi_numer: The MIDI number as integer, or as float for a quarter
+                     tone.
         """
         names = list(self.notes.keys()) #["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "Bb", "B"]
         midi_number *= (len(names)/12)
         return names[(int(midi_number)%len(names))]
     
+    @submodules.profiling.profiled
     def get_scale_sample(self, keynote, name, start_octave, chord=False, randomized=False):
         """Returns a list of Note instances representing a scale or chord sample.
         
@@ -273,18 +1046,11 @@ class BachBroData:
                            shall be returned. True, if it shall be returned.
                            Should not be True if chard is also True.
         """
-        keynote_in_cents = self.notes[keynote]["centsToC"]
+        keynote_in_cents = self.note_cents_by_name[keynote]
         scale_in_cents = self.scales[name]["notesInCentsToKeynote"]
         scale_in_cents = [(i + keynote_in_cents)%1200 for i in scale_in_cents]
         scale_in_cents += [keynote_in_cents]
         
-        scale_in_names = []
-        for cents in scale_in_cents:
-            for note in list(self.notes.keys()):
-                if self.notes[note]["centsToC"] == cents:
-                    scale_in_names.append(note)
-                    break
-        
         octaves = []
         current_octave = start_octave
         i = 0
@@ -300,12 +1066,9 @@ class BachBroData:
         scale_in_cents += scale_in_cents[::-1]
         octaves += octaves[::-1]
         
-        scale_in_names = []
-        for cents in scale_in_cents:
-            for note in list(self.notes.keys()):
-                if self.notes[note]["centsToC"] == cents:
-                    scale_in_names.append(note)
-                    break
+        scale_in_names = [self.note_names_by_cents[cents]
+                          for cents in scale_in_cents
+                          if cents in self.note_names_by_cents]
         
         notes = []
         i = 0
@@ -337,6 +1100,18 @@ class BachBroData:
         
         return notes
 
+    def get_scale_sample_cache_info(self):
+        """Returns the hits, misses, size and maximal size of the scale sample cache."""
+        cache_info = self._get_cached_scale_sample.cache_info()
+        return {"hits": cache_info.hits,
+                "misses": cache_info.misses,
+                "size": cache_info.currsize,
+                "max_size": cache_info.maxsize}
+    
+    def get_transcription_cache_info(self):
+        """Returns the hits and misses of the transcription cache, see read_midi_notes_from_wav()."""
+        return dict(self.transcription_cache_stats)
+    
     def get_sharp_or_flat_number_text(self, mode_name):
         """Returns a text string with the number of flats/sharps of the mode."""
         value = int(self.modes[mode_name]["numberSharps"])
@@ -352,25 +1127,140 @@ class BachBroData:
     def open_with_sheet_editor(self, filepath):
         """Opens the given file with the sheet editor that was set in the settings file.
         
+        The sheet editor is started by the sheet_editor_launcher, which
+        opens bursts of files in a single editor process. Its statistics
+        include the launch latencies.
+        Raises a SheetEditorCommandError if the sheet editor can't be
+        started, and a ValueError if the file is neither a (compressed or
+        uncompressed) MusicXML file nor a MIDI file.
+        
         Arguments:
-        >filepath: The score's file path.
+        >filepath: The score's file path, with one of the MusicXML or MIDI
+                   file extensions (see submodules.musicxml_writer and
+                   submodules.midi_writer).
         """
+        if not filepath.lower().endswith(
+                submodules.musicxml_writer.MUSICXML_FILE_EXTENSIONS +
+                submodules.midi_writer.MIDI_FILE_EXTENSIONS):
+            raise ValueError("No MusicXML or MIDI file: "+filepath)
+        command = self.settings["sheet editor command"]
         try:
-            subprocess.Popen([self.settings["sheet editor command"],
-                              filepath])
-        except:
-            tkinter.messagebox.showerror("BachBro - Error",
-                                         "Scorewriter command not found!\n"\
-                                         "Possible solutions:\n"\
-                                         ">Set the correct scorewriter command via 'Edit->Set aubio command...'\n"\
-                                         ">Install and set up a scorewriter on your system, see INSTALL.txt\n"\
-                                         ">Put the scorewriter's binary to your system's PATH\n"\
-                                         ">Permit the scorewriter to be executed on your system")
+            with submodules.profiling.measure(self.profiler,
+                                              "sheet editor launch"):
+                self.sheet_editor_launcher.open(command, filepath)
+        except Exception as error:
+            raise SheetEditorCommandError(command, error) from error
     
+    def _read_cached_midi_notes(self, cache_filepath):
+        """Returns the cached MidiNote instances, or None if they aren't cached.
+        
+        Arguments:
+        >cache_filepath: The path of the transcription's cache file.
+        """
+        try:
+            with open(cache_filepath, encoding="utf-8") as f:
+                return [MidiNote(midi_number, start, end, cents)
+                        for midi_number, start, end, cents
+                        in json.load(f)["midi_notes"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    
+    def _write_cached_midi_notes(self, cache_filepath, midi_notes):
+        """Writes the MidiNote instances to the transcription cache.
+        
+        Like snapshots, the cache file is written to a temporary file first.
+        If it can't be written, nothing happens.
+        
+        Arguments:
+        >cache_filepath: The path of the transcription's cache file.
+        >midi_notes: The list of MidiNote instances.
+        """
+        try:
+            os.makedirs(self.transcription_cache_path, exist_ok=True)
+            temp_filepath = cache_filepath + "." + str(os.getpid())
+            with open(temp_filepath, "w", encoding="utf-8") as f:
+                json.dump({"midi_notes": [[midi_note.midi_number,
+                                           midi_note.start,
+                                           midi_note.start+midi_note.length,
+                                           midi_note.cents]
+                                          for midi_note in midi_notes]}, f)
+            os.replace(temp_filepath, cache_filepath)
+        except OSError:
+            pass
+    
+    def read_midi_notes_from_wav(self, filepath, error_threshold,
+                                 engine="aubio", num_workers=1,
+                                 use_cache=False):
+        """Returns the list of MidiNote instances detected in the given file.
+        
+        With use_cache, the detected notes are stored in the transcription
+        cache (the data path's 'transcriptions' subfolder). The cache key is
+        the file's hash and the detection parameters (engine, threshold and,
+        for aubio, its command). Hence, the detection of an unchanged file is
+        skipped. The note length and range settings of read_notes_from_wav()
+        are applied afterwards and are no part of the key.
+        
+        Arguments:
+        >filepath: The .wav file's path.
+        >error_threshold: See read_notes_from_wav().
+        >engine="aubio": See read_notes_from_wav().
+        >num_workers=1: See read_notes_from_wav().
+        >use_cache=False: True, if the transcription cache shall be used.
+        """
+        # Equal thresholds (like ".8" and 0.8) get the same cache key.
+        error_threshold = float(error_threshold)
+        if engine not in PITCH_DETECTION_ENGINES:
+            raise ValueError("Unknown pitch detection engine: "+str(engine))
+        if use_cache:
+            parameters = [engine, error_threshold]
+            if engine == "aubio":
+                parameters.append(self.settings["aubio command"])
+            parameters_hash = hashlib.sha1(
+                               json.dumps(parameters).encode("utf-8"))
+            cache_filepath = self.transcription_cache_path +\
+                             self._get_file_hash(filepath) + "_" +\
+                             parameters_hash.hexdigest()[:16] + ".json"
+            midi_notes = self._read_cached_midi_notes(cache_filepath)
+            if midi_notes is not None:
+                self.transcription_cache_stats["hits"] += 1
+                return midi_notes
+            self.transcription_cache_stats["misses"] += 1
+        
+        if engine == "built-in":
+            with submodules.profiling.measure(self.profiler,
+                                              "built-in pitch detection"):
+                midi_notes = submodules.pitch_detection.read_midi_notes_from_wav(
+                              filepath, error_threshold, num_workers)
+        else:
+            # Execute the aubio command.
+            command = [self.settings["aubio command"],
+                       "-i", filepath,
+                       "-l", str(error_threshold)]
+            try:
+                with submodules.profiling.measure(self.profiler,
+                                                  "aubio subprocess"):
+                    out = subprocess.check_output(command,
+                                                  universal_newlines=True)
+            except Exception as error:
+                raise AubioCommandError(command[0], error) from error
+            midi_notes = self._get_midi_notes_from_aubio_output(out)
+        
+        if use_cache:
+            self._write_cached_midi_notes(cache_filepath, midi_notes)
+        return midi_notes
+    
+    @submodules.profiling.profiled
     def read_notes_from_wav(self, filepath, disallowed_note_lengths,
                             min_note, min_octave, max_note, max_octave,
-                            error_threshold):
-        """Using aubio, a list of Note instances is returned from the given file.
+                            error_threshold, engine="aubio", num_workers=1,
+                            use_cache=False):
+        """Using aubio or the built-in pitch detection, a list of Note instances is returned from the given file.
+        
+        False is returned if no notes were detected. Raises an
+        AubioCommandError if the aubionotes command can't be executed.
+        Only the built-in pitch detection (see submodules.pitch_detection)
+        detects quarter tones. It needs NumPy, otherwise an ImportError is
+        raised.
         
         Arguments:
         >filepath: The .wav file's path.
@@ -384,88 +1274,24 @@ class BachBroData:
         >max_note: The name of the highest allowed note.
         >max_octave: The octave of the highest allowed note
         >error_threshold: If aubio detects a lower error probability than
-                          given (as a string), the recognized note will
-                          be ignored by aubio.
+                          given (as a number or a string), the
+                          recognized note will be ignored by aubio. For
+                          the built-in pitch detection, it is the minimal
+                          periodicity confidence.
+        >engine="aubio": The pitch detection engine, one of
+                         PITCH_DETECTION_ENGINES.
+        >num_workers=1: The number of worker processes of the built-in
+                        pitch detection, which transcribes segments of
+                        long files in parallel. If None, the number of
+                        CPUs is used. aubio always runs in one process.
+        >use_cache=False: True, if the detected notes shall be taken from
+                          (and stored in) the transcription cache, see
+                          read_midi_notes_from_wav().
         """
-        notes = []
-
-        # Create allowed note lengths dictionary.
-        allowed_lengths = collections.OrderedDict()
-        i = 0
-        for key in list(self.note_lengths.keys()):
-            if i not in disallowed_note_lengths:
-                allowed_lengths[key] = self.note_lengths[key]
-            i += 1
-        
-        # Execute the aubio command.
-        command = [self.settings["aubio command"],
-                   "-i", filepath,
-                   "-l", error_threshold]
-        try:
-            out = subprocess.check_output(command,
-                                          universal_newlines=True)
-        except:
-            tkinter.messagebox.showerror("BachBro - Error",
-                                         "aubionotes command not found!\n"\
-                                         "Possible solutions:\n"\
-                                         ">Set the correct aubionotes command via 'Edit->Set aubio command...'\n"\
-                                         ">Install and set up aubio on your system, see BachBro's INSTALL.txt\n"\
-                                         ">Put aubionotes binary to your system's PATH\n"\
-                                         ">Permit aubionotes to be executed on your system")
-            return False
-        
-        # Create temporary MidiNpte instances as aubio returns notes
-        # as midi numbers.
-        midi_notes = []
-        out = out.split("\n")
-        for line in out:
-            line = line.split("\t")
-            if len(line) == 3:
-                midi_note = MidiNote(midi_number=line[0],
-                                     start=line[1], end=line[2])
-                midi_notes.append(midi_note)
-       
-        # Get eligible note lengths.
-        eligible_keys = []
-        for key in list(allowed_lengths.keys()):
-            eligible_keys.append(self.note_lengths[key]["divisions"])
-        min_key = min(eligible_keys)
-       
-        # Create final Note instances.
-        notes = []
-        try:
-            minimal_midi_length = min([i.length for i in midi_notes])
-        except Exception:
-            return False
-        
-        for midi_note in midi_notes:
-            # Get best note length
-            ratio = midi_note.length / minimal_midi_length
-            min_difference = min([abs(ratio-i/min_key) for i in eligible_keys])
-            
-            # Create note data
-            duration = [i for i in list(allowed_lengths.keys())
-                        if abs(ratio-(self.note_lengths[i]["divisions"])/min_key) == min_difference][0]
-            type_ = allowed_lengths[duration]
-            name = self._get_note_name_from_midi_number(midi_note.midi_number)
-            octave = midi_note.midi_number//12 - 1
-            
-            
-            # Maximum check
-            if (octave > max_octave) or\
-               (octave == max_octave and\
-                self.notes[name]["centsToC"] >\
-                self.notes[name]["centsToC"]):
-                octave = max_octave
-                name = max_note
-
-            # Minimum check
-            if not ((octave < min_octave) or\
-                    (octave == min_octave and\
-                     self.notes[name]["centsToC"] < \
-                     self.notes[name]["centsToC"])):
-                notes.append(Note(name=name, octave=octave,
-                                  alter=self.notes[name]["musicXMLAlter"],
-                                  accidental=self.notes[name]["musicXMLAccidental"],
-                                  type_=type_, duration=duration))
-        return notes
+        midi_notes = self.read_midi_notes_from_wav(filepath, error_threshold,
+                                                   engine, num_workers,
+                                                   use_cache)
+        return self.get_notes_from_midi_notes(midi_notes,
+                                              disallowed_note_lengths,
+                                              min_note, min_octave,
+                                              max_note, max_octave)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+#
+# batch_transcription.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""batch_transcription.py - Parallel transcription of a folder of .wav files.
+
+Every .wav file of the input folder is transcribed (see
+BachBroData.read_notes_from_wav()) and written as score with the same
+name into the output folder. The files are distributed to a pool of
+worker processes. The detected notes are kept in BachBro's transcription
+cache, so that unchanged files aren't analysed again when the folder is
+transcribed again, e.g. with other note length or range settings. Run it
+from BachBro's main folder with:
+python -m submodules.batch_transcription INPUT_FOLDER OUTPUT_FOLDER [options]
+See 'python -m submodules.batch_transcription --help' for the options.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import os
+import sys
+
+import submodules.bachbro_data
+import submodules.midi_writer
+import submodules.musicxml_writer
+
+
+# The result of a transcribed file. output_filepath is None if no note was
+# detected, and error is the error message if the transcription failed.
+TranscriptionResult = collections.namedtuple(
+                       "TranscriptionResult",
+                       ["wav_filepath", "output_filepath", "cached", "error"])
+
+# The BachBroData instance of the current worker process.
+_worker_data = None
+
+
+def _init_worker(datapath, cache_path):
+    """Loads the worker process' BachBroData instance.
+
+    Arguments:
+    >datapath: The path of BachBro's data folder.
+    >cache_path: The transcription cache folder, or None for the default.
+    """
+    global _worker_data
+    _worker_data = submodules.bachbro_data.BachBroData(datapath)
+    if cache_path is not None:
+        _worker_data.transcription_cache_path = cache_path
+
+
+def _transcribe_file(task):
+    """Transcribes a .wav file, writes its score and returns its TranscriptionResult.
+
+    Arguments:
+    >task: The (.wav filepath, output filepath, settings) tuple. The
+           settings are the dictionary of the transcription arguments of
+           transcribe_folder().
+    """
+    wav_filepath, output_filepath, settings = task
+    cache_hits = _worker_data.get_transcription_cache_info()["hits"]
+    cached = False
+    # Every failure (e.g. of a malformed file or of a missing optional
+    # dependency) is reported as the file's error, so that the other
+    # files of the folder are still transcribed.
+    try:
+        midi_notes = _worker_data.read_midi_notes_from_wav(
+                      wav_filepath, settings["error_threshold"],
+                      settings["engine"], use_cache=settings["use_cache"])
+        cached = _worker_data.get_transcription_cache_info()["hits"] >\
+                 cache_hits
+
+        notes = _worker_data.get_notes_from_midi_notes(
+                 midi_notes, settings["disallowed_note_lengths"],
+                 settings["min_note"], settings["min_octave"],
+                 settings["max_note"], settings["max_octave"])
+        if notes is False:
+            return TranscriptionResult(wav_filepath, None, cached, None)
+        title = os.path.splitext(os.path.basename(wav_filepath))[0]
+        _worker_data.create_score(output_filepath, title, settings["clef"],
+                                  settings["mode"], settings["instrument"],
+                                  notes)
+    except Exception as error:
+        return TranscriptionResult(wav_filepath, None, cached, str(error))
+    return TranscriptionResult(wav_filepath, output_filepath, cached, None)
+
+
+def get_wav_filepaths(input_path):
+    """Returns the sorted paths of all .wav files in the given folder.
+
+    Arguments:
+    >input_path: The folder's path. Subfolders are not searched.
+    """
+    return sorted(os.path.join(input_path, filename)
+                  for filename in os.listdir(input_path)
+                  if filename.lower().endswith(".wav") and
+                  os.path.isfile(os.path.join(input_path, filename)))
+
+
+def transcribe_folder(data, input_path, output_path, error_threshold,
+                      disallowed_note_lengths, min_note, min_octave, max_note,
+                      max_octave, clef, mode, instrument,
+                      engine="built-in", extension=".xml", use_cache=True,
+                      cache_path=None, num_workers=None,
+                      progress_function=None):
+    """Transcribes all .wav files of a folder with a pool of worker processes.
+
+    The worker processes load their own BachBroData instances from the
+    given instance's data path. Every file's score gets the file's name
+    with the given extension. Returns the list of the files'
+    TranscriptionResults, in the order of get_wav_filepaths().
+
+    Arguments:
+    >data: The BachBroData instance.
+    >input_path: The folder of the .wav files.
+    >output_path: The folder of the written scores.
+    >error_threshold, disallowed_note_lengths, min_note, min_octave,
+     max_note, max_octave: See BachBroData.read_notes_from_wav().
+    >clef: The scores' clef.
+    >mode: The scores' flats/sharps.
+    >instrument: The scores' MIDI instrument.
+    >engine="built-in": The pitch detection engine.
+    >extension=".xml": The scores' file extension, which determines their
+                       format (see BachBroData.create_score()).
+    >use_cache=True: True, if the transcription cache shall be used.
+    >cache_path=None: The transcription cache folder (ending with a path
+                      separator). If None, the data path's 'transcriptions'
+                      subfolder is used.
+    >num_workers=None: The number of worker processes. If None, the
+                       number of CPUs is used.
+    >progress_function=None: Function which is called with the number of
+                             finished files and the number of all files
+                             after every finished file.
+    """
+    settings = {"error_threshold": error_threshold,
+                "disallowed_note_lengths": disallowed_note_lengths,
+                "min_note": min_note, "min_octave": min_octave,
+                "max_note": max_note, "max_octave": max_octave,
+                "clef": clef, "mode": mode, "instrument": instrument,
+                "engine": engine, "use_cache": use_cache}
+    wav_filepaths = get_wav_filepaths(input_path)
+    os.makedirs(output_path, exist_ok=True)
+    tasks = [(wav_filepath,
+              os.path.join(output_path,
+                           os.path.splitext(os.path.basename(wav_filepath))[0] +
+                           extension),
+              settings)
+             for wav_filepath in wav_filepaths]
+    results = []
+    if not tasks:
+        return results
+    num_workers = min(num_workers or os.cpu_count() or 1, len(tasks))
+    with concurrent.futures.ProcessPoolExecutor(
+          max_workers=num_workers, initializer=_init_worker,
+          initargs=(data.datapath, cache_path)) as executor:
+        for result in executor.map(_transcribe_file, tasks):
+            results.append(result)
+            if progress_function is not None:
+                progress_function(len(results), len(tasks))
+    return results
+
+
+def _print_progress(num_finished_files, num_files):
+    """Prints the transcription's progress to stderr."""
+    sys.stderr.write("\r%d/%d files transcribed" %
+                     (num_finished_files, num_files))
+    if num_finished_files == num_files:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def main(args):
+    """Transcribes the folder with the given command line arguments."""
+    data = submodules.bachbro_data.BachBroData(
+            os.getcwd().replace("\\", "/")+"/data/")
+    extensions = list(submodules.musicxml_writer.MUSICXML_FORMATS.values()) +\
+                 list(submodules.midi_writer.MIDI_FORMATS.values())
+    parser = argparse.ArgumentParser(
+              prog="python -m submodules.batch_transcription",
+              description="Transcribes all .wav files of a folder as "
+                          "MusicXML or MIDI scores.")
+    parser.add_argument("input_path", help="The folder of the .wav files.")
+    parser.add_argument("output_path", help="The folder of the scores.")
+    parser.add_argument("--engine", default="built-in",
+                        choices=submodules.bachbro_data.PITCH_DETECTION_ENGINES,
+                        help="The pitch detection engine (default: "
+                             "built-in).")
+    parser.add_argument("--threshold", default=".8",
+                        help="The confidence threshold (default: .8).")
+    parser.add_argument("--exclude-lengths", nargs="+", default=[],
+                        help="The excluded note lengths.")
+    parser.add_argument("--lowest", nargs=2, default=["F#", "3"],
+                        metavar=("NAME", "OCTAVE"),
+                        help="The lowest note; it and all lower notes are "
+                             "ignored (default: F# 3).")
+    parser.add_argument("--highest", nargs=2, default=["G", "6"],
+                        metavar=("NAME", "OCTAVE"),
+                        help="The highest note (default: G 6).")
+    parser.add_argument("--clef", default=next(iter(data.clefs)),
+                        help="The scores' clef.")
+    parser.add_argument("--mode", default=next(iter(data.modes)),
+                        help="The flats/sharps of the scores.")
+    parser.add_argument("--instrument",
+                        default=next(iter(data.midi_instruments)),
+                        help="The MIDI instrument of the scores.")
+    parser.add_argument("--format", default=".xml", choices=extensions,
+                        help="The scores' file format (default: .xml).")
+    parser.add_argument("--cache", default=None,
+                        help="The transcription cache folder (default: "
+                             "data/transcriptions/).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Analyse all files, without the transcription "
+                             "cache.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="The number of worker processes (default: the "
+                             "number of CPUs).")
+    arguments = parser.parse_args(args[1:])
+
+    for name, values, table in (("note length", arguments.exclude_lengths,
+                                 data.note_lengths),
+                                ("note", [arguments.lowest[0],
+                                          arguments.highest[0]], data.notes),
+                                ("clef", [arguments.clef], data.clefs),
+                                ("mode", [arguments.mode], data.modes),
+                                ("instrument", [arguments.instrument],
+                                 data.midi_instruments)):
+        for value in values:
+            if value not in table:
+                parser.error("unknown %s: %s" % (name, value))
+    try:
+        min_octave = int(arguments.lowest[1])
+        max_octave = int(arguments.highest[1])
+    except ValueError:
+        parser.error("invalid octave")
+    if not os.path.isdir(arguments.input_path):
+        parser.error("no folder: "+arguments.input_path)
+
+    note_length_names = list(data.note_lengths)
+    results = transcribe_folder(
+               data, arguments.input_path, arguments.output_path,
+               arguments.threshold,
+               [note_length_names.index(name)
+                for name in arguments.exclude_lengths],
+               arguments.lowest[0], min_octave, arguments.highest[0],
+               max_octave, arguments.clef, arguments.mode,
+               arguments.instrument, arguments.engine, arguments.format,
+               not arguments.no_cache,
+               None if arguments.cache is None
+               else os.path.join(arguments.cache, ""),
+               arguments.workers, _print_progress)
+
+    for result in results:
+        if result.error is not None:
+            sys.stderr.write("%s: %s\n" % (result.wav_filepath, result.error))
+        elif result.output_filepath is None:
+            sys.stderr.write("%s: no notes detected\n" % result.wav_filepath)
+    sys.stderr.write("%d files, %d from the cache, %d failed\n" %
+                     (len(results),
+                      sum(result.cached for result in results),
+                      sum(result.error is not None for result in results)))
+    return 1 if any(result.error is not None for result in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
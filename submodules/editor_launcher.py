@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+#
+# editor_launcher.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""editor_launcher.py - Managed launching of the sheet editor.
+
+The SheetEditorLauncher starts the sheet editor processes and keeps
+track of them:
+>Every started process is waited for by a daemon thread, so that it is
+ reaped as soon as it exits and never remains as a zombie process.
+>The first open request of a burst is launched at once. Further requests
+ within the coalescing interval are collected and launched together in a
+ single editor process, as the sheet editor command accepts several files
+ as separate arguments. A file which is requested several times within
+ the coalescing interval is launched only once. Every other request is
+ launched, also for a file which a running editor process has opened, as
+ the editor may have closed the file in the meantime.
+>The launch latencies and the request, launch and process numbers are
+ collected as statistics.
+"""
+
+import subprocess
+import threading
+import time
+
+
+class SheetEditorLauncher:
+    """Launcher and tracker of sheet editor processes."""
+    def __init__(self, coalesce_interval=0.5):
+        """Sets the launcher's empty process list and statistics.
+
+        Arguments:
+        >coalesce_interval=0.5: The time in seconds after a launch in which
+                                further open requests are collected and
+                                launched together.
+        """
+        self.coalesce_interval = coalesce_interval
+        self.lock = threading.Lock()
+        self.processes = {}  # Running processes with their file paths.
+        self.pending_filepaths = []
+        self.pending_command = None
+        self.pending_timer = None
+        self.deferred_error = None
+        self.last_launch_time = None
+        self.last_launch = None  # The last launch's command and file paths.
+        self.stats = {"requests": 0, "launches": 0, "failed_launches": 0,
+                      "coalesced_requests": 0,
+                      "reaped_processes": 0, "total_launch_latency": 0.0,
+                      "max_launch_latency": 0.0}
+
+    def _launch(self, command, filepaths):
+        """Starts an editor process with the given files and tracks it.
+
+        Raises an OSError (or ValueError) if the process can't be started.
+        Must be called while the lock is held.
+
+        Arguments:
+        >command: The sheet editor command.
+        >filepaths: The list of the opened files.
+        """
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen([command] + filepaths)
+        except (OSError, ValueError):
+            self.stats["failed_launches"] += 1
+            raise
+        latency = time.perf_counter() - start
+        self.last_launch_time = time.monotonic()
+        self.last_launch = (command, list(filepaths))
+        self.stats["launches"] += 1
+        self.stats["total_launch_latency"] += latency
+        self.stats["max_launch_latency"] = max(
+                                            self.stats["max_launch_latency"],
+                                            latency)
+        key = (command, process.pid)
+        self.processes[key] = list(filepaths)
+        threading.Thread(target=self._reap, args=(key, process),
+                         daemon=True).start()
+
+    def _launch_pending(self):
+        """Launches the collected open requests in a single process.
+
+        A launch error is kept and raised by the next call of open() or
+        close().
+        """
+        with self.lock:
+            command = self.pending_command
+            filepaths = self.pending_filepaths
+            self.pending_filepaths = []
+            self.pending_timer = None
+            if filepaths:
+                try:
+                    self._launch(command, filepaths)
+                except (OSError, ValueError) as error:
+                    self.deferred_error = error
+
+    def _open(self, command, filepath):
+        """Launches or coalesces an open request.
+
+        Must be called while the lock is held. See open().
+        """
+        elapsed = (None if self.last_launch_time is None
+                   else time.monotonic() - self.last_launch_time)
+        if (elapsed is not None) and (elapsed < self.coalesce_interval) and\
+           (self.last_launch[0] == command) and\
+           (filepath in self.last_launch[1]):
+            # The file was just launched, e.g. by a double click.
+            self.stats["coalesced_requests"] += 1
+            return
+        if self.pending_timer is not None:
+            if self.pending_command != command:
+                # Only requests of the same command are coalesced.
+                self._launch(command, [filepath])
+            else:
+                if filepath not in self.pending_filepaths:
+                    self.pending_filepaths.append(filepath)
+                self.stats["coalesced_requests"] += 1
+            return
+
+        if (elapsed is None) or (elapsed >= self.coalesce_interval):
+            self._launch(command, [filepath])
+            return
+
+        self.stats["coalesced_requests"] += 1
+        self.pending_command = command
+        self.pending_filepaths = [filepath]
+        self.pending_timer = threading.Timer(
+                              self.coalesce_interval - elapsed,
+                              self._launch_pending)
+        self.pending_timer.daemon = True
+        self.pending_timer.start()
+
+    def _reap(self, key, process):
+        """Waits for the process' exit and removes it from the running processes."""
+        process.wait()
+        with self.lock:
+            self.processes.pop(key, None)
+            self.stats["reaped_processes"] += 1
+
+    def close(self):
+        """Launches the still collected open requests at once.
+
+        The running editor processes are not terminated, as their windows
+        shall stay open. Raises the error of a failed coalesced launch
+        which wasn't raised by open() yet.
+        """
+        with self.lock:
+            timer = self.pending_timer
+        if timer is not None:
+            timer.cancel()
+            self._launch_pending()
+        with self.lock:
+            error = self.deferred_error
+            self.deferred_error = None
+        if error is not None:
+            raise error
+
+    def get_stats(self):
+        """Returns the request, launch and process numbers and the launch latencies in milliseconds."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["running_processes"] = len(self.processes)
+            stats["pending_requests"] = len(self.pending_filepaths)
+        launches = stats["launches"]
+        stats["mean_launch_latency_ms"] = (
+         stats.pop("total_launch_latency")/launches*1000 if launches else 0.0)
+        stats["max_launch_latency_ms"] = stats.pop("max_launch_latency")*1000
+        return stats
+
+    def open(self, command, filepath):
+        """Opens the file with the sheet editor, or coalesces the request.
+
+        Raises an OSError (or ValueError) if the editor can't be started.
+        If a previous coalesced launch failed, its error is raised after
+        the file was launched or collected, so that the file isn't lost.
+
+        Arguments:
+        >command: The sheet editor command.
+        >filepath: The opened file's path.
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            error = self.deferred_error
+            self.deferred_error = None
+            try:
+                self._open(command, filepath)
+            except (OSError, ValueError):
+                # The file's own launch error is raised first.
+                self.deferred_error = error
+                raise
+        if error is not None:
+            raise error
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# exercise.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""exercise.py - Command line export of long randomized scale exercises.
+
+The exercise's notes are generated measure by measure (see
+BachBroData.get_exercise_notes()) and streamed to the MusicXML file, so
+that exercises with thousands of measures need no more memory than short
+ones. Run it from BachBro's main folder with:
+python -m submodules.exercise OUTPUT_FILE KEYNOTE SCALE [options]
+See 'python -m submodules.exercise --help' for the options.
+"""
+
+import argparse
+import os
+import sys
+
+import submodules.bachbro_data
+
+
+def _get_time_signature(text):
+    """Returns the (beats, beat type) tuple of a time signature text like '3/4'."""
+    try:
+        beats, beat_type = text.split("/")
+        return int(beats), int(beat_type)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid time signature: "+text)
+
+
+def main(args):
+    """Exports the exercise with the given command line arguments."""
+    data = submodules.bachbro_data.BachBroData(
+            os.getcwd().replace("\\", "/")+"/data/")
+    parser = argparse.ArgumentParser(
+              prog="python -m submodules.exercise",
+              description="Exports a randomized exercise of a scale as "
+                          "MusicXML (.xml or .mxl).")
+    parser.add_argument("output_file")
+    parser.add_argument("keynote")
+    parser.add_argument("scale")
+    parser.add_argument("--measures", type=int, default=100,
+                        help="The number of measures (default: 100).")
+    parser.add_argument("--time", type=_get_time_signature, default=(4, 4),
+                        help="The time signature (default: 4/4).")
+    parser.add_argument("--note-lengths", nargs="+", default=None,
+                        help="The allowed note lengths (default: all).")
+    parser.add_argument("--start-octave", type=int, default=4,
+                        help="The start octave of the scale.")
+    parser.add_argument("--clef", default=next(iter(data.clefs)),
+                        help="The sheet's clef.")
+    parser.add_argument("--mode", default=next(iter(data.modes)),
+                        help="The flats/sharps of the sheet.")
+    parser.add_argument("--instrument",
+                        default=next(iter(data.midi_instruments)),
+                        help="The MIDI instrument of the sheet.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="The random seed, for reproducible exercises.")
+    arguments = parser.parse_args(args[1:])
+
+    for name, values, table in (("keynote", [arguments.keynote], data.notes),
+                                ("scale", [arguments.scale], data.scales),
+                                ("note length", arguments.note_lengths,
+                                 data.note_lengths),
+                                ("clef", [arguments.clef], data.clefs),
+                                ("mode", [arguments.mode], data.modes),
+                                ("instrument", [arguments.instrument],
+                                 data.midi_instruments)):
+        for value in values or []:
+            if value not in table:
+                parser.error("unknown %s: %s" % (name, value))
+
+    try:
+        notes = data.get_exercise_notes(arguments.keynote, arguments.scale,
+                                        arguments.start_octave,
+                                        arguments.measures, arguments.time,
+                                        arguments.note_lengths,
+                                        arguments.seed)
+        data.create_musicxml(arguments.output_file,
+                             arguments.keynote+"-"+arguments.scale+
+                             " (exercise)",
+                             arguments.clef, arguments.mode,
+                             arguments.instrument, notes, arguments.time)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -33,6 +33,12 @@ class FindScales(tkinter.Frame):
         super().__init__()
         self.parent = parent  # For communication with other widgets and data.
         
+        # Cache of the scale catalogue bitsets of the visited note
+        # selections, see _find_scales().
+        self.selected_notes = frozenset()
+        self.fitting_bitsets = {}
+        self.max_cached_bitsets = 1024
+        
         label_frame = tkinter.Frame(self)
         label_frame.pack()
         label_piano = tkinter.Label(label_frame, text="Notes included in "
@@ -93,6 +99,12 @@ class FindScales(tkinter.Frame):
         
         A scale is 'fitting', if it contains the user selected notes or
         a subset of it.
+        The fitting scales are found incrementally: The scale catalogue
+        bitsets of all visited note selections are cached. If a note is
+        added, the cached bitset of the previous selection is narrowed by
+        the new note only. If a note is removed, the selection's bitset is
+        usually cached already, as it was visited before the note was
+        added.
         """
         is_note_clicked = [self.checkbutton_vars[i].get()
                            for i in list(self.checkbutton_vars.keys())]
@@ -103,14 +115,29 @@ class FindScales(tkinter.Frame):
             if clicked:
                 note_list.append(all_note_names[i])
             i += 1
-        self.fitting_scales = self.parent.data.get_fitting_scales(note_list)
+        
+        selected_notes = frozenset(note_list)
+        if selected_notes in self.fitting_bitsets:
+            bitset = self.fitting_bitsets[selected_notes]
+        else:
+            parent_notes = self.selected_notes
+            if not ((parent_notes <= selected_notes) and
+                    (parent_notes in self.fitting_bitsets)):
+                parent_notes = frozenset()
+            bitset = self.parent.data.get_fitting_catalogue_bitset(
+                      selected_notes - parent_notes,
+                      self.fitting_bitsets.get(parent_notes))
+            if len(self.fitting_bitsets) >= self.max_cached_bitsets:
+                self.fitting_bitsets.clear()
+            self.fitting_bitsets[selected_notes] = bitset
+        self.selected_notes = selected_notes
+        self.fitting_scales = self.parent.data.get_catalogue_scale_names(bitset)
 
         self.list_result.delete("0", "end")
         num_all_scales = len(list(self.parent.data.scales.keys()))
         num_all_scales *= len(all_note_names)
         if len(self.fitting_scales) != num_all_scales:
-            for fitting_scale in self.fitting_scales:
-                self.list_result.insert("end", fitting_scale)
+            self.list_result.insert("end", *self.fitting_scales)
 
     def _get_keynote_scale(self, keynote_addend, scale_list):
         """Returns the scale list ordered to the keynote.
@@ -130,16 +157,16 @@ class FindScales(tkinter.Frame):
         fret_distance = int(instrument["fretDistanceInCents"])
         num_frets = string_range // fret_distance
         
+        note_cents_by_name = self.parent.data.note_cents_by_name
+        note_names_by_cents = self.parent.data.note_names_by_cents
         note_names = []
         for string in instrument["stringStartNotes"]:
             temp_string = []
-            start_cent = int(string[1])*1200 + self.parent.data.notes[string[0]]["centsToC"]
+            start_cent = int(string[1])*1200 + note_cents_by_name[string[0]]
             for fret_num in range(num_frets):
-                cents = start_cent + fret_num * fret_distance
-                for note_key in list(self.parent.data.notes.keys()):
-                    if (cents % 1200) == self.parent.data.notes[note_key]["centsToC"]:
-                        temp_string.append(note_key)
-                        break
+                cents = (start_cent + fret_num * fret_distance) % 1200
+                if cents in note_names_by_cents:
+                    temp_string.append(note_names_by_cents[cents])
             note_names.append(temp_string)
         return note_names
 
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+#
+# midi_writer.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""midi_writer.py - Writer of BachBro's notes as Standard MIDI Files.
+
+The notes are written as a single track (format 0) Standard MIDI File.
+MIDI note numbers only contain semitones, so that quarter tones (and any
+other microtonal alter values) are expressed as pitch bends. As a pitch
+bend affects a whole MIDI channel, every distinct pitch bend gets its own
+channel, which is bent once at the file's start. Thereby, also chords of
+bent and unbent notes sound correctly.
+"""
+
+import math
+import struct
+
+
+# The selectable export formats with their file extensions.
+MIDI_FORMATS = {"Standard MIDI File (.mid)": ".mid"}
+
+# All file extensions of Standard MIDI Files.
+MIDI_FILE_EXTENSIONS = (".mid", ".midi")
+
+# The semitones of the note steps to the next lower C.
+_STEP_SEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# The MIDI channel of percussion instruments, which is not used for notes.
+_PERCUSSION_CHANNEL = 9
+
+
+def _get_variable_length_quantity(value):
+    """Returns the given non-negative integer as MIDI variable length quantity bytes."""
+    quantity = [value & 0x7F]
+    value >>= 7
+    while value:
+        quantity.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(quantity))
+
+
+class MidiWriter:
+    """Writer of a list of Note instances as Standard MIDI File."""
+    def __init__(self, note_lengths, ticks_per_quarter=480, tempo=120,
+                 velocity=80, pitch_bend_range=2):
+        """Sets the writer's timing and pitch bend parameters.
+
+        Arguments:
+        >note_lengths: The note lengths JSON data of BachBroData. The notes'
+                       durations are keys of it.
+        >ticks_per_quarter=480: The MIDI time resolution.
+        >tempo=120: The tempo in quarter notes per minute.
+        >velocity=80: The velocity of all notes.
+        >pitch_bend_range=2: The pitch bend range in semitones. It is set
+                             in every used channel.
+        """
+        self.note_lengths = note_lengths
+        self.ticks_per_quarter = ticks_per_quarter
+        self.tempo = tempo
+        self.velocity = velocity
+        self.pitch_bend_range = pitch_bend_range
+
+    def _get_channel_setup_events(self, channel, program, bend_cents):
+        """Returns the events which set a channel's program and pitch bend.
+
+        Arguments:
+        >channel: The MIDI channel (0-15).
+        >program: The MIDI program number (0-127).
+        >bend_cents: The channel's pitch bend in cents.
+        """
+        bend = 8192 + round(bend_cents / (self.pitch_bend_range*100) * 8192)
+        bend = min(16383, max(0, bend))
+        return [
+            bytes([0xC0 | channel, program]),
+            # Pitch bend range via RPN 0.
+            bytes([0xB0 | channel, 101, 0]),
+            bytes([0xB0 | channel, 100, 0]),
+            bytes([0xB0 | channel, 6, self.pitch_bend_range]),
+            bytes([0xB0 | channel, 38, 0]),
+            bytes([0xB0 | channel, 101, 127]),
+            bytes([0xB0 | channel, 100, 127]),
+            bytes([0xE0 | channel, bend & 0x7F, bend >> 7]),
+        ]
+
+    def get_pitch(self, note):
+        """Returns the MIDI note number and the pitch bend (in cents) of a Note.
+
+        The pitch bend is always in [0, 100), i.e. quarter tones are
+        written as the next lower semitone with a bend of 50 cents.
+
+        Arguments:
+        >note: The Note instance.
+        """
+        alter = float(note.alter) if note.alter != "" else 0.0
+        semitones = (int(note.octave)+1)*12 + _STEP_SEMITONES[note.name[0]] + alter
+        midi_number = math.floor(semitones)
+        bend_cents = round((semitones - midi_number) * 100)
+        if bend_cents == 100:
+            midi_number += 1
+            bend_cents = 0
+        return midi_number, bend_cents
+
+    def write(self, f, notes, program, title=""):
+        """Writes the notes as a Standard MIDI File.
+
+        Notes with in_chord set start at the same time as their previous
+        note, like in MusicXML.
+
+        Arguments:
+        >f: The binary file handle to which the MIDI file is written.
+        >notes: The iterable of the written Note instances.
+        >program: The MIDI program number (1-128, as in the MIDI instruments
+                  JSON data).
+        >title: The track's name.
+        """
+        ticks_per_division = (self.ticks_per_quarter /
+                              self.note_lengths["quarter"]["divisions"])
+        channels_by_bend = {}
+        timed_events = []  # (tick, order, event bytes), note offs first.
+        tick = 0
+        start_tick = 0
+        for note in notes:
+            midi_number, bend_cents = self.get_pitch(note)
+            if not 0 <= midi_number <= 127:
+                continue
+            if bend_cents not in channels_by_bend:
+                channel = len(channels_by_bend)
+                if channel >= _PERCUSSION_CHANNEL:
+                    channel += 1
+                if channel > 15:
+                    raise ValueError("Too many distinct pitch bends for "
+                                     "the 15 usable MIDI channels")
+                channels_by_bend[bend_cents] = channel
+            channel = channels_by_bend[bend_cents]
+
+            length = round(self.note_lengths[note.duration]["divisions"] *
+                           ticks_per_division)
+            if not note.in_chord:
+                start_tick = tick
+                tick += length
+            timed_events.append((start_tick, 1,
+                                 bytes([0x90 | channel, midi_number,
+                                        self.velocity])))
+            timed_events.append((start_tick+length, 0,
+                                 bytes([0x80 | channel, midi_number, 0])))
+        timed_events.sort(key=lambda event: event[:2])
+
+        track = bytearray()
+        title_bytes = title.encode("utf-8")
+        track += b"\x00\xFF\x03" + _get_variable_length_quantity(
+                  len(title_bytes)) + title_bytes
+        microseconds_per_quarter = round(60000000 / self.tempo)
+        track += b"\x00\xFF\x51\x03" + struct.pack(
+                  ">I", microseconds_per_quarter)[1:]
+        for bend_cents, channel in channels_by_bend.items():
+            for event in self._get_channel_setup_events(
+                          channel, max(0, min(127, int(program)-1)),
+                          bend_cents):
+                track += b"\x00" + event
+        last_tick = 0
+        for event_tick, _, event in timed_events:
+            track += _get_variable_length_quantity(event_tick-last_tick)
+            track += event
+            last_tick = event_tick
+        track += b"\x00\xFF\x2F\x00"
+
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1,
+                                      self.ticks_per_quarter))
+        f.write(b"MTrk" + struct.pack(">I", len(track)))
+        f.write(track)
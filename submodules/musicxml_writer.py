@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+#
+# musicxml_writer.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""musicxml_writer.py - Streaming writer of BachBro's MusicXML files.
+
+The writer emits the score's header, part list and measures directly to
+a text file handle while the notes are given to it, so that its memory
+usage doesn't depend on the number of notes. Its output has the same
+format as BachBro's former ElementTree based export: Every element is
+written in its own line, and empty elements are written as '<tag />'.
+Compressed MusicXML (.mxl) files are written by streaming the MusicXML
+into a zip container's entry, see open_musicxml_file().
+"""
+
+import collections
+import contextlib
+import io
+import os
+
+
+# The selectable export formats with their file extensions.
+MUSICXML_FORMATS = collections.OrderedDict([
+    ("MusicXML (.xml)", ".xml"),
+    ("Compressed MusicXML (.mxl)", ".mxl"),
+])
+
+# All file extensions of (compressed or uncompressed) MusicXML files.
+MUSICXML_FILE_EXTENSIONS = (".xml", ".musicxml", ".mxl")
+
+
+def _escape(text, quote=False):
+    """Returns the text with XML special characters replaced by entities.
+
+    This avoids importing xml.sax.saxutils, which also imports urllib and
+    thereby slows down BachBro's start.
+
+    Arguments:
+    >text: The escaped text.
+    >quote=False: True, if also double quotes shall be escaped, e.g. in
+                  attribute values.
+    """
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if quote:
+        text = text.replace('"', "&quot;")
+    return text
+
+
+@contextlib.contextmanager
+def open_musicxml_file(filepath):
+    """Context manager which opens a MusicXML file for writing and returns its text file handle.
+
+    If the file path ends with '.mxl', a compressed MusicXML file is
+    written: A zip container with an uncompressed 'mimetype' entry, the
+    'META-INF/container.xml' entry which points to the score, and the
+    deflated score itself. The returned handle then writes directly into
+    the score's zip entry, so that the score is never held in memory as
+    a whole.
+
+    Arguments:
+    >filepath: The path of the written MusicXML file.
+    """
+    if not filepath.lower().endswith(".mxl"):
+        with open(filepath, "w", encoding="utf-8") as f:
+            yield f
+        return
+
+    import zipfile # Only needed for compressed MusicXML.
+    score_name = os.path.splitext(os.path.basename(filepath))[0]+".xml"
+    container = "\n".join([
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<container>',
+        '<rootfiles>',
+        '<rootfile full-path="'+_escape(score_name, quote=True)+'"'+
+        ' media-type="application/vnd.recordare.musicxml+xml" />',
+        '</rootfiles>',
+        '</container>'])
+    with zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(zipfile.ZipInfo("mimetype"),
+                         "application/vnd.recordare.musicxml",
+                         compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", container)
+        with archive.open(score_name, "w") as entry:
+            with io.TextIOWrapper(entry, encoding="utf-8") as f:
+                yield f
+
+
+class MusicXMLWriter:
+    """Streaming writer of single or multiple part MusicXML scores."""
+    def __init__(self, f, note_lengths, max_notes_per_measure=25,
+                 is_continuation=False, measure_divisions=None):
+        """Sets the writer's file handle and measure state.
+
+        Arguments:
+        >f: The text file handle to which the MusicXML is written.
+        >note_lengths: The note lengths JSON data of BachBroData.
+        >max_notes_per_measure=25: The number of notes without accidental
+                                   after which a new measure is started.
+                                   The default is more than possible
+                                   for a scale sample.
+        >is_continuation=False: True, if the written lines continue an
+                                already written MusicXML (e.g. if a single
+                                part is rendered separately), so that the
+                                first line is also preceded by a newline.
+        >measure_divisions=None: If given, a new measure is started as soon
+                                 as the written notes fill this number of
+                                 divisions (e.g. 64 for a 4/4 measure if a
+                                 quarter has 16 divisions), instead of
+                                 after max_notes_per_measure notes.
+        """
+        self.f = f
+        self.note_lengths = note_lengths
+        self.max_notes_per_measure = max_notes_per_measure
+        self.is_first_line = not is_continuation
+        self.measure_divisions = measure_divisions
+        self.note_num = 0
+        self.measure_num = 1
+        self.filled_divisions = 0
+
+    def _get_element(self, tag, text):
+        """Returns the line of an element containing only the given text.
+
+        Arguments:
+        >tag: The element's tag.
+        >text: The element's text. It is escaped.
+        """
+        text = str(text)
+        if text == "":
+            return "<"+tag+" />"
+        return "<"+tag+">"+_escape(text)+"</"+tag+">"
+
+    def _write_lines(self, lines):
+        """Writes the given lines, separated by newlines.
+
+        Arguments:
+        >lines: The list of written lines.
+        """
+        text = "\n".join(lines)
+        if self.is_first_line:
+            self.is_first_line = False
+        else:
+            text = "\n" + text
+        self.f.write(text)
+
+    def write_end(self):
+        """Closes the last measure, the part and the score."""
+        self.write_part_end()
+        self.write_score_end()
+
+    def write_header(self, title, instrument, midi_program, divisions,
+                     fifths, clef_data, time_signature=None):
+        """Writes the score information of a single part score and opens its first measure.
+
+        Arguments:
+        >title: The sheet's title.
+        >instrument: The MIDI instrument's name.
+        >midi_program: The MIDI instrument's program number.
+        >divisions: The number of divisions of a quarter note.
+        >fifths: The number of sharps (if positive) or flats (if negative)
+                 of the sheet.
+        >clef_data: The clef's JSON data.
+        >time_signature=None: The (beats, beat type) tuple of the sheet's
+                              time signature. If None, no time signature
+                              is written.
+        """
+        self.write_score_start(title)
+        self.write_part_list([("P1", instrument, instrument, midi_program)])
+        self.write_part_start("P1", divisions, fifths, clef_data,
+                              time_signature)
+
+    def write_part_end(self):
+        """Closes the last measure and the part."""
+        self._write_lines(["</measure>", "</part>"])
+
+    def write_part_list(self, parts):
+        """Writes the score's part list.
+
+        Arguments:
+        >parts: The list of the parts' (part id, part name, MIDI instrument
+                name, MIDI program number) tuples.
+        """
+        lines = ['<part-list>']
+        for part_id, part_name, instrument, midi_program in parts:
+            instrument_id = part_id+"-I3"
+            lines += [
+                '<score-part id="'+part_id+'">',
+                self._get_element("part-name", part_name),
+                '<score-instrument id="'+instrument_id+'">',
+                self._get_element("instrument-name", instrument),
+                '</score-instrument>',
+                '<midi-instrument id="'+instrument_id+'">',
+                self._get_element("midi-channel", "1"),
+                self._get_element("midi-program", midi_program),
+                self._get_element("volume", "100"),
+                self._get_element("pan", "0"),
+                '</midi-instrument>',
+                '</score-part>']
+        lines.append('</part-list>')
+        self._write_lines(lines)
+
+    def write_part_start(self, part_id, divisions, fifths, clef_data,
+                         time_signature=None):
+        """Opens the part and its first measure, and resets the measure state.
+
+        Arguments:
+        >part_id: The part's id, as given to write_part_list().
+        >divisions: The number of divisions of a quarter note.
+        >fifths: The number of sharps (if positive) or flats (if negative)
+                 of the part.
+        >clef_data: The clef's JSON data.
+        >time_signature=None: The (beats, beat type) tuple of the part's
+                              time signature. If None, no time signature
+                              is written.
+        """
+        self.note_num = 0
+        self.measure_num = 1
+        self.filled_divisions = 0
+        lines = [
+            '<part id="'+part_id+'">',
+            '<measure number="1">',
+            '<attributes>',
+            self._get_element("divisions", divisions),
+            '<key>',
+            self._get_element("fifths", fifths),
+            '</key>']
+        if time_signature is not None:
+            lines += [
+                '<time>',
+                self._get_element("beats", time_signature[0]),
+                self._get_element("beat-type", time_signature[1]),
+                '</time>']
+        self._write_lines(lines + [
+            '<clef>',
+            self._get_element("sign", clef_data["sign"]),
+            self._get_element("line", clef_data["line"]),
+            self._get_element("clef-octave-change", clef_data["octave_change"]),
+            '</clef>',
+            '</attributes>'])
+
+    def write_score_end(self):
+        """Closes the score."""
+        self._write_lines(["</score-partwise>"])
+
+    def write_score_start(self, title):
+        """Writes the XML declaration, the document type and the score's title.
+
+        Arguments:
+        >title: The sheet's title.
+        """
+        self._write_lines([
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<!DOCTYPE score-partwise PUBLIC '
+            '"-//Recordare//DTD MusicXML 3.0 Partwise//EN" '
+            '"http://www.musicxml.org/dtds/partwise.dtd">',
+            '<score-partwise version="3.0">',
+            '<work>',
+            self._get_element("work-title", title),
+            '</work>'])
+
+    def get_note_fragment(self, note):
+        """Returns the lines of the given note's element, separated by newlines.
+
+        The fragment doesn't depend on the writer's measure state, so that
+        it can be rendered once and written with write_note_fragment() as
+        often as needed.
+
+        Arguments:
+        >note: The rendered Note instance.
+        """
+        lines = ['<note>']
+        if note.in_chord:
+            lines.append('<chord />')
+        lines.append('<pitch>')
+        lines.append(self._get_element("step", note.name[0]))
+        if note.alter != "":
+            lines.append(self._get_element("alter", note.alter))
+        lines.append(self._get_element("octave", note.octave))
+        lines.append('</pitch>')
+
+        note_length = self.note_lengths[note.duration]
+        lines.append(self._get_element("duration", note_length["divisions"]))
+        lines.append(self._get_element("type", note_length["musicXMLType"]))
+        if note_length["musicXMLAddition"] != "":
+            lines.append("<"+note_length["musicXMLAddition"]+" />")
+
+        if note.accidental != "":
+            lines.append(self._get_element("accidental", note.accidental))
+        lines.append('</note>')
+        return "\n".join(lines)
+
+    def write_note(self, note):
+        """Writes the given note, starting a new measure if necessary.
+
+        Arguments:
+        >note: The written Note instance.
+        """
+        divisions = 0
+        if not note.in_chord:
+            divisions = self.note_lengths[note.duration]["divisions"]
+        self.write_note_fragment(self.get_note_fragment(note),
+                                 note.accidental == "", divisions)
+
+    def write_note_fragment(self, fragment, is_counted, divisions=0):
+        """Writes a note rendered by get_note_fragment(), starting a new measure if necessary.
+
+        Arguments:
+        >fragment: The note's rendered element.
+        >is_counted: True, if the note counts for the measure's number of
+                     notes, i.e. if it has no accidental.
+        >divisions=0: The number of divisions by which the note advances
+                      the time, i.e. 0 for notes in a chord. Only used if
+                      the writer's measure_divisions is set.
+        """
+        lines = []
+        if self.measure_divisions is None:
+            is_measure_full = (self.note_num%self.max_notes_per_measure == 0)\
+                              and (self.note_num > 0)
+        else:
+            is_measure_full = (divisions > 0) and\
+                              (self.filled_divisions >= self.measure_divisions)
+        if is_measure_full:
+            lines.append('</measure>')
+            if self.measure_divisions is None:
+                # Without a time signature, the second measure also gets
+                # the number 1, which is kept for unchanged output.
+                lines.append('<measure number="'+str(self.measure_num)+'">')
+                self.measure_num += 1
+            else:
+                self.measure_num += 1
+                lines.append('<measure number="'+str(self.measure_num)+'">')
+            self.filled_divisions = 0
+        lines.append(fragment)
+        if is_counted:
+            self.note_num += 1
+        self.filled_divisions += divisions
+        self._write_lines(lines)
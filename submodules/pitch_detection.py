@@ -0,0 +1,683 @@
+#!/usr/bin/env python
+#
+# pitch_detection.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""pitch_detection.py - BachBro's built-in pitch and onset detection.
+
+This is an in-process alternative to aubio's 'aubionotes' command. The
+pitch of every frame is estimated with the YIN algorithm (de Cheveigné &
+Kawahara, 2002), vectorized over blocks of frames with NumPy. The frames
+are then segmented into notes at silences, at energy onsets and at pitch
+changes. Unlike aubionotes, the detected notes keep their deviation from
+the nearest MIDI number in cents, so that quarter tones are preserved.
+The StreamingNoteDetector does the same for an audio stream, chunk by
+chunk while it is recorded. Long .wav files can be split at silences
+into segments, which are transcribed in parallel by worker processes.
+NumPy is an optional dependency of BachBro and is only imported when a
+function of this module is used.
+"""
+
+import math
+import mmap
+import os
+import struct
+import time
+import wave
+
+
+# The number of frames which are analysed at once. Limits the memory usage
+# of the vectorized YIN computation.
+_FRAMES_PER_BLOCK = 256
+
+
+# The format tags of the supported .wav sample formats.
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# The number of frames which are converted at once by the .wav reader.
+_FRAMES_PER_READ_BLOCK = 1 << 16
+
+# The NumPy module, which is set by _import_numpy().
+numpy = None
+
+
+class MidiNote:
+    """Class for a MIDI note as it is represented in an aubio output.
+
+    In this kind of outut, the note hat a MIDI number and a start and
+    end time. Notes of the built-in pitch detection (see get_midi_notes())
+    additionally have a deviation in cents.
+    """
+    def __init__(self, midi_number, start, end, cents=0):
+        """Sets all MidiNote member variables.
+
+        Arguments:
+        >midi_number: The MIDI note's midi number.
+        >start: The MIDI note's start time.
+        >end: The MIDI note's end time. It will be stored as 'length' after
+              the variable 'start' is substracted of it.
+        >cents=0: The note's deviation from the MIDI number in cents,
+                  from -50 to 50. E.g. 50 for a quarter tone.
+        """
+        self.midi_number = int(float(midi_number))
+        self.start = float(start)
+        self.length = float(end) - self.start
+        self.cents = cents
+
+
+def _import_numpy():
+    """Imports NumPy as the module's numpy, for all functions of this module.
+
+    It is called by the public functions and classes which need NumPy, as
+    NumPy is an optional dependency (see INSTALL.txt). Raises an
+    ImportError if NumPy isn't installed.
+    """
+    global numpy
+    import numpy
+
+
+def _get_wav_layout(mapped):
+    """Returns the (format tag, channels, sample rate, bits per sample, data offset, frame number) of a mapped .wav file.
+
+    The chunks are parsed directly, so that the sample data doesn't need
+    to be read. Raises a wave.Error if the file isn't a supported .wav file.
+
+    Arguments:
+    >mapped: The memory mapped .wav file.
+    """
+    if (len(mapped) < 12) or (mapped[:4] != b"RIFF") or\
+       (mapped[8:12] != b"WAVE"):
+        raise wave.Error("file does not start with RIFF id")
+    fmt = None
+    position = 12
+    while position + 8 <= len(mapped):
+        chunk_id = mapped[position:position+4]
+        chunk_size, = struct.unpack_from("<I", mapped, position+4)
+        chunk_start = position + 8
+        if chunk_id == b"fmt ":
+            fmt = mapped[chunk_start:chunk_start+chunk_size]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise wave.Error("data chunk before fmt chunk")
+            # Unfinished recordings may have a wrong data chunk size.
+            data_size = min(chunk_size, len(mapped) - chunk_start)
+            break
+        position = chunk_start + chunk_size + (chunk_size & 1)
+    else:
+        raise wave.Error("fmt chunk and/or data chunk missing")
+    if len(fmt) < 16:
+        raise wave.Error("fmt chunk too short")
+
+    format_tag, num_channels, sample_rate, _, block_align, bits = \
+     struct.unpack_from("<HHIIHH", fmt)
+    if (format_tag == _WAVE_FORMAT_EXTENSIBLE) and (len(fmt) >= 26):
+        format_tag, = struct.unpack_from("<H", fmt, 24)
+    sample_width = (bits + 7) // 8
+    if not (((format_tag == _WAVE_FORMAT_PCM) and (sample_width in (1, 2, 3, 4)))
+            or ((format_tag == _WAVE_FORMAT_IEEE_FLOAT) and
+                (sample_width in (4, 8)))):
+        raise wave.Error("unsupported format: tag %d with %d bits" %
+                         (format_tag, bits))
+    if (num_channels < 1) or (block_align != num_channels*sample_width):
+        raise wave.Error("invalid channel number or block alignment")
+    return (format_tag, num_channels, sample_rate, sample_width*8,
+            chunk_start, data_size // block_align)
+
+
+def _get_mono_samples(raw, format_tag, sample_width):
+    """Returns the float samples in [-1, 1] of a block of frames, mixed down to mono.
+
+    Arguments:
+    >raw: The NumPy array of the frames' bytes, with the shape (frames,
+          channels, sample width).
+    >format_tag: The .wav format tag, PCM or IEEE float.
+    >sample_width: The bytes per sample.
+    """
+    if format_tag == _WAVE_FORMAT_IEEE_FLOAT:
+        samples = raw.view("<f%d" % sample_width)[..., 0].astype(numpy.float64)
+    elif sample_width == 1:
+        samples = (raw[..., 0].astype(numpy.float64) - 128) / 128
+    elif sample_width == 3:
+        samples = (raw[..., 0].astype(numpy.int32) |
+                   (raw[..., 1].astype(numpy.int32) << 8) |
+                   (raw[..., 2].astype(numpy.int8).astype(numpy.int32) << 16))
+        samples = samples / float(1 << 23)
+    else:
+        samples = raw.view("<i%d" % sample_width)[..., 0] /\
+                  float(1 << (8*sample_width - 1))
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1)
+
+
+def iter_wav_blocks(filepath, start=0, num_frames=None,
+                    block_size=_FRAMES_PER_READ_BLOCK):
+    """Yields the (sample rate, frame number) and then the mono sample blocks of a .wav file.
+
+    The file is memory mapped and its sample data is viewed with NumPy
+    without copying it. Only one block at a time is converted to floats
+    in [-1, 1] and mixed down to mono, so that also hour long recordings
+    need little memory. Supported are 8, 16, 24 and 32 bit PCM and 32 and
+    64 bit float samples with any number of channels, also in the
+    extensible format. Raises a wave.Error for other files.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >start=0: The first read frame.
+    >num_frames=None: The number of read frames. If None, all frames from
+                      start to the file's end are read.
+    >block_size=65536: The number of frames per yielded block.
+    """
+    _import_numpy()
+    with open(filepath, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file.
+            raise wave.Error("file does not start with RIFF id")
+        with mapped:
+            format_tag, num_channels, sample_rate, bits, data_offset,\
+             file_frames = _get_wav_layout(mapped)
+            sample_width = bits // 8
+            start = min(start, file_frames)
+            stop = file_frames if num_frames is None else\
+                   min(file_frames, start + num_frames)
+            yield sample_rate, stop - start
+            frames = numpy.frombuffer(mapped, dtype=numpy.uint8,
+                                      count=file_frames*num_channels*sample_width,
+                                      offset=data_offset)
+            frames = frames.reshape(file_frames, num_channels, sample_width)
+            try:
+                for block_start in range(start, stop, block_size):
+                    yield _get_mono_samples(
+                           frames[block_start:min(stop, block_start+block_size)],
+                           format_tag, sample_width)
+            finally:
+                # The map can only be closed without any NumPy view on it.
+                del frames
+
+
+def get_wav_info(filepath):
+    """Returns the (sample rate, frame number) of a .wav file.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    """
+    blocks = iter_wav_blocks(filepath)
+    info = next(blocks)
+    blocks.close()
+    return info
+
+
+def read_wav_samples(filepath, start=0, num_frames=None):
+    """Returns the (samples, sample rate) of a .wav file.
+
+    The samples are a float NumPy array in [-1, 1], mixed down to mono. See
+    iter_wav_blocks() for the supported formats.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >start=0: The first read frame.
+    >num_frames=None: The number of read frames. If None, all frames from
+                      start to the file's end are read.
+    """
+    _import_numpy()
+    blocks = iter_wav_blocks(filepath, start, num_frames)
+    sample_rate, num_read_frames = next(blocks)
+    samples = numpy.empty(num_read_frames)
+    position = 0
+    for block in blocks:
+        samples[position:position+len(block)] = block
+        position += len(block)
+    return samples, sample_rate
+
+
+def get_frame_pitches(samples, sample_rate, frame_size=2048, hop_size=256,
+                      min_frequency=50.0, max_frequency=2000.0,
+                      yin_threshold=0.15):
+    """Returns the YIN pitch estimations of all frames of the samples.
+
+    The returned tuple consists of four NumPy arrays with one value per
+    frame: The frame's start time in seconds, its pitch as (fractional)
+    MIDI number, its periodicity confidence (1 minus the normalized
+    difference at the detected period, so that 1 is perfectly periodic),
+    and its RMS level.
+
+    Arguments:
+    >samples: The mono samples as NumPy array.
+    >sample_rate: The samples' rate in Hz.
+    >frame_size=2048: The number of samples of a frame. Half of it is the
+                      longest detectable period.
+    >hop_size=256: The number of samples between two frames' starts.
+    >min_frequency=50.0: The lowest detectable frequency in Hz.
+    >max_frequency=2000.0: The highest detectable frequency in Hz.
+    >yin_threshold=0.15: The YIN absolute threshold. The first period
+                         whose normalized difference falls below it is
+                         chosen, which avoids octave errors.
+    """
+    _import_numpy()
+    samples = numpy.asarray(samples, dtype=numpy.float64)
+    window = frame_size // 2
+    min_period = max(2, int(sample_rate / max_frequency))
+    max_period = min(window - 2, int(math.ceil(sample_rate / min_frequency)))
+    if len(samples) < frame_size:
+        samples = numpy.concatenate([samples,
+                                     numpy.zeros(frame_size - len(samples))])
+    num_frames = (len(samples) - frame_size) // hop_size + 1
+    fft_size = 1 << int(math.ceil(math.log2(frame_size + window)))
+    frames = numpy.lib.stride_tricks.sliding_window_view(
+              samples, frame_size)[::hop_size][:num_frames]
+
+    pitches = numpy.full(num_frames, numpy.nan)
+    confidences = numpy.zeros(num_frames)
+    periods = numpy.arange(window)
+    for block_start in range(0, num_frames, _FRAMES_PER_BLOCK):
+        block = frames[block_start:block_start+_FRAMES_PER_BLOCK]
+        # Difference function d(t) = E(0) + E(t) - 2*r(t) with the
+        # windowed energies E and the cross correlation r (via FFT).
+        spectrum = numpy.fft.rfft(block, fft_size)
+        first_spectrum = numpy.fft.rfft(block[:, :window], fft_size)
+        correlation = numpy.fft.irfft(spectrum * numpy.conj(first_spectrum),
+                                      fft_size)[:, :window]
+        energies = numpy.concatenate(
+                    [numpy.zeros((len(block), 1)),
+                     numpy.cumsum(block**2, axis=1)], axis=1)
+        shifted_energies = energies[:, window:window*2] - energies[:, :window]
+        difference = energies[:, window:window+1] + shifted_energies -\
+                     2*correlation
+        difference[:, 0] = 0
+        numpy.maximum(difference, 0, out=difference)
+
+        # Cumulative mean normalized difference.
+        cumulative = numpy.cumsum(difference[:, 1:], axis=1)
+        normalized = numpy.ones_like(difference)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            normalized[:, 1:] = difference[:, 1:] * periods[1:] / cumulative
+        normalized[~numpy.isfinite(normalized)] = 1
+
+        # First local minimum below the threshold, else the global minimum.
+        search = normalized[:, min_period:max_period+1]
+        is_candidate = (search[:, :-1] < yin_threshold) &\
+                       (search[:, 1:] >= search[:, :-1])
+        has_candidate = is_candidate.any(axis=1)
+        period = numpy.where(has_candidate, is_candidate.argmax(axis=1),
+                             search.argmin(axis=1)) + min_period
+        rows = numpy.arange(len(block))
+        value = normalized[rows, period]
+
+        # Parabolic interpolation of the period.
+        previous = normalized[rows, period-1]
+        following = normalized[rows, numpy.minimum(period+1, window-1)]
+        curvature = previous + following - 2*value
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            shift = numpy.where(curvature > 0,
+                                (previous - following) / (2*curvature), 0)
+        refined_period = period + numpy.clip(shift, -1, 1)
+
+        block_slice = slice(block_start, block_start+len(block))
+        pitches[block_slice] = 69 + 12*numpy.log2(
+                                sample_rate / refined_period / 440)
+        confidences[block_slice] = 1 - value
+
+    rms = numpy.sqrt(numpy.mean(frames[:, :hop_size]**2, axis=1))
+    times = numpy.arange(num_frames) * hop_size / sample_rate
+    return times, pitches, numpy.clip(confidences, 0, 1), rms
+
+
+class _NoteSegmenter:
+    """Segmentation of analysed frames into notes, frame block by frame block.
+
+    A note starts at a voiced frame (i.e. a frame with enough confidence
+    and level) after a silence, at an energy onset, or at a pitch change.
+    The state of the current note is kept between the frame blocks, so
+    that the segmentation of a stream is the same as of a whole file.
+    See get_midi_notes() for the arguments.
+    """
+    def __init__(self, frame_length, min_confidence, silence_db, onset_ratio,
+                 pitch_tolerance, min_note_length):
+        """Sets the segmenter's settings and its empty current note.
+
+        Arguments:
+        >frame_length: The time between two frames' starts in seconds.
+        >min_confidence, silence_db, onset_ratio, pitch_tolerance,
+         min_note_length: See get_midi_notes().
+        """
+        self.frame_length = frame_length
+        self.min_confidence = min_confidence
+        self.min_rms = 10**(silence_db/20)
+        self.onset_ratio = onset_ratio
+        self.pitch_tolerance = pitch_tolerance
+        self.min_frames = max(1, int(round(min_note_length / frame_length)))
+        self.note_start = None
+        self.note_end = None
+        self.note_pitches = []
+        self.last_rms = 0.0
+
+    def _finish_note(self, midi_notes):
+        """Appends the current note (if it is long enough) as MidiNote to the list."""
+        if len(self.note_pitches) >= self.min_frames:
+            pitch = float(numpy.median(self.note_pitches))
+            midi_number = int(round(pitch))
+            midi_notes.append(MidiNote(midi_number, self.note_start,
+                                       self.note_end + self.frame_length,
+                                       cents=round((pitch - midi_number)*100)))
+        self.note_pitches = []
+
+    def add_frames(self, times, pitches, confidences, rms):
+        """Segments the next frames and returns the list of finished MidiNote instances.
+
+        Arguments:
+        >times, pitches, confidences, rms: The frames' values, see
+                                           get_frame_pitches().
+        """
+        voiced = (confidences >= self.min_confidence) &\
+                 (rms >= self.min_rms) & numpy.isfinite(pitches)
+        midi_notes = []
+        for time_, pitch, frame_rms, is_voiced in zip(times.tolist(),
+                                                      pitches.tolist(),
+                                                      rms.tolist(),
+                                                      voiced.tolist()):
+            previous_rms = self.last_rms
+            self.last_rms = frame_rms
+            if not is_voiced:
+                if self.note_pitches:
+                    self._finish_note(midi_notes)
+                continue
+            if self.note_pitches:
+                recent_pitch = sum(self.note_pitches[-5:]) /\
+                               len(self.note_pitches[-5:])
+                if (abs(pitch - recent_pitch) > self.pitch_tolerance) or\
+                   (frame_rms > previous_rms*self.onset_ratio):
+                    self._finish_note(midi_notes)
+            if not self.note_pitches:
+                self.note_start = time_
+            self.note_end = time_
+            self.note_pitches.append(pitch)
+        return midi_notes
+
+    def finish(self):
+        """Returns the list with the last note as MidiNote, if it is long enough."""
+        midi_notes = []
+        self._finish_note(midi_notes)
+        return midi_notes
+
+    def get_current_pitch(self):
+        """Returns the median pitch (as MIDI number) of the unfinished note, or None."""
+        if not self.note_pitches:
+            return None
+        return sorted(self.note_pitches)[len(self.note_pitches)//2]
+
+
+def get_midi_notes(samples, sample_rate, min_confidence=0.8,
+                   silence_db=-50.0, onset_ratio=2.0, pitch_tolerance=0.4,
+                   min_note_length=0.04, frame_size=2048, hop_size=256):
+    """Returns the MidiNote instances of the notes in the samples.
+
+    A note starts at a voiced frame (i.e. a frame with enough confidence
+    and level) after a silence, at an energy onset, or at a pitch change.
+    Every MidiNote's midi_number is the nearest MIDI number of the note's
+    median pitch, and its cents are the deviation from it.
+
+    Arguments:
+    >samples: The mono samples as NumPy array.
+    >sample_rate: The samples' rate in Hz.
+    >min_confidence=0.8: The minimal periodicity confidence of a voiced
+                         frame, see get_frame_pitches().
+    >silence_db=-50.0: The level (in dB relative to full scale) below
+                       which frames are silent.
+    >onset_ratio=2.0: The level increase from one frame to the next which
+                      starts a new note.
+    >pitch_tolerance=0.4: The pitch deviation (in semitones) from the
+                          current note which starts a new note.
+    >min_note_length=0.04: The minimal length of a note in seconds.
+                           Shorter notes are ignored.
+    >frame_size=2048: See get_frame_pitches().
+    >hop_size=256: See get_frame_pitches().
+    """
+    _import_numpy()
+    segmenter = _NoteSegmenter(hop_size / sample_rate, min_confidence,
+                               silence_db, onset_ratio, pitch_tolerance,
+                               min_note_length)
+    midi_notes = segmenter.add_frames(*get_frame_pitches(samples, sample_rate,
+                                                         frame_size, hop_size))
+    return midi_notes + segmenter.finish()
+
+
+class StreamingNoteDetector:
+    """Note detection of an audio stream, e.g. of a running microphone recording.
+
+    The samples are given chunk by chunk. Every chunk is analysed as soon
+    as it arrives, so that a note is recognized shortly after its end
+    instead of after the end of the whole recording. The detected notes
+    are the same as get_midi_notes() detects in the whole recording.
+    """
+    def __init__(self, sample_rate, min_confidence=0.8, silence_db=-50.0,
+                 onset_ratio=2.0, pitch_tolerance=0.4, min_note_length=0.04,
+                 frame_size=2048, hop_size=256, start_sample=0):
+        """Sets the detector's empty sample buffer and note list.
+
+        Arguments:
+        >sample_rate: The stream's sample rate in Hz.
+        >start_sample=0: The position of the stream's first sample in the
+                         whole recording, for the notes' start times. It
+                         must be a multiple of hop_size, so that the frames
+                         are the same as in the whole recording.
+        >All further arguments: See get_midi_notes().
+        """
+        _import_numpy()
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self.segmenter = _NoteSegmenter(hop_size / sample_rate,
+                                        min_confidence, silence_db,
+                                        onset_ratio, pitch_tolerance,
+                                        min_note_length)
+        self.buffer = numpy.zeros(0)
+        self.num_analysed_frames = start_sample // hop_size
+        self.midi_notes = []
+        self.num_chunks = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add_chunk(self, chunk):
+        """Analyses the chunk's complete frames and returns the list of newly finished MidiNote instances.
+
+        Arguments:
+        >chunk: The chunk's mono samples, either as float NumPy array in
+                [-1, 1] or as bytes of 16 bit PCM samples (as given by
+                PyAudio with the paInt16 format).
+        """
+        start = time.perf_counter()
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = numpy.frombuffer(chunk, dtype="<i2") / 32768.0
+        self.buffer = numpy.concatenate([self.buffer, chunk])
+        new_midi_notes = []
+        if len(self.buffer) >= self.frame_size:
+            num_frames = (len(self.buffer)-self.frame_size)//self.hop_size + 1
+            times, pitches, confidences, rms = get_frame_pitches(
+                                                self.buffer, self.sample_rate,
+                                                self.frame_size,
+                                                self.hop_size)
+            # Like in get_frame_pitches(), so that the times are identical.
+            times = (numpy.arange(num_frames) + self.num_analysed_frames) *\
+                    self.hop_size / self.sample_rate
+            new_midi_notes = self.segmenter.add_frames(times, pitches,
+                                                       confidences, rms)
+            self.num_analysed_frames += num_frames
+            self.buffer = self.buffer[num_frames*self.hop_size:]
+            self.midi_notes.extend(new_midi_notes)
+
+        latency = time.perf_counter() - start
+        self.num_chunks += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return new_midi_notes
+
+    def finish(self):
+        """Finishes the last note and returns the list of all detected MidiNote instances."""
+        self.midi_notes.extend(self.segmenter.finish())
+        return self.midi_notes
+
+    def get_current_pitch(self):
+        """Returns the pitch (as fractional MIDI number) of the currently sounding note, or None."""
+        return self.segmenter.get_current_pitch()
+
+    def get_stats(self):
+        """Returns the number of analysed chunks and their mean and maximal analysis latency in milliseconds."""
+        return {"chunks": self.num_chunks,
+                "mean_latency_ms": (self.total_latency/self.num_chunks*1000
+                                    if self.num_chunks else 0.0),
+                "max_latency_ms": self.max_latency*1000}
+
+
+def _get_split_position(filepath, target, search_length, frame_size,
+                        hop_size):
+    """Returns the quietest position around the target position of a .wav file.
+
+    The returned position is a multiple of hop_size, so that the frames of
+    the segments which start there are the same as in the whole file.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >target: The target position in samples.
+    >search_length: The maximal distance (in samples) of the returned
+                    position from the target.
+    >frame_size: The length (in samples) of the windows whose levels are
+                 compared.
+    >hop_size: See get_frame_pitches().
+    """
+    search_start = max(0, (target - search_length) // hop_size * hop_size)
+    samples, _ = read_wav_samples(filepath, search_start,
+                                  2*search_length + frame_size)
+    if len(samples) < frame_size:
+        return target // hop_size * hop_size
+    energies = numpy.concatenate([[0], numpy.cumsum(samples**2)])
+    window_starts = numpy.arange(0, len(samples) - frame_size + 1, hop_size)
+    window_energies = energies[window_starts+frame_size] -\
+                      energies[window_starts]
+    quietest = window_starts[numpy.argmin(window_energies)]
+    return int(search_start + (quietest + frame_size//2) // hop_size * hop_size)
+
+
+def _read_segment_midi_notes(task):
+    """Returns the MidiNote instances which start in a segment of a .wav file.
+
+    The segment is read with its overlaps, so that notes which start in
+    the segment are finished, and the detection's state is already settled
+    at the segment's start.
+
+    Arguments:
+    >task: The (filepath, segment start, segment end, overlap, minimal
+           confidence, hop size) tuple, with all positions in samples. The
+           segment start and the overlap are multiples of the hop size.
+    """
+    filepath, start, end, overlap, min_confidence, hop_size = task
+    read_start = max(0, start - overlap)
+    blocks = iter_wav_blocks(filepath, read_start, end + overlap - read_start)
+    sample_rate, _ = next(blocks)
+    detector = StreamingNoteDetector(sample_rate, min_confidence,
+                                     hop_size=hop_size,
+                                     start_sample=read_start)
+    for block in blocks:
+        detector.add_chunk(block)
+    return [midi_note for midi_note in detector.finish()
+            if start <= round(midi_note.start*sample_rate) < end]
+
+
+def get_wav_segments(filepath, segment_length=60.0, search_length=5.0,
+                     frame_size=2048, hop_size=256):
+    """Returns the (start, end) positions (in samples) of the segments of a .wav file.
+
+    The segments are about segment_length long and are split at the
+    quietest position near their targeted ends, i.e. preferably in a
+    silence between two notes.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >segment_length=60.0: The targeted length of a segment in seconds.
+    >search_length=5.0: The maximal distance (in seconds) of a split
+                        position from its targeted position.
+    >frame_size=2048: See get_frame_pitches().
+    >hop_size=256: See get_frame_pitches().
+    """
+    _import_numpy()
+    sample_rate, num_frames = get_wav_info(filepath)
+    segment_samples = int(segment_length * sample_rate)
+    search_samples = min(int(search_length * sample_rate),
+                         segment_samples // 4)
+    splits = [0]
+    while num_frames - splits[-1] >= 1.5*segment_samples:
+        splits.append(_get_split_position(filepath,
+                                          splits[-1] + segment_samples,
+                                          search_samples, frame_size,
+                                          hop_size))
+    splits.append(num_frames)
+    return list(zip(splits[:-1], splits[1:]))
+
+
+def read_midi_notes_from_wav(filepath, min_confidence=0.8, num_workers=1,
+                             segment_length=60.0, overlap=2.0, hop_size=256):
+    """Returns the MidiNote instances of the notes in a .wav file.
+
+    The file is read block by block (see iter_wav_blocks()) and the blocks
+    are given to a StreamingNoteDetector, so that the memory usage doesn't
+    depend on the recording's length. The detected notes are the same as
+    get_midi_notes() detects in all samples.
+
+    With more than one worker, long files are split into segments (see
+    get_wav_segments()) which are transcribed by a pool of worker
+    processes. Every segment is read with an overlap to its neighbours
+    and keeps the notes which start in it, so that the stitched notes are
+    the same as the serially detected ones, unless a note lasts longer
+    than the overlap beyond a split position.
+
+    Arguments:
+    >filepath: The .wav file's path.
+    >min_confidence=0.8: The minimal periodicity confidence of a note.
+    >num_workers=1: The number of worker processes. If None, the number
+                    of CPUs is used.
+    >segment_length=60.0: The targeted length of a segment in seconds.
+    >overlap=2.0: The length (in seconds) which every segment is read
+                  beyond its start and its end.
+    >hop_size=256: See get_frame_pitches().
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers > 1:
+        segments = get_wav_segments(filepath, segment_length,
+                                    hop_size=hop_size)
+    if (num_workers == 1) or (len(segments) == 1):
+        blocks = iter_wav_blocks(filepath)
+        sample_rate, _ = next(blocks)
+        detector = StreamingNoteDetector(sample_rate, min_confidence,
+                                         hop_size=hop_size)
+        for block in blocks:
+            detector.add_chunk(block)
+        return detector.finish()
+
+    import concurrent.futures # Only needed for parallel transcriptions.
+    sample_rate, _ = get_wav_info(filepath)
+    overlap_samples = int(overlap * sample_rate) // hop_size * hop_size
+    tasks = [(filepath, start, end, overlap_samples, min_confidence,
+              hop_size)
+             for start, end in segments]
+    midi_notes = []
+    with concurrent.futures.ProcessPoolExecutor(
+          max_workers=min(num_workers, len(tasks))) as executor:
+        for segment_midi_notes in executor.map(_read_segment_midi_notes,
+                                               tasks):
+            midi_notes.extend(segment_midi_notes)
+    return midi_notes
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+#
+# profiling.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""profiling.py - Opt-in timing instrumentation of BachBro's data methods.
+
+A Profiler instance collects the wall times and call counts of measured
+code spans (e.g. BachBroData methods or subprocess calls). Nested spans
+are recorded with their call stack. The collected data can be exported as
+JSON statistics, as a Chrome trace event file (which can be viewed as a
+flame graph in e.g. chrome://tracing, Perfetto or speedscope) or as folded
+stacks for flamegraph.pl.
+Profiling is disabled as long as no Profiler instance is set, see
+BachBroData's 'profiler' member variable.
+"""
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+# Shared no-op context manager of disabled measurements.
+_NO_MEASUREMENT = contextlib.nullcontext()
+
+
+class Profiler:
+    """Collector of the timings of measured code spans."""
+    def __init__(self, max_events=100000):
+        """Sets the profiler's empty statistics and events.
+
+        Arguments:
+        >max_events=100000: The maximal number of stored single events.
+                            The statistics also include the measurements
+                            after this limit.
+        """
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.start_time = time.perf_counter_ns()
+        self.stats = collections.OrderedDict()
+        self.events = []
+        self.num_dropped_events = 0
+
+    def _add_measurement(self, stack, start, duration):
+        """Adds a finished measurement to the statistics and the events.
+
+        Arguments:
+        >stack: The tuple of span names, from the outermost to the
+                measured span.
+        >start: The span's start time in nanoseconds.
+        >duration: The span's wall time in nanoseconds.
+        """
+        name = stack[-1]
+        with self.lock:
+            if name not in self.stats:
+                self.stats[name] = {"calls": 0, "total_ns": 0,
+                                    "min_ns": duration, "max_ns": duration}
+            stats = self.stats[name]
+            stats["calls"] += 1
+            stats["total_ns"] += duration
+            stats["min_ns"] = min(stats["min_ns"], duration)
+            stats["max_ns"] = max(stats["max_ns"], duration)
+
+            if len(self.events) < self.max_events:
+                self.events.append((stack, start - self.start_time, duration,
+                                    threading.get_ident()))
+            else:
+                self.num_dropped_events += 1
+
+    def export_folded(self, filepath):
+        """Writes the events as folded stacks, the input format of flamegraph.pl.
+
+        Every line consists of a semicolon separated call stack and its
+        self time (i.e. without the time of nested spans) in microseconds.
+
+        Arguments:
+        >filepath: The path of the written text file.
+        """
+        self_times = collections.OrderedDict()
+        with self.lock:
+            events = list(self.events)
+        for stack, _, duration, _ in events:
+            self_times[stack] = self_times.get(stack, 0) + duration
+            if len(stack) > 1:
+                self_times[stack[:-1]] = self_times.get(stack[:-1], 0) - duration
+        with open(filepath, "w", encoding="utf-8") as f:
+            for stack, self_time in self_times.items():
+                f.write(";".join(stack)+" "+str(max(0, self_time // 1000))+"\n")
+
+    def export_json(self, filepath):
+        """Writes the statistics of all measured spans as a JSON file.
+
+        Arguments:
+        >filepath: The path of the written JSON file.
+        """
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.get_stats(), f, indent=4)
+
+    def export_trace(self, filepath):
+        """Writes the events as a Chrome trace event JSON file.
+
+        Arguments:
+        >filepath: The path of the written JSON file.
+        """
+        with self.lock:
+            events = list(self.events)
+        trace_events = [{"name": stack[-1],
+                         "ph": "X",
+                         "ts": start / 1000,
+                         "dur": duration / 1000,
+                         "pid": os.getpid(),
+                         "tid": thread_id}
+                        for stack, start, duration, thread_id in events]
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events,
+                       "displayTimeUnit": "ms"}, f)
+
+    def get_stats(self):
+        """Returns the call counts and times (in milliseconds) of all measured spans."""
+        with self.lock:
+            stats = collections.OrderedDict()
+            for name, name_stats in self.stats.items():
+                stats[name] = {
+                    "calls": name_stats["calls"],
+                    "total_ms": name_stats["total_ns"] / 1e6,
+                    "mean_ms": name_stats["total_ns"] / name_stats["calls"] / 1e6,
+                    "min_ms": name_stats["min_ns"] / 1e6,
+                    "max_ms": name_stats["max_ns"] / 1e6}
+            return {"spans": stats,
+                    "events": len(self.events),
+                    "dropped_events": self.num_dropped_events}
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """Context manager which measures the wall time of its code span.
+
+        Arguments:
+        >name: The span's name, e.g. the measured method's name.
+        """
+        stack = getattr(self.local, "stack", ())
+        self.local.stack = stack + (name,)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            self.local.stack = stack
+            self._add_measurement(stack + (name,), start, duration)
+
+    def reset(self):
+        """Removes all collected statistics and events."""
+        with self.lock:
+            self.start_time = time.perf_counter_ns()
+            self.stats.clear()
+            self.events = []
+            self.num_dropped_events = 0
+
+
+def measure(profiler, name):
+    """Returns a context manager which measures its code span, if profiling is enabled.
+
+    Arguments:
+    >profiler: The Profiler instance, or None if profiling is disabled.
+    >name: The span's name.
+    """
+    if profiler is None:
+        return _NO_MEASUREMENT
+    return profiler.measure(name)
+
+
+def profiled(method):
+    """Decorator which measures the method's calls with its instance's profiler.
+
+    The instance's 'profiler' member variable is either a Profiler instance
+    or None. In the latter case, the method is called directly.
+    """
+    @functools.wraps(method)
+    def profiled_method(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.measure(method.__name__):
+            return method(self, *args, **kwargs)
+    return profiled_method
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+#
+# query_server.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""query_server.py - Local HTTP/JSON query service over BachBroData.
+
+One long-running process loads the music theory data once and answers
+the queries of all clients. Every request is handled in its own thread,
+and the responses of deterministic queries are kept in an LRU cache.
+The server only listens on localhost. Run it from BachBro's main folder
+with:
+python -m submodules.query_server [port]
+
+Supported GET requests (all arguments are URL query arguments):
+>/scale?name=...: The scale's JSON data.
+>/fitting_scales?notes=C,E,G: The fitting scales of the given notes.
+>/identical_scales?name=...: The scales with the same interval structure.
+>/scale_sample?keynote=...&scale=...&start_octave=4&chord=0&randomized=0:
+  The notes of the scale sample, see BachBroData.get_scale_sample().
+>/musicxml?keynote=...&scale=...&start_octave=4&chord=0&randomized=0
+  &title=...&clef=...&mode=...&instrument=...: The scale sample's
+  MusicXML. The title, clef, mode and instrument default to the first
+  ones of the JSON data.
+>/stats: The server's request, latency, throughput and cache numbers.
+"""
+
+import functools
+import http.server
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+import submodules.bachbro_data
+
+
+class QueryError(Exception):
+    """Raised if a query can't be answered. Results in an HTTP error response."""
+    def __init__(self, status, message):
+        """Sets the exception's HTTP status and message.
+
+        Arguments:
+        >status: The HTTP status code of the error response.
+        >message: The error message.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class QueryService:
+    """The HTTP server independent part of the query service.
+
+    It answers queries given as a path and query arguments, caches the
+    deterministic answers and keeps the request statistics.
+    """
+    def __init__(self, data, cache_size=1024):
+        """Sets the service's data, cache and statistics.
+
+        Arguments:
+        >data: The used BachBroData instance.
+        >cache_size=1024: The maximal number of cached responses.
+        """
+        self.data = data
+        self.handlers = {
+            "/scale": self._get_scale,
+            "/fitting_scales": self._get_fitting_scales,
+            "/identical_scales": self._get_identical_scales,
+            "/scale_sample": self._get_scale_sample,
+            "/musicxml": self._get_musicxml,
+        }
+        self._get_cached_response = functools.lru_cache(cache_size)(
+                                     self._get_response)
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.num_requests = 0
+        self.num_errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _get_argument(self, arguments, name, default=None):
+        """Returns the given query argument, or its default.
+
+        Raises a QueryError if the argument is missing and has no default.
+
+        Arguments:
+        >arguments: The query arguments as a dictionary.
+        >name: The argument's name.
+        >default=None: The argument's default value.
+        """
+        if name in arguments:
+            return arguments[name]
+        if default is None:
+            raise QueryError(400, "Missing argument: "+name)
+        return default
+
+    def _get_int_argument(self, arguments, name, default=None):
+        """Returns the given query argument as an integer.
+
+        Raises a QueryError if the argument is missing (without default) or
+        isn't an integer.
+
+        Arguments:
+        >arguments: The query arguments as a dictionary.
+        >name: The argument's name.
+        >default=None: The argument's default value as a string.
+        """
+        value = self._get_argument(arguments, name, default)
+        try:
+            return int(value)
+        except ValueError:
+            raise QueryError(400, "Invalid argument: "+name+"="+value)
+
+    def _get_bool_argument(self, arguments, name):
+        """Returns the given query argument as a boolean. It defaults to False."""
+        return self._get_argument(arguments, name, "0").lower() in ("1", "true")
+
+    def _get_fitting_scales(self, arguments):
+        """Returns the fitting scales of the 'notes' argument's comma separated notes."""
+        notes = self._get_argument(arguments, "notes", "")
+        notes_list = [i for i in notes.split(",") if i != ""]
+        return "application/json", self.data.get_fitting_scales(notes_list)
+
+    def _get_identical_scales(self, arguments):
+        """Returns the scales with the same interval structure as the 'name' argument's scale."""
+        name = self._get_argument(arguments, "name")
+        return "application/json", self.data.get_identical_scales(name)
+
+    def _get_musicxml(self, arguments):
+        """Returns the MusicXML of the scale sample of the given arguments."""
+        notes = self._get_scale_sample_notes(arguments)
+        title = self._get_argument(arguments, "title",
+                                   arguments["keynote"]+"-"+arguments["scale"])
+        clef = self._get_argument(arguments, "clef",
+                                  next(iter(self.data.clefs)))
+        mode = self._get_argument(arguments, "mode",
+                                  next(iter(self.data.modes)))
+        instrument = self._get_argument(arguments, "instrument",
+                                        next(iter(self.data.midi_instruments)))
+        musicxml = io.StringIO()
+        self.data.write_musicxml(musicxml, title, clef, mode, instrument, notes)
+        return "application/vnd.recordare.musicxml+xml", musicxml.getvalue()
+
+    def _get_response(self, path, argument_items):
+        """Returns the (status, content type, body) tuple of the query.
+
+        Arguments:
+        >path: The query's URL path.
+        >argument_items: The query arguments as a tuple of (name, value)
+                         tuples. A tuple is used, as the responses are
+                         cached by these arguments.
+        """
+        if path not in self.handlers:
+            return 404, "application/json",\
+                   json.dumps({"error": "Unknown path: "+path}).encode("utf-8")
+        try:
+            content_type, content = self.handlers[path](dict(argument_items))
+        except QueryError as error:
+            return error.status, "application/json",\
+                   json.dumps({"error": str(error)}).encode("utf-8")
+        except KeyError as error:
+            return 404, "application/json",\
+                   json.dumps({"error": "Unknown data: "+str(error)}).encode("utf-8")
+        except ValueError as error:
+            return 400, "application/json",\
+                   json.dumps({"error": "Invalid argument: "+str(error)}).encode("utf-8")
+        if content_type == "application/json":
+            content = json.dumps(content)
+        return 200, content_type, content.encode("utf-8")
+
+    def _get_scale(self, arguments):
+        """Returns the JSON data of the 'name' argument's scale."""
+        name = self._get_argument(arguments, "name")
+        return "application/json", self.data.scales[name]
+
+    def _get_scale_sample(self, arguments):
+        """Returns the notes of the scale sample of the given arguments as dictionaries."""
+        notes = self._get_scale_sample_notes(arguments)
+        if isinstance(notes, submodules.bachbro_data.ScaleSample):
+            notes = notes.notes
+        return "application/json", [vars(note) for note in notes]
+
+    def _get_scale_sample_notes(self, arguments):
+        """Returns the Note instances (or the cached ScaleSample) of the scale sample of the given arguments."""
+        keynote = self._get_argument(arguments, "keynote")
+        name = self._get_argument(arguments, "scale")
+        start_octave = self._get_int_argument(arguments, "start_octave", "4")
+        chord = self._get_bool_argument(arguments, "chord")
+        if self._get_bool_argument(arguments, "randomized"):
+            return self.data.get_scale_sample(keynote, name, start_octave,
+                                              chord=chord, randomized=True)
+        return self.data.get_cached_scale_sample(keynote, name, start_octave,
+                                                 chord=chord)
+
+    def _get_stats(self):
+        """Returns the request, latency, throughput and cache statistics."""
+        with self.lock:
+            uptime = time.perf_counter() - self.start_time
+            num_requests = self.num_requests
+            stats = {
+                "uptime_s": uptime,
+                "requests": num_requests,
+                "errors": self.num_errors,
+                "mean_latency_ms": (self.total_latency/num_requests*1000
+                                    if num_requests else 0.0),
+                "max_latency_ms": self.max_latency*1000,
+                "throughput_rps": num_requests/uptime if uptime else 0.0,
+            }
+        cache_info = self._get_cached_response.cache_info()
+        stats["cache"] = {"hits": cache_info.hits,
+                          "misses": cache_info.misses,
+                          "size": cache_info.currsize,
+                          "max_size": cache_info.maxsize}
+        stats["sample_cache"] = self.data.get_scale_sample_cache_info()
+        return stats
+
+    def query(self, path, arguments):
+        """Returns the (status, content type, body) tuple of the query.
+
+        Randomized scale samples are never cached. The query's latency is
+        added to the statistics.
+
+        Arguments:
+        >path: The query's URL path.
+        >arguments: The query arguments as a dictionary.
+        """
+        if path == "/stats":
+            body = json.dumps(self._get_stats()).encode("utf-8")
+            return 200, "application/json", body
+
+        start = time.perf_counter()
+        argument_items = tuple(sorted(arguments.items()))
+        if self._get_bool_argument(arguments, "randomized"):
+            response = self._get_response(path, argument_items)
+        else:
+            response = self._get_cached_response(path, argument_items)
+        latency = time.perf_counter() - start
+
+        with self.lock:
+            self.num_requests += 1
+            if response[0] != 200:
+                self.num_errors += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return response
+
+
+class QueryRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP request handler which passes GET requests to the server's QueryService."""
+    def do_GET(self):
+        """Answers the GET request."""
+        url = urllib.parse.urlsplit(self.path)
+        arguments = dict(urllib.parse.parse_qsl(url.query))
+        status, content_type, body = self.server.service.query(url.path,
+                                                               arguments)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type+"; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Suppresses the logging of every request, see /stats instead."""
+
+
+class QueryServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Threaded HTTP server of a QueryService. Handles requests concurrently."""
+    daemon_threads = True
+
+    def __init__(self, service, port=8080, host="127.0.0.1"):
+        """Binds the server.
+
+        Arguments:
+        >service: The QueryService instance which answers the queries.
+        >port=8080: The server's port. If 0, a free port is chosen.
+        >host="127.0.0.1": The server's host. It should be a localhost
+                           address, as the service is not meant to be
+                           public.
+        """
+        super().__init__((host, port), QueryRequestHandler)
+        self.service = service
+
+
+def main(args):
+    """Starts the query server on the given (or the default) port."""
+    port = int(args[1]) if len(args) > 1 else 8080
+    data = submodules.bachbro_data.BachBroData(
+            os.getcwd().replace("\\", "/")+"/data/")
+    server = QueryServer(QueryService(data), port)
+    print("BachBro query server running on http://127.0.0.1:%d/" %
+          server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -19,11 +19,15 @@
 """record_instrument.py - Module for getting notes from microphone or .wav record.
 
 The microphone is accessed with pyaudio. The note recognition is done by
-calling aubio.
+BachBro's built-in pitch detection (if NumPy is installed) or by calling
+aubio. With the built-in pitch detection, microphone recordings can also be
+transcribed live, i.e. chunk by chunk while recording.
 """
 
 
+import importlib.util
 import pyaudio
+import queue
 import threading
 import time
 import tkinter
@@ -32,6 +36,9 @@ import tkinter.ttk
 import tkinter.filedialog
 import wave
 
+import submodules.bachbro_data
+import submodules.pitch_detection
+
 
 class RecordInstrument(tkinter.Frame):
     """Main class for note recognition from an .wav file."""
@@ -121,10 +128,40 @@ class RecordInstrument(tkinter.Frame):
         label_space = tkinter.Label(self, text="")
         label_space.pack()
         
+        # Pitch detection engine combobox.
+        frame_engine = tkinter.Frame(self)
+        label_engine = tkinter.Label(frame_engine, text="Pitch detection:")
+        self.var_engine = tkinter.StringVar()
+        engines = list(submodules.bachbro_data.PITCH_DETECTION_ENGINES)
+        if importlib.util.find_spec("numpy") is None:
+            self.var_engine.set("aubio")
+        else:
+            self.var_engine.set(engines[0])
+        engine = tkinter.ttk.Combobox(frame_engine, width=15,
+                                      textvariable=self.var_engine,
+                                      state="readonly")
+        engine["values"] = engines
+        label_engine.pack(side="left")
+        engine.pack(side="left")
+        frame_engine.pack()
+        
+        # Live transcription checkbox and recognized notes.
+        self.var_live = tkinter.BooleanVar()
+        self.var_live.set(self.var_engine.get() == "built-in")
+        live = tkinter.Checkbutton(self,
+                                   text="Show notes live while recording "
+                                        "(built-in pitch detection only)",
+                                   variable=self.var_live)
+        live.pack()
+        self.var_live_notes = tkinter.StringVar()
+        label_live_notes = tkinter.Label(self,
+                                         textvariable=self.var_live_notes)
+        label_live_notes.pack()
+        
         # Confidence threshold entry.
         frame_threshold = tkinter.Frame(self)
         label_threshold = tkinter.Label(frame_threshold,
-                                        text="aubio confidence threshold "
+                                        text="Confidence threshold "
                                              "(notes with lower recognition confidence will be ignored):")
         self.entry_threshold = tkinter.Entry(frame_threshold, width=20)
         self.entry_threshold.insert("end", ".8")
@@ -136,10 +173,10 @@ class RecordInstrument(tkinter.Frame):
         label_space.pack()
         
         # Buttons.
-        set_wav = tkinter.Button(self, text="Read and show notes from .wav (using aubio)", command=self._set_wav)
+        set_wav = tkinter.Button(self, text="Read and show notes from .wav", command=self._set_wav)
         set_wav.pack()
         
-        self.record_text = "Record from microphone and show read notes (using PyAudio and aubio) "\
+        self.record_text = "Record from microphone and show read notes (using PyAudio) "\
                            "[Menu key or Scroll Lock]"
         self.button_record_and_show = tkinter.Button(self,
                                                      text=self.record_text,
@@ -157,41 +194,98 @@ class RecordInstrument(tkinter.Frame):
         self.rate = 44100
 
         self.is_recording = False
+        self.record_error = None
+        self.live_detector = None
         self.record_wav_number = 0
+        self.record_wav_path = ""
         self.wav_path = ""
 
-    def _create_musicxml(self, xml_path, title):
-        """Cretes the MusicXML containing all notes recognized by aubio.
+    def _create_musicxml(self, xml_path, title, midi_notes=None):
+        """Cretes the MusicXML containing all recognized notes.
         
         Arguments:
         >xml_path: The MusicXML's file path.
         >title: The MusicXML's score title.
+        >midi_notes=None: The MidiNote instances of a live transcription.
+                          If None, the notes are recognized in the .wav
+                          file.
         """
-        notes = self.parent.data.read_notes_from_wav(
-                     filepath=self.wav_path,
-                     disallowed_note_lengths=\
-                      self.note_lengths.curselection(),
-                     min_note=self.var_min_note.get(),
-                     min_octave=self.var_min_octave.get(),
-                     max_note=self.var_max_note.get(),
-                     max_octave=self.var_max_octave.get(),
-                     error_threshold=self.entry_threshold.get())
+        if midi_notes is None:
+            try:
+                float(self.entry_threshold.get())
+            except ValueError:
+                tkinter.messagebox.showerror("BachBro - Error",
+                                             "Invalid confidence threshold!\n"\
+                                             "Enter a number, e.g. .8")
+                return
+        try:
+            if midi_notes is not None:
+                notes = self.parent.data.get_notes_from_midi_notes(
+                         midi_notes,
+                         disallowed_note_lengths=\
+                          self.note_lengths.curselection(),
+                         min_note=self.var_min_note.get(),
+                         min_octave=self.var_min_octave.get(),
+                         max_note=self.var_max_note.get(),
+                         max_octave=self.var_max_octave.get())
+            else:
+                notes = self.parent.data.read_notes_from_wav(
+                         filepath=self.wav_path,
+                         disallowed_note_lengths=\
+                          self.note_lengths.curselection(),
+                         min_note=self.var_min_note.get(),
+                         min_octave=self.var_min_octave.get(),
+                         max_note=self.var_max_note.get(),
+                         max_octave=self.var_max_octave.get(),
+                         error_threshold=self.entry_threshold.get(),
+                         engine=self.var_engine.get(),
+                         # No worker processes are started by the GUI, as
+                         # they would restart a frozen (pyinstaller) BachBro
+                         # and fork the recording threads.
+                         num_workers=1)
+        except ImportError:
+            tkinter.messagebox.showerror("BachBro - Error",
+                                         "The built-in pitch detection needs NumPy!\n"\
+                                         "Install NumPy (see INSTALL.txt) or select aubio.")
+            return
+        except submodules.bachbro_data.AubioCommandError:
+            tkinter.messagebox.showerror("BachBro - Error",
+                                         "aubionotes command not found!\n"\
+                                         "Possible solutions:\n"\
+                                         ">Set the correct aubionotes command via 'Edit->Set aubio command...'\n"\
+                                         ">Install and set up aubio on your system, see BachBro's INSTALL.txt\n"\
+                                         ">Put aubionotes binary to your system's PATH\n"\
+                                         ">Permit aubionotes to be executed on your system")
+            return
+        except (wave.Error, ValueError, OSError) as error:
+            tkinter.messagebox.showerror("BachBro - Error",
+                                         "The notes could not be read from the .wav file!\n" +
+                                         str(error))
+            return
         if notes is False:
             tkinter.messagebox.showinfo("BachBro - No notes detected",
-                                        "Aubio could not detect any note."\
+                                        "No note could be detected. "\
                                         "You could try to use a lower confidence threshold.")
+            return
         
         mode = self.parent.var_mode.get().split(" (")[0]
-        self.parent.data.create_musicxml(xml_path,
-                                         "From wav",
-                                         self.parent.var_clef.get(),
-                                         mode,
-                                         self.parent.var_midi_instrument.get(),
-                                         notes)
-        self.parent.data.open_with_sheet_editor(xml_path)
+        self.parent.data.create_score(xml_path,
+                                      "From wav",
+                                      self.parent.var_clef.get(),
+                                      mode,
+                                      self.parent.var_midi_instrument.get(),
+                                      notes)
+        self.parent.open_with_sheet_editor(xml_path)
 
     def _record(self):
-        """Threaded method for recording from microphone."""
+        """Threaded method for recording from microphone.
+        
+        Every recorded chunk is directly appended to the .wav file, so that
+        the memory usage doesn't grow with the recording's length and the
+        file is complete as soon as the recording stops.
+        If the recording fails, its error message is kept as record_error,
+        which is shown in the main thread (see _show_record_error()).
+        """
         self.audio = pyaudio.PyAudio()
         
         try:
@@ -201,46 +295,143 @@ class RecordInstrument(tkinter.Frame):
                                      input=True,
                                      frames_per_buffer=self.chunk)
         except:
-            self.button_record_and_show["text"] =  self.record_text
+            self.audio.terminate()
+            self.record_error = "No audio input device could be detected by pyaudio.\n"\
+                                "Check if the microphone is activated or properly"\
+                                " connected with the computer."
             self.is_recording = False
-            tkinter.messagebox.showerror("BachBro - Error",
-                                         "No audio input device could be detected by pyaudio.\n"\
-                                         "Check if the microphone is activated or properly"\
-                                         " connected with the computer.")
             return
-            
-        self.frames = []
-        while self.is_recording: # Is set via self._set_recording outside of this method's thread.
-            data = stream.read(self.chunk)
-            self.frames.append(data)
+        
+        try:
+            wf = wave.open(self.record_wav_path, 'wb')
+            try:
+                wf.setnchannels(self.channels)
+                wf.setsampwidth(self.audio.get_sample_size(self.format_))
+                wf.setframerate(self.rate)
+                while self.is_recording: # Is set via self._set_recording outside of this method's thread.
+                    data = stream.read(self.chunk)
+                    # The header's frame number is only written once, at closing.
+                    wf.writeframesraw(data)
+                    if self.live_detector is not None:
+                        for midi_note in self.live_detector.add_chunk(data):
+                            self.live_queue.put(midi_note)
+            finally:
+                wf.close()
+        except Exception as error:
+            self.record_error = "The recording failed:\n" + str(error)
+            self.is_recording = False
+        finally:
+            stream.stop_stream()
+            stream.close()
+            self.audio.terminate()
 
-        stream.stop_stream()
-        stream.close()
-        self.audio.terminate()
+    def _show_record_error(self):
+        """Shows the error message of a failed recording, if there is one.
+        
+        Returns True if an error was shown. It is called in the main thread,
+        as tkinter's widgets may only be changed there.
+        """
+        if self.record_error is None:
+            return False
+        error = self.record_error
+        self.record_error = None
+        self.button_record_and_show["text"] =  self.record_text
+        tkinter.messagebox.showerror("BachBro - Error", error)
+        return True
+
+    def _check_recording(self):
+        """Shows the error of a failed recording as soon as its thread ended.
+        
+        It is called periodically with tkinter's after() while the
+        recording thread runs.
+        """
+        if self.record_thread.is_alive():
+            self.after(100, self._check_recording)
+        else:
+            self._show_record_error()
+
+    def _get_live_note_text(self, midi_note):
+        """Returns the displayed 'name+octave' text of a live recognized MidiNote."""
+        name, octave = self.parent.data.get_note_name_and_octave(midi_note)
+        return name+str(octave)
+
+    def _update_live_notes(self):
+        """Shows the newly recognized notes of the live transcription.
+        
+        It is called periodically with tkinter's after() while recording,
+        as tkinter's widgets may only be changed in the main thread.
+        """
+        while not self.live_queue.empty():
+            self.live_note_texts.append(
+             self._get_live_note_text(self.live_queue.get()))
+        del self.live_note_texts[:-16]
+        text = " ".join(self.live_note_texts)
+        current_pitch = self.live_detector.get_current_pitch()
+        if current_pitch is not None:
+            current_note = submodules.bachbro_data.MidiNote(
+                            round(current_pitch), 0, 0,
+                            cents=(current_pitch-round(current_pitch))*100)
+            text += " [" + self._get_live_note_text(current_note) + "]"
+        self.var_live_notes.set(text)
+        if self.is_recording:
+            self.after(50, self._update_live_notes)
 
     def _set_recording(self, *e):
-        """Starts microphone recording and saving of it into a .wav file."""
+        """Starts or stops microphone recording into a .wav file.
+        
+        After stopping, the recording's notes are shown.
+        """
         if not self.is_recording:
+            # A recording which failed before this click isn't restarted.
+            if self._show_record_error():
+                return
+            self.live_detector = None
+            if self.var_live.get() and (self.var_engine.get() == "built-in"):
+                try:
+                    threshold = float(self.entry_threshold.get())
+                except ValueError:
+                    tkinter.messagebox.showerror("BachBro - Error",
+                                                 "Invalid confidence threshold!\n"\
+                                                 "Enter a number, e.g. .8")
+                    return
+                try:
+                    self.live_detector = \
+                     submodules.pitch_detection.StreamingNoteDetector(
+                      self.rate, threshold)
+                except ImportError:
+                    tkinter.messagebox.showerror("BachBro - Error",
+                                                 "The built-in pitch detection needs NumPy!\n"\
+                                                 "Install NumPy (see INSTALL.txt) or select aubio.")
+                    return
+                self.live_queue = queue.Queue()
+                self.live_note_texts = []
+                self.var_live_notes.set("")
+            self.record_wav_path = "./data/temp/" +\
+                                   str(self.record_wav_number)+".wav"
             self.is_recording = True
             self.button_record_and_show["text"] = "RECORDING..."
             self.record_thread = threading.Thread(target=self._record)
             self.record_thread.start()
+            self.after(100, self._check_recording)
+            if self.live_detector is not None:
+                self.after(50, self._update_live_notes)
         else:
             self.is_recording = False
             self.button_record_and_show["text"] =  self.record_text
             while self.record_thread.is_alive():
                 time.sleep(.01)
-            wav_name = "./data/temp/"+str(self.record_wav_number)+".wav"
-            wf = wave.open(wav_name, 'wb')
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.audio.get_sample_size(self.format_))
-            wf.setframerate(self.rate)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
-            self.wav_path = wav_name
+            if self._show_record_error():
+                return
+            self.wav_path = self.record_wav_path
+            # A live transcription's notes are already recognized.
+            midi_notes = None
+            if self.live_detector is not None:
+                midi_notes = self.live_detector.finish()
             self._create_musicxml("./data/temp/MA" +
-                                  str(self.parent.current_file_number)+".xml",
-                                  "Recognized notes (by aubio) from microphone recording")
+                                  str(self.parent.current_file_number) +
+                                  self.parent.get_musicxml_extension(),
+                                  "Recognized notes from microphone recording",
+                                  midi_notes)
             self.parent.current_file_number += 1
     
     def _set_wav(self, *e):
@@ -251,6 +442,7 @@ class RecordInstrument(tkinter.Frame):
         if wav_path:
             self.wav_path = wav_path
             self._create_musicxml("./data/temp/MA" +
-                                  str(self.parent.current_file_number)+".xml",
-                                  "Recognized notes (by aubio) from .wav file")
+                                  str(self.parent.current_file_number) +
+                                  self.parent.get_musicxml_extension(),
+                                  "Recognized notes from .wav file")
             self.parent.current_file_number += 1
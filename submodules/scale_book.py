@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+#
+# scale_book.py
+# Copyright (C) 2018 Paulocracy
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""scale_book.py - Parallel export of a 'scale book' in MusicXML.
+
+A scale book contains the scale (or chord) sample of every scale in every
+keynote and every clef. The samples are independent of each other, so
+that they are created and rendered by a pool of worker processes. Each
+worker loads BachBro's data once (from the snapshots, if available).
+The scale book is either written as one MusicXML file per sample, or as
+a single MusicXML file with one part per sample. Both can also be
+written as compressed MusicXML (.mxl). Run it from BachBro's
+main folder with:
+python -m submodules.scale_book OUTPUT_PATH [options]
+See 'python -m submodules.scale_book --help' for the options.
+"""
+
+import argparse
+import concurrent.futures
+import io
+import os
+import re
+import sys
+
+import submodules.bachbro_data
+import submodules.musicxml_writer
+
+
+# The BachBroData instance of the current worker process.
+_worker_data = None
+
+
+def _init_worker(datapath):
+    """Loads the worker process' BachBroData instance.
+
+    Arguments:
+    >datapath: The path of BachBro's data folder.
+    """
+    global _worker_data
+    _worker_data = submodules.bachbro_data.BachBroData(datapath)
+
+
+def _get_filename(item_number, keynote, scale, clef, extension):
+    """Returns the MusicXML filename of a scale book item.
+
+    The filename starts with the item's number, so that the files are
+    sorted like the scale book. Characters which may be problematic in
+    filenames are replaced by underscores.
+
+    Arguments:
+    >item_number: The item's number in the scale book.
+    >keynote: The item's keynote.
+    >scale: The item's scale name.
+    >clef: The item's clef.
+    >extension: The file extension, i.e. '.xml' or '.mxl'.
+    """
+    name = "_".join((keynote, scale, clef))
+    name = re.sub(r"[^\w\-]+", "_", name.replace("#", "sharp")).strip("_")
+    return "%05d_%s%s" % (item_number, name, extension)
+
+
+def _get_part_musicxml(task):
+    """Returns the MusicXML lines of a scale book item as part of a multi part score.
+
+    The returned text starts with a newline, as it continues the score's
+    part list or the previous part.
+
+    Arguments:
+    >task: The (part id, keynote, scale, clef, mode, start octave, chord)
+           tuple of the item.
+    """
+    part_id, keynote, scale, clef, mode, start_octave, chord = task
+    sample = _worker_data.get_cached_scale_sample(keynote, scale, start_octave,
+                                                  chord=chord)
+    f = io.StringIO()
+    writer = submodules.musicxml_writer.MusicXMLWriter(
+              f, _worker_data.note_lengths, is_continuation=True)
+    writer.write_part_start(part_id,
+                            _worker_data.note_lengths["quarter"]["divisions"],
+                            _worker_data.modes[mode]["numberSharps"],
+                            _worker_data.clefs[clef])
+    for note, fragment in zip(sample.notes, sample.note_fragments):
+        writer.write_note_fragment(fragment, note.accidental == "")
+    writer.write_part_end()
+    return f.getvalue()
+
+
+def _write_item_file(task):
+    """Writes the MusicXML file of a scale book item and returns its path.
+
+    Arguments:
+    >task: The (filepath, keynote, scale, clef, mode, instrument, start
+           octave, chord) tuple of the item.
+    """
+    filepath, keynote, scale, clef, mode, instrument, start_octave, chord = task
+    # The items of the same scale and keynote only differ in their clef,
+    # so that their sample is taken from the sample cache.
+    sample = _worker_data.get_cached_scale_sample(keynote, scale, start_octave,
+                                                  chord=chord)
+    _worker_data.create_musicxml(filepath, keynote+"-"+scale, clef, mode,
+                                 instrument, sample)
+    return filepath
+
+
+def get_scale_book_items(data, clefs=None, keynotes=None, scales=None):
+    """Returns the (keynote, scale, clef) tuples of all scale book items.
+
+    The items are ordered by scale, keynote and clef, each in the order
+    of the JSON data. The scale list's separators (scales without notes)
+    are left out.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >clefs=None: The list of the used clefs. If None, all clefs are used.
+    >keynotes=None: The list of the used keynotes. If None, all notes
+                    are used as keynote.
+    >scales=None: The list of the used scales. If None, all scales are
+                  used.
+    """
+    clefs = list(data.clefs) if clefs is None else clefs
+    keynotes = list(data.notes) if keynotes is None else keynotes
+    scales = list(data.scales) if scales is None else scales
+    return [(keynote, scale, clef)
+            for scale in scales
+            if len(data.scales[scale]["notesInCentsToKeynote"]) > 0
+            for keynote in keynotes
+            for clef in clefs]
+
+
+def export_scale_book(data, output_path, items, mode, instrument,
+                      start_octave=4, chord=False, combined=False,
+                      compressed=False, num_workers=None,
+                      progress_function=None):
+    """Exports the scale book items with a pool of worker processes.
+
+    The worker processes load their own BachBroData instances from the
+    given instance's data path. The items are distributed in chunks to
+    reduce the inter-process communication. Returns the list of written
+    MusicXML filepaths.
+
+    Arguments:
+    >data: The BachBroData instance.
+    >output_path: The folder of the MusicXML files, or, if combined is
+                  True, the path of the multi part MusicXML file.
+    >items: The list of (keynote, scale, clef) tuples, see
+            get_scale_book_items().
+    >mode: The flats/sharps at the beginning of every sheet.
+    >instrument: The MIDI instrument of every sheet.
+    >start_octave=4: The start octave of every sample.
+    >chord=False: True, if chord samples shall be exported instead of
+                  scale samples.
+    >combined=False: True, if all items shall be written as parts of a
+                     single MusicXML file. Its compression is determined
+                     by its file extension.
+    >compressed=False: True, if the single MusicXML files shall be written
+                       as compressed MusicXML (.mxl) files.
+    >num_workers=None: The number of worker processes. If None, the
+                       number of CPUs is used.
+    >progress_function=None: Function which is called with the number of
+                             finished items and the number of all items
+                             after every finished item.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    chunksize = max(1, min(64, len(items) // (num_workers*4)))
+    with concurrent.futures.ProcessPoolExecutor(
+          max_workers=num_workers, initializer=_init_worker,
+          initargs=(data.datapath,)) as executor:
+        if combined:
+            return [_write_combined_file(data, executor, output_path, items,
+                                         mode, instrument, start_octave,
+                                         chord, chunksize, progress_function)]
+
+        os.makedirs(output_path, exist_ok=True)
+        tasks = [(os.path.join(output_path,
+                               _get_filename(i+1, keynote, scale, clef,
+                                             ".mxl" if compressed else ".xml")),
+                  keynote, scale, clef, mode, instrument, start_octave, chord)
+                 for i, (keynote, scale, clef) in enumerate(items)]
+        filepaths = []
+        for filepath in executor.map(_write_item_file, tasks,
+                                     chunksize=chunksize):
+            filepaths.append(filepath)
+            if progress_function is not None:
+                progress_function(len(filepaths), len(tasks))
+        return filepaths
+
+
+def _write_combined_file(data, executor, filepath, items, mode, instrument,
+                         start_octave, chord, chunksize, progress_function):
+    """Writes all items as parts of a single MusicXML file and returns its path.
+
+    The score's header and part list are written by this process, while
+    the parts are rendered by the worker processes and streamed to the
+    file in the items' order. See export_scale_book() for the arguments.
+    """
+    midi_program = data.midi_instruments[instrument]["midiNumber"]
+    part_ids = ["P"+str(i+1) for i in range(len(items))]
+    tasks = [(part_id, keynote, scale, clef, mode, start_octave, chord)
+             for part_id, (keynote, scale, clef) in zip(part_ids, items)]
+    with submodules.musicxml_writer.open_musicxml_file(filepath) as f:
+        writer = submodules.musicxml_writer.MusicXMLWriter(f, data.note_lengths)
+        writer.write_score_start("Scale book")
+        writer.write_part_list([(part_id,
+                                 keynote+"-"+scale+" ("+clef+")",
+                                 instrument, midi_program)
+                                for part_id, (keynote, scale, clef)
+                                in zip(part_ids, items)])
+        num_finished_items = 0
+        for part_musicxml in executor.map(_get_part_musicxml, tasks,
+                                          chunksize=chunksize):
+            f.write(part_musicxml)
+            num_finished_items += 1
+            if progress_function is not None:
+                progress_function(num_finished_items, len(tasks))
+        writer.write_score_end()
+    return filepath
+
+
+def _print_progress(num_finished_items, num_items):
+    """Prints the export's progress to stderr."""
+    if (num_finished_items % 100 == 0) or (num_finished_items == num_items):
+        sys.stderr.write("\r%d/%d items exported" %
+                         (num_finished_items, num_items))
+        if num_finished_items == num_items:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+def main(args):
+    """Exports the scale book with the given command line arguments."""
+    data = submodules.bachbro_data.BachBroData(
+            os.getcwd().replace("\\", "/")+"/data/")
+    parser = argparse.ArgumentParser(
+              prog="python -m submodules.scale_book",
+              description="Exports the sample of every scale in every keynote "
+                          "and clef as MusicXML.")
+    parser.add_argument("output_path",
+                        help="The output folder, or the output file with "
+                             "--combined.")
+    parser.add_argument("--clefs", nargs="+", default=None,
+                        help="The used clefs (default: all).")
+    parser.add_argument("--keynotes", nargs="+", default=None,
+                        help="The used keynotes (default: all).")
+    parser.add_argument("--scales", nargs="+", default=None,
+                        help="The used scales (default: all).")
+    parser.add_argument("--mode", default=next(iter(data.modes)),
+                        help="The flats/sharps of every sheet.")
+    parser.add_argument("--instrument",
+                        default=next(iter(data.midi_instruments)),
+                        help="The MIDI instrument of every sheet.")
+    parser.add_argument("--start-octave", type=int, default=4,
+                        help="The start octave of every sample.")
+    parser.add_argument("--chord", action="store_true",
+                        help="Export chord samples instead of scale samples.")
+    parser.add_argument("--combined", action="store_true",
+                        help="Write a single MusicXML file with one part per "
+                             "sample.")
+    parser.add_argument("--compressed", action="store_true",
+                        help="Write compressed MusicXML (.mxl) files. With "
+                             "--combined, the output file's extension "
+                             "decides instead.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="The number of worker processes (default: the "
+                             "number of CPUs).")
+    arguments = parser.parse_args(args[1:])
+
+    for name, values, table in (("clef", arguments.clefs, data.clefs),
+                                ("keynote", arguments.keynotes, data.notes),
+                                ("scale", arguments.scales, data.scales),
+                                ("mode", [arguments.mode], data.modes),
+                                ("instrument", [arguments.instrument],
+                                 data.midi_instruments)):
+        for value in values or []:
+            if value not in table:
+                parser.error("unknown %s: %s" % (name, value))
+
+    items = get_scale_book_items(data, arguments.clefs, arguments.keynotes,
+                                 arguments.scales)
+    export_scale_book(data, arguments.output_path, items, arguments.mode,
+                      arguments.instrument, arguments.start_octave,
+                      arguments.chord, arguments.combined,
+                      arguments.compressed, arguments.workers,
+                      _print_progress)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
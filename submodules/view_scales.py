@@ -23,7 +23,6 @@ In the user selected instrument view, the user may click on a note and
 show a range of user selected intervals.
 """
 
-import copy
 import math
 import os
 import tkinter
@@ -376,7 +375,7 @@ class ViewScales(tkinter.Frame):
         
         # Get keynote.
         keynote_name = self.var_keynote.get()
-        keynote_in_cents = self.parent.data.notes[keynote_name]["centsToC"]
+        keynote_in_cents = self.parent.data.note_cents_by_name[keynote_name]
         
         # Get scale in cents to next lower C.
         scale = self.parent.data.scales[self.var_scale.get()]
@@ -393,22 +392,15 @@ class ViewScales(tkinter.Frame):
             self.text_scale_sources.insert("end", "· "+source+"\n")
         
         # Get notes from cent values
-        scale_note_names = []
-        for i in range(len(scale_in_cents)):
-            for note in list(self.parent.data.notes.keys()):
-                if self.parent.data.notes[note]["centsToC"] == scale_in_cents[i]:
-                    scale_note_names.append(note)
-                    break
-        
-        # Find identical scales (adjusted to C as keynote).
-        adjusted_scale_in_cents = scale_in_cents
-        for scale_key in list(self.parent.data.scales.keys()):
-            if scale_key != self.var_scale.get():
-                other_scale = copy.deepcopy(self.parent.data.scales[scale_key])
-                other_scale["notesInCentsToKeynote"] = [(i + keynote_in_cents)%1200
-                                                        for i in other_scale["notesInCentsToKeynote"]]
-                if other_scale["notesInCentsToKeynote"] == adjusted_scale_in_cents:
-                    self.list_identical.insert("end", scale_key)
+        note_names_by_cents = self.parent.data.note_names_by_cents
+        scale_note_names = [note_names_by_cents[cents]
+                            for cents in scale_in_cents
+                            if cents in note_names_by_cents]
+        
+        # Find identical scales.
+        identical_scales = self.parent.data.get_identical_scales(self.var_scale.get())
+        if identical_scales:
+            self.list_identical.insert("end", *identical_scales)
         
         self.text_field.delete("1.0", "end")
         self.text_field.insert("end", scale_note_names)
@@ -469,9 +461,56 @@ class ViewScales(tkinter.Frame):
          self.parent.data.instruments[self.parent.var_instrument.get()]
         instrument_relcents = self._get_relcents_of_instrument(instrument)
         
-        # Determine fitting intervals.
-        chosen_intervals = self._get_chosen_intervals()
+        instrument_colors = self._get_instrument_colors(
+                             instrument_relcents, scale_in_cents,
+                             keynote_in_cents,
+                             self._get_chosen_intervals(),
+                             self.var_highlight_keynote.get())
+        for i in range(len(self.stringed_notes)):
+            for j in range(len(self.stringed_notes[i])):
+                self.instrument_canvas.itemconfig(self.stringed_notes[i][j],
+                                                  fill=instrument_colors[i][j])
+    
+    def _find_scales_including_same_notes(self, *e):
+        """Opens the 'Find Scales/Chords' tab with the selected scale's notes."""
+        checkbutton_vars = self.parent.tab_find_scales.checkbutton_vars
+        for key in list(checkbutton_vars.keys()):
+            if key in self.scale_note_names:
+                checkbutton_vars[key].set(1)
+            else:
+                checkbutton_vars[key].set(0)
         
+        self.parent.notebook.select(2)
+        self.parent.tab_find_scales._find_scales()
+    
+    def _get_genre_intervals_in_cents(self, genre_name, category):
+        """Returns a list of intervals (in cents) of the genre.
+        
+        Arguments:
+        >genre_name: Name of genre.
+        >category: Type of searches intervals (dissonant, co
+        """
+        interval_names = self.parent.data.genres[genre_name][category]
+        for name in interval_names:
+            yield self.parent.data.intervals[name]["cents"]
+    
+    def _get_instrument_colors(self, instrument_relcents, scale_in_cents,
+                               keynote_in_cents, chosen_intervals,
+                               highlight_keynote):
+        """Returns the colors of the instrument canvas cells as a list of lists.
+        
+        The colors are determined by the scale, the keynote, the clicked
+        cells and the user selected intervals. This method doesn't use any
+        tkinter widget.
+        
+        Arguments:
+        >instrument_relcents: The cells' relative cents, see
+                              _get_relcents_of_instrument().
+        >scale_in_cents: The scale's notes in cents to the next lower C.
+        >keynote_in_cents: The keynote in cents to the next lower C.
+        >chosen_intervals: The user selected intervals in cents.
+        >highlight_keynote: True, if the keynote shall be highlighted.
+        """
         flat_instrument_relcents = []
         for string_relcents in instrument_relcents:
             flat_instrument_relcents += string_relcents
@@ -506,49 +545,30 @@ class ViewScales(tkinter.Frame):
             fitting_interval_relcents = []
         
         # Color cells appropriately.
+        keynote_color = "yellow"
+        in_scale_color = "cornflower blue"
         void_color = "white"
         clicked_color = "red"
         fitting_interval_and_in_scale_color = "orange"
-        for i in range(len(self.stringed_notes)):
-            for j in range(len(self.stringed_notes[i])):
+        instrument_colors = []
+        for i in range(len(instrument_relcents)):
+            string_colors = []
+            for j in range(len(instrument_relcents[i])):
                 color = void_color
                 cell_cents_in_octave = instrument_relcents[i][j] % 1200
                 if cell_cents_in_octave in scale_in_cents:
                     color = in_scale_color
                 if cell_cents_in_octave == keynote_in_cents:
-                    if self.var_highlight_keynote.get():
+                    if highlight_keynote:
                         color = keynote_color
                 if instrument_relcents[i][j] in fitting_interval_relcents:
                     if instrument_relcents[i][j]%1200 in scale_in_cents:
                         color = fitting_interval_and_in_scale_color
                 if instrument_relcents[i][j] in self.clicked_relcents:
                     color = clicked_color
-                
-                self.instrument_canvas.itemconfig(self.stringed_notes[i][j],
-                                                  fill=color)
-    
-    def _find_scales_including_same_notes(self, *e):
-        """Opens the 'Find Scales/Chords' tab with the selected scale's notes."""
-        checkbutton_vars = self.parent.tab_find_scales.checkbutton_vars
-        for key in list(checkbutton_vars.keys()):
-            if key in self.scale_note_names:
-                checkbutton_vars[key].set(1)
-            else:
-                checkbutton_vars[key].set(0)
-        
-        self.parent.notebook.select(2)
-        self.parent.tab_find_scales._find_scales()
-    
-    def _get_genre_intervals_in_cents(self, genre_name, category):
-        """Returns a list of intervals (in cents) of the genre.
-        
-        Arguments:
-        >genre_name: Name of genre.
-        >category: Type of searches intervals (dissonant, co
-        """
-        interval_names = self.parent.data.genres[genre_name][category]
-        for name in interval_names:
-            yield self.parent.data.intervals[name]["cents"]
+                string_colors.append(color)
+            instrument_colors.append(string_colors)
+        return instrument_colors
     
     def _get_relcents_of_instrument(self, instrument):
         """Returns a list of lists representing the instrument's tones.
@@ -569,13 +589,12 @@ class ViewScales(tkinter.Frame):
         fret_distance = int(instrument["fretDistanceInCents"])
         num_frets = string_range // fret_distance
         
+        note_cents_by_name = self.parent.data.note_cents_by_name
         relcents = []
         for string in instrument["stringStartNotes"]:
-            temp_string = []
-            start_cent = int(string[1])*1200 + self.parent.data.notes[string[0]]["centsToC"]
-            for fret_num in range(num_frets):
-                temp_string.append(start_cent + fret_num * fret_distance)
-            relcents.append(temp_string)
+            start_cent = int(string[1])*1200 + note_cents_by_name[string[0]]
+            relcents.append([start_cent + fret_num * fret_distance
+                             for fret_num in range(num_frets)])
         return relcents
     
     def _make_instrument_canvas(self, *e):
@@ -630,7 +649,7 @@ class ViewScales(tkinter.Frame):
         
         if rhythm_file != "":
             filepath = os.getcwd().replace("\\", "/")+"/data/"+rhythm_file
-            self.parent.data.open_with_sheet_editor(filepath)
+            self.parent.open_with_sheet_editor(filepath)
     
     def _set_intervals(self, *e):
         """Sets intervals of selected genre. Can be changed by the user later."""
@@ -702,25 +721,34 @@ class ViewScales(tkinter.Frame):
                       if the scale shall be shown as a scale wave.
         >random=False: True, if a random sample of the notes shall be shown.
         """
-        notes = self.parent.data.get_scale_sample(keynote=\
-                                                   self.var_keynote.get(),
-                                                  name=self.var_scale.get(),
-                                                  start_octave=\
-                                                   self.var_start_octave.get(),
-                                                  chord=chord,
-                                                  randomized=randomized)
+        if randomized:
+            notes = self.parent.data.get_scale_sample(keynote=\
+                                                       self.var_keynote.get(),
+                                                      name=self.var_scale.get(),
+                                                      start_octave=\
+                                                       self.var_start_octave.get(),
+                                                      chord=chord,
+                                                      randomized=randomized)
+        else:
+            # Repeatedly shown samples are taken from the sample cache.
+            notes = self.parent.data.get_cached_scale_sample(
+                     keynote=self.var_keynote.get(),
+                     name=self.var_scale.get(),
+                     start_octave=self.var_start_octave.get(),
+                     chord=chord)
         
         title = self.var_keynote.get()+"-"+self.var_scale.get()
         filepath = os.getcwd().replace("\\", "/")+"/data/temp/MA"+\
-                   str(self.parent.current_file_number)+".xml"
+                   str(self.parent.current_file_number)+\
+                   self.parent.get_musicxml_extension()
         mode = self.parent.var_mode.get().split(" (")[0]
-        self.parent.data.create_musicxml(filepath,
-                                         title, self.parent.var_clef.get(),
-                                         mode,
-                                         self.parent.var_midi_instrument.get(),
-                                         notes)
+        self.parent.data.create_score(filepath,
+                                      title, self.parent.var_clef.get(),
+                                      mode,
+                                      self.parent.var_midi_instrument.get(),
+                                      notes)
         self.parent.current_file_number += 1
-        self.parent.data.open_with_sheet_editor(filepath)
+        self.parent.open_with_sheet_editor(filepath)
     
     def _random(self, *e):
         notes = self.parent.data.get_scale_sample(keynote=\